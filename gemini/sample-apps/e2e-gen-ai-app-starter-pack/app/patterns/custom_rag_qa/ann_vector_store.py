@@ -0,0 +1,441 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import uuid
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+VECTORS_FILE = "vectors.f32"
+ASSIGNMENTS_FILE = "assignments.i32"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "offsets.i64"
+CENTROIDS_FILE = "centroids.npy"
+META_FILE = "meta.json"
+
+
+class LocalANNVectorStore(VectorStore):
+    """
+    Local on-disk vector store with an inverted file (IVF) index for approximate
+    nearest-neighbor search by cosine similarity.
+
+    The store is a directory of append-only files: normalized float32 vectors,
+    which are memory-mapped for search, the inverted list of each vector, the
+    documents as JSON lines and the end offset of each document line. Adding
+    documents appends to these files and never rewrites the existing data. `meta.json` records the number of
+    committed documents and is replaced atomically after every add, so data
+    from an interrupted add is ignored and truncated on the next open.
+
+    Small stores are searched exhaustively. Once the store holds
+    `min_train_size` vectors, k-means centroids are trained on a sample of
+    them and searches only scan the vectors of the `n_probe` lists closest to
+    the query. The centroids are retrained whenever the store has grown
+    `retrain_growth` times since they were last trained. Filtered searches
+    probe more lists until enough candidates match the filter.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        persist_path: str,
+        n_probe: int = 16,
+        min_train_size: int = 5000,
+        retrain_growth: float = 4.0,
+        max_train_size: int = 100_000,
+    ) -> None:
+        """
+        Open the store at `persist_path`, creating it if needed.
+
+        Args:
+            embedding (Embeddings): The model used to embed documents and queries.
+            persist_path (str): The directory holding the store.
+            n_probe (int): The number of inverted lists scanned per search.
+            min_train_size (int): The number of vectors from which the IVF index
+                is trained. Smaller stores are searched exhaustively.
+            retrain_growth (float): Retrain the centroids once the store has
+                grown by this factor since the last training.
+            max_train_size (int): The maximum number of vectors sampled to train
+                the centroids.
+        """
+        self._embedding = embedding
+        self.persist_path = persist_path
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.max_train_size = max_train_size
+
+        self._lock = threading.RLock()
+        self._dim: Optional[int] = None
+        self._count = 0
+        self._trained_count = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._list_order: Optional[np.ndarray] = None
+        self._list_bounds: Optional[np.ndarray] = None
+        self._ends = np.empty(0, dtype=np.int64)
+
+        os.makedirs(persist_path, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def meta_path(self) -> str:
+        """The path of the metadata file, rewritten whenever the store changes."""
+        return self._path(META_FILE)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_path, name)
+
+    def _load(self) -> None:
+        """Read the committed state and truncate data from interrupted adds."""
+        if not os.path.exists(self.meta_path):
+            # Drop the data of an interrupted first add
+            for name in (VECTORS_FILE, ASSIGNMENTS_FILE, DOCUMENTS_FILE, OFFSETS_FILE):
+                self._truncate(name, 0)
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self._dim = meta["dim"]
+        self._count = meta["count"]
+        self._trained_count = meta["trained_count"]
+        if self._trained_count:
+            self._centroids = np.load(self._path(CENTROIDS_FILE))
+
+        dim = self._dim or 0
+        self._truncate(VECTORS_FILE, self._count * dim * 4)
+        self._truncate(ASSIGNMENTS_FILE, self._count * 4)
+        self._truncate(OFFSETS_FILE, self._count * 8)
+        self._ends = np.fromfile(
+            self._path(OFFSETS_FILE), dtype=np.int64, count=self._count
+        )
+        self._truncate(DOCUMENTS_FILE, int(self._ends[-1]) if self._count else 0)
+        logging.info(f"Loaded {self._count} documents from {self.persist_path}")
+
+    def _truncate(self, name: str, size: int) -> None:
+        path = self._path(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def _replace_file(self, name: str, write: Callable[[Any], None]) -> None:
+        """Write a file to a temporary path, then atomically replace it."""
+        tmp_path = f"{self._path(name)}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, self._path(name))
+
+    def _write_meta(self) -> None:
+        meta = {
+            "dim": self._dim,
+            "count": self._count,
+            "trained_count": self._trained_count,
+        }
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _get_vectors(self) -> np.ndarray:
+        """Memory-map the committed vectors, remapping after adds."""
+        if self._vectors is None or len(self._vectors) != self._count:
+            self._vectors = np.memmap(
+                self._path(VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(self._count, self._dim or 0),
+            )
+        return self._vectors
+
+    def _get_inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the vector ids sorted by list, and the bounds of each list."""
+        if self._list_order is None or self._list_bounds is None:
+            assignments = np.fromfile(
+                self._path(ASSIGNMENTS_FILE), dtype=np.int32, count=self._count
+            )
+            order = np.argsort(assignments, kind="stable")
+            n_lists = len(self._centroids) if self._centroids is not None else 0
+            bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+            self._list_order, self._list_bounds = order, bounds
+        return self._list_order, self._list_bounds
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Assign vectors to their closest centroid, or list 0 before training."""
+        if self._centroids is None:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _train(self) -> None:
+        """Train the centroids on a sample of the vectors and reassign all of them."""
+        vectors = self._get_vectors()
+        n_lists = max(1, int(np.sqrt(self._count)))
+        rng = np.random.default_rng(0)
+        sample_size = min(self._count, self.max_train_size)
+        sample = vectors[np.sort(rng.choice(self._count, sample_size, replace=False))]
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_lists, batch_size=4096, n_init=1, random_state=0
+        ).fit(sample)
+        centroids = self._normalize(kmeans.cluster_centers_.astype(np.float32))
+
+        # Commit the store as untrained while the centroids and assignments are
+        # replaced, so a crash in between falls back to an exhaustive search and
+        # retrains on the next add instead of mixing old and new lists
+        self._trained_count = 0
+        self._write_meta()
+        self._centroids = centroids
+        self._replace_file(CENTROIDS_FILE, lambda f: np.save(f, centroids))
+
+        # Only the small assignments file is rewritten, never the vectors
+        def write_assignments(f: Any) -> None:
+            for start in range(0, self._count, 65536):
+                self._assign(vectors[start : start + 65536]).tofile(f)
+
+        self._replace_file(ASSIGNMENTS_FILE, write_assignments)
+        self._trained_count = self._count
+        self._list_order = self._list_bounds = None
+        logging.info(f"Trained {n_lists} IVF lists on {sample_size} vectors")
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed texts and append them to the store."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._normalize(
+            np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        )
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(
+                    f"Expected embeddings of dimension {self._dim}, "
+                    f"got {vectors.shape[1]}"
+                )
+
+            with open(self._path(VECTORS_FILE), "ab") as f:
+                vectors.tofile(f)
+            with open(self._path(ASSIGNMENTS_FILE), "ab") as f:
+                self._assign(vectors).tofile(f)
+            ends = []
+            with open(self._path(DOCUMENTS_FILE), "ab") as f:
+                offset = f.tell()
+                for doc_id, text, metadata in zip(ids, texts, metadatas):
+                    line = json.dumps(
+                        {"id": doc_id, "page_content": text, "metadata": metadata}
+                    ).encode("utf-8")
+                    f.write(line + b"\n")
+                    offset += len(line) + 1
+                    ends.append(offset)
+            new_ends = np.asarray(ends, dtype=np.int64)
+            with open(self._path(OFFSETS_FILE), "ab") as f:
+                new_ends.tofile(f)
+            self._ends = np.concatenate([self._ends, new_ends])
+
+            self._count += len(texts)
+            self._list_order = self._list_bounds = None
+            if self._count >= self.min_train_size and (
+                not self._trained_count
+                or self._count >= self._trained_count * self.retrain_growth
+            ):
+                self._train()
+            self._write_meta()
+        return ids
+
+    def _read_documents(self, indices: Iterable[int]) -> List[Document]:
+        """Read documents in one pass over the file, in the order of indices."""
+        indices = np.asarray(list(indices), dtype=np.int64)
+        ends = self._ends[indices]
+        starts = np.where(indices > 0, self._ends[np.maximum(indices - 1, 0)], 0)
+        documents: List[Optional[Document]] = [None] * len(indices)
+        with open(self._path(DOCUMENTS_FILE), "rb") as f:
+            for position in np.argsort(starts, kind="stable"):
+                f.seek(starts[position])
+                record = json.loads(f.read(ends[position] - starts[position]))
+                documents[position] = Document(
+                    id=record["id"],
+                    page_content=record["page_content"],
+                    metadata=record["metadata"],
+                )
+        return [document for document in documents if document is not None]
+
+    def _candidates(
+        self, query: np.ndarray, n_probe: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return candidate vector ids and their similarity to the query."""
+        vectors = self._get_vectors()
+        if self._centroids is None:
+            return np.arange(self._count), vectors @ query
+
+        order, bounds = self._get_inverted_lists()
+        n_probe = min(n_probe, len(self._centroids))
+        lists = np.argpartition(-(self._centroids @ query), n_probe - 1)[:n_probe]
+        ids = np.sort(np.concatenate([order[bounds[i] : bounds[i + 1]] for i in lists]))
+        return ids, vectors[ids] @ query
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+        """Check metadata against a filter of exact values or lists of allowed values."""
+        for key, value in filter.items():
+            if isinstance(value, list):
+                if metadata.get(key) not in value:
+                    return False
+            elif metadata.get(key) != value:
+                return False
+        return True
+
+    def _filter_top_k(
+        self, ids: np.ndarray, scores: np.ndarray, k: int, filter: Dict[str, Any]
+    ) -> List[Tuple[Document, float]]:
+        """Read candidates in score order, in batches, until k match the filter."""
+        results: List[Tuple[Document, float]] = []
+        order = np.argsort(-scores)
+        batch_size = max(4 * k, 64)
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            for document, position in zip(self._read_documents(ids[batch]), batch):
+                if self._matches(document.metadata, filter):
+                    results.append((document, float(scores[position])))
+                    if len(results) == k:
+                        return results
+        return results
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Return the k documents most similar to the embedding with their cosine
+        similarity, optionally keeping only documents whose metadata matches filter.
+        """
+        with self._lock:
+            if not self._count:
+                return []
+            query = self._normalize(np.asarray(embedding, dtype=np.float32))
+            n_probe = self.n_probe
+            ids, scores = self._candidates(query, n_probe)
+
+            if not filter:
+                top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                documents = self._read_documents(ids[top])
+                return list(zip(documents, scores[top].tolist()))
+
+            # Probe twice as many lists while the filter leaves fewer than k
+            # matches, only reading the candidates of the newly probed lists
+            results = self._filter_top_k(ids, scores, k, filter)
+            checked = ids
+            while (
+                len(results) < k
+                and self._centroids is not None
+                and n_probe < len(self._centroids)
+            ):
+                n_probe *= 2
+                ids, scores = self._candidates(query, n_probe)
+                unchecked = ~np.isin(ids, checked)
+                checked = ids
+                results += self._filter_top_k(
+                    ids[unchecked], scores[unchecked], k, filter
+                )
+            results.sort(key=lambda result: -result[1])
+            return results[:k]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return the k documents most similar to the embedding."""
+        return [
+            document
+            for document, _ in self.similarity_search_with_score_by_vector(
+                embedding, k=k, filter=filter, **kwargs
+            )
+        ]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Return the k documents most similar to the query with their score."""
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(
+            embedding, k=k, filter=filter, **kwargs
+        )
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return the k documents most similar to the query."""
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k=k, filter=filter, **kwargs)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Map cosine similarity from [-1, 1] to a relevance score in [0, 1]
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        persist_path: str = ".persist_ann_vector_store",
+        **kwargs: Any,
+    ) -> "LocalANNVectorStore":
+        """Create a store at persist_path and add texts to it."""
+        vector_store = cls(embedding=embedding, persist_path=persist_path, **kwargs)
+        vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return vector_store
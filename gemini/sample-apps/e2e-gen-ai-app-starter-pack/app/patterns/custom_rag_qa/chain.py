@@ -14,9 +14,14 @@
 # mypy: disable-error-code="arg-type,attr-defined"
 # pylint: disable=W0613, W0622
 
+import asyncio
 import logging
 from typing import Any, AsyncIterator, Dict, List
 
+from app.patterns.custom_rag_qa.retrieval_cache import (
+    RetrievalCache,
+    get_store_version,
+)
 from app.patterns.custom_rag_qa.templates import (
     inspect_conversation_template,
     rag_template,
@@ -28,7 +33,7 @@ from app.utils.output_types import OnChatModelStreamEvent, OnToolEndEvent
 import google
 from langchain.schema import Document
 from langchain.tools import tool
-from langchain_core.messages import ToolMessage
+from langchain_core.messages import ToolCall, ToolMessage
 from langchain_google_community.vertex_rank import VertexAIRank
 from langchain_google_vertexai import ChatVertexAI, VertexAIEmbeddings
 import vertexai
@@ -37,6 +42,10 @@ import vertexai
 EMBEDDING_MODEL = "text-embedding-004"
 LLM_MODEL = "gemini-1.5-flash-002"
 TOP_K = 5
+RETRIEVE_K = 20
+CACHE_TTL_SECONDS = 3600
+CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_THRESHOLD = 0.95
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -48,7 +57,13 @@ vertexai.init(project=project_id)
 # Set up embedding model and vector store
 embedding = VertexAIEmbeddings(model_name=EMBEDDING_MODEL)
 vector_store = get_vector_store(embedding=embedding)
-retriever = vector_store.as_retriever(search_kwargs={"k": 20})
+
+# Cache of ranked documents by exact and semantically similar queries
+retrieval_cache = RetrievalCache(
+    ttl_seconds=CACHE_TTL_SECONDS,
+    max_entries=CACHE_MAX_ENTRIES,
+    similarity_threshold=SEMANTIC_CACHE_THRESHOLD,
+)
 
 # Initialize document compressor
 compressor = VertexAIRank(
@@ -61,7 +76,7 @@ compressor = VertexAIRank(
 
 
 @tool
-def retrieve_docs(query: str) -> List[Document]:
+async def retrieve_docs(query: str) -> List[Document]:
     """
     Useful for retrieving relevant documents based on a query.
     Use this when you need additional information to answer a question.
@@ -72,8 +87,30 @@ def retrieve_docs(query: str) -> List[Document]:
     Returns:
         List[Document]: A list of the top-ranked Document objects, limited to TOP_K (5) results.
     """
-    retrieved_docs = retriever.invoke(query)
-    ranked_docs = compressor.compress_documents(documents=retrieved_docs, query=query)
+    # Drop cached results if the persisted vector store changed
+    retrieval_cache.set_version(get_store_version(vector_store.meta_path))
+
+    cached_docs = retrieval_cache.get(query)
+    if cached_docs is not None:
+        return cached_docs
+
+    query_embedding = retrieval_cache.get_embedding(query)
+    if query_embedding is None:
+        query_embedding = await embedding.aembed_query(query)
+        retrieval_cache.put_embedding(query, query_embedding)
+
+    cached_docs = retrieval_cache.get_similar(query_embedding)
+    if cached_docs is not None:
+        return cached_docs
+
+    retrieved_docs = await vector_store.asimilarity_search_by_vector(
+        query_embedding, k=RETRIEVE_K
+    )
+    ranked_docs = list(
+        await compressor.acompress_documents(documents=retrieved_docs, query=query)
+    )
+    retrieval_cache.put(query, query_embedding, ranked_docs)
+    logging.info(f"Retrieval cache stats: {retrieval_cache.get_stats()}")
     return ranked_docs
 
 
@@ -97,6 +134,24 @@ inspect_conversation = inspect_conversation_template | llm.bind_tools(
 response_chain = rag_template | llm
 
 
+async def run_tool_call(tool_call_result: ToolCall) -> ToolMessage:
+    """Execute a tool call from the conversation inspection and return its ToolMessage."""
+    if tool_call_result["name"] == "retrieve_docs":
+        # Retrieve relevant documents
+        docs = await retrieve_docs.ainvoke(tool_call_result["args"])
+        # Format the retrieved documents
+        formatted_docs = template_docs.format(docs=docs)
+        # Create a ToolMessage with the formatted documents
+        return ToolMessage(
+            tool_call_id=tool_call_result["id"] or tool_call_result["name"],
+            name=tool_call_result["name"],
+            content=formatted_docs,
+            artifact=docs,
+        )
+    # If no documents need to be retrieved, continue with the conversation
+    return await should_continue.ainvoke(tool_call_result)
+
+
 @custom_chain
 async def chain(
     input: Dict[str, Any], **kwargs: Any
@@ -108,34 +163,23 @@ async def chain(
     astream_events, support for synchronous invocation through the `invoke` method,
     and OpenTelemetry tracing.
     """
-    # Inspect conversation and determine next action
-    inspection_result = inspect_conversation.invoke(input)
-    tool_call_result = inspection_result.tool_calls[0]
+    # Inspect conversation and determine next actions
+    inspection_result = await inspect_conversation.ainvoke(input)
+    tool_calls = inspection_result.tool_calls
 
-    # Execute the appropriate tool based on the inspection result
-    if tool_call_result["name"] == "retrieve_docs":
-        # Retrieve relevant documents
-        docs = retrieve_docs.invoke(tool_call_result["args"])
-        # Format the retrieved documents
-        formatted_docs = template_docs.format(docs=docs)
-        # Create a ToolMessage with the formatted documents
-        tool_message = ToolMessage(
-            tool_call_id=tool_call_result["name"],
-            name=tool_call_result["name"],
-            content=formatted_docs,
-            artifact=docs,
-        )
-    else:
-        # If no documents need to be retrieved, continue with the conversation
-        tool_message = should_continue.invoke(tool_call_result)
+    # Execute all the tool calls of the inspection result concurrently
+    tool_messages = await asyncio.gather(
+        *(run_tool_call(tool_call_result) for tool_call_result in tool_calls)
+    )
 
     # Update input messages with new information
-    input["messages"] = input["messages"] + [inspection_result, tool_message]
+    input["messages"] = input["messages"] + [inspection_result, *tool_messages]
 
     # Yield tool results metadata
-    yield OnToolEndEvent(
-        data={"input": tool_call_result["args"], "output": tool_message}
-    )
+    for tool_call_result, tool_message in zip(tool_calls, tool_messages):
+        yield OnToolEndEvent(
+            data={"input": tool_call_result["args"], "output": tool_message}
+        )
 
     # Stream LLM response
     async for chunk in response_chain.astream(input=input):
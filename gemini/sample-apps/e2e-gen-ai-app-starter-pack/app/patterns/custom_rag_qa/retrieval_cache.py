@@ -0,0 +1,223 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def get_store_version(persist_path: str) -> Optional[str]:
+    """Fingerprint a persisted vector store, which changes whenever it is rewritten."""
+    try:
+        stat = os.stat(persist_path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class RetrievalCache:
+    """
+    Two-level cache of ranked retrieval results.
+
+    The first level maps the normalized query text to its ranked documents.
+    The second level returns the documents of a cached query whose embedding
+    has a cosine similarity above `similarity_threshold` with the new query's
+    embedding, so paraphrased questions skip the vector search and rerank too.
+    The normalized query embeddings are kept in the rows of one matrix, so the
+    semantic lookup is a single matrix-vector product over all entries.
+
+    Results expire after `ttl_seconds`, at most `max_entries` are kept in LRU
+    order, and all of them are dropped when the vector store version changes.
+    Query embeddings are cached separately, since they do not depend on the
+    vector store.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+        similarity_threshold: float = 0.95,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds (float): How long cached results stay valid.
+            max_entries (int): Maximum number of cached results and embeddings.
+            similarity_threshold (float): Minimum cosine similarity for a
+                semantic cache hit.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+
+        # Normalized query -> (expiry, row in the embedding matrix, documents)
+        self._results: OrderedDict[str, Tuple[float, int, List[Document]]] = (
+            OrderedDict()
+        )
+        # Row i holds the embedding of _row_keys[i], expiring at _row_expiries[i]
+        self._matrix: Optional[np.ndarray] = None
+        self._row_expiries = np.full(max_entries, -np.inf)
+        self._row_keys: List[Optional[str]] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._embeddings: OrderedDict[str, List[float]] = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def set_version(self, version: Optional[str]) -> None:
+        """Drop all cached results if the vector store version changed."""
+        with self._lock:
+            if version != self._version:
+                if self._results:
+                    self.invalidations += 1
+                self._clear_results()
+                self._version = version
+
+    def get(self, query: str) -> Optional[List[Document]]:
+        """Return the cached documents of the exact (normalized) query."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._results.move_to_end(key)
+            self.exact_hits += 1
+            return entry[2]
+
+    def get_similar(self, query_embedding: List[float]) -> Optional[List[Document]]:
+        """
+        Return the cached documents of the most similar query, if its similarity
+        is above the threshold. Counts a miss otherwise.
+        """
+        vector = self._normalize(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            best_key = None
+            if self._matrix is not None and len(vector) == self._matrix.shape[1]:
+                similarities = self._matrix @ vector
+                # Free rows never expire after now, as their expiry is -inf
+                similarities[self._row_expiries <= now] = -np.inf
+                best_row = int(np.argmax(similarities))
+                if similarities[best_row] >= self.similarity_threshold:
+                    best_key = self._row_keys[best_row]
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(best_key)
+            self.semantic_hits += 1
+            return self._results[best_key][2]
+
+    def get_embedding(self, query: str) -> Optional[List[float]]:
+        """Return the cached embedding of the (normalized) query."""
+        key = normalize_query(query)
+        with self._lock:
+            embedding = self._embeddings.get(key)
+            if embedding is not None:
+                self._embeddings.move_to_end(key)
+            return embedding
+
+    def put_embedding(self, query: str, query_embedding: List[float]) -> None:
+        """Cache the embedding of a query."""
+        key = normalize_query(query)
+        with self._lock:
+            self._embeddings[key] = query_embedding
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_entries:
+                self._embeddings.popitem(last=False)
+
+    def put(
+        self, query: str, query_embedding: List[float], documents: List[Document]
+    ) -> None:
+        """Cache the ranked documents of a query."""
+        key = normalize_query(query)
+        vector = self._normalize(query_embedding)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != len(vector):
+                # The embedding model changed, so cached embeddings are not comparable
+                self._clear_results()
+                self._matrix = np.zeros(
+                    (self.max_entries, len(vector)), dtype=np.float32
+                )
+            if key in self._results:
+                self._remove(key)
+            elif len(self._results) >= self.max_entries:
+                self._remove(next(iter(self._results)))
+                self.evictions += 1
+
+            row = self._free_rows.pop()
+            expires_at = time.monotonic() + self.ttl_seconds
+            self._matrix[row] = vector
+            self._row_expiries[row] = expires_at
+            self._row_keys[row] = key
+            self._results[key] = (expires_at, row, documents)
+
+    def clear(self) -> None:
+        """Drop all cached results and embeddings."""
+        with self._lock:
+            self._clear_results()
+            self._embeddings.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return the hit, miss and eviction counters and the hit rate."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._results),
+            }
+
+    def _remove(self, key: str) -> None:
+        """Drop a cached result and free its matrix row. Must hold the lock."""
+        _, row, _ = self._results.pop(key)
+        self._row_expiries[row] = -np.inf
+        self._row_keys[row] = None
+        self._free_rows.append(row)
+
+    def _clear_results(self) -> None:
+        """Drop all cached results. Must hold the lock."""
+        self._results.clear()
+        self._row_expiries[:] = -np.inf
+        self._row_keys = [None] * self.max_entries
+        self._free_rows = list(range(self.max_entries - 1, -1, -1))
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -13,16 +13,15 @@
 # limitations under the License.
 
 import logging
-import os
 from typing import List
 
+from app.patterns.custom_rag_qa.ann_vector_store import LocalANNVectorStore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import SKLearnVectorStore
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 
-PERSIST_PATH = ".persist_vector_store"
+PERSIST_PATH = ".persist_ann_vector_store"
 URL = "https://services.google.com/fh/files/misc/practitioners_guide_to_mlops_whitepaper.pdf"
 
 
@@ -41,13 +40,12 @@ def load_and_split_documents(url: str) -> List[Document]:
 
 def get_vector_store(
     embedding: Embeddings, persist_path: str = PERSIST_PATH, url: str = URL
-) -> SKLearnVectorStore:
+) -> LocalANNVectorStore:
     """Get or create a vector store."""
-    vector_store = SKLearnVectorStore(embedding=embedding, persist_path=persist_path)
+    vector_store = LocalANNVectorStore(embedding=embedding, persist_path=persist_path)
 
-    if not os.path.exists(persist_path):
+    if not len(vector_store):
         doc_splits = load_and_split_documents(url=url)
         vector_store.add_documents(documents=doc_splits)
-        vector_store.persist()
 
     return vector_store
@@ -12,13 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
-from typing import Any, Optional, Sequence
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
 
 from google.cloud import logging as google_cloud_logging
 from google.cloud import storage
+from opentelemetry import trace
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.sdk import util
 from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.sdk.trace.export import SpanExportResult
 
@@ -30,6 +35,10 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
 
     This class helps bypass the 256 character limit of Cloud Trace for attribute values
     by leveraging Cloud Logging (which has a 256KB limit) and Cloud Storage for larger payloads.
+
+    Spans are written to Cloud Logging in as few batched calls per export as the
+    request size limit of Cloud Logging allows, and large payloads are uploaded to Cloud Storage by a bounded pool of background threads, so
+    that the exporter thread does not fall behind under load.
     """
 
     def __init__(
@@ -38,6 +47,11 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         storage_client: Optional[storage.Client] = None,
         bucket_name: Optional[str] = None,
         debug: bool = False,
+        max_upload_workers: int = 4,
+        max_pending_uploads: int = 100,
+        bucket_check_interval: float = 300.0,
+        max_batch_bytes: int = 9 * 1024 * 1024,
+        max_batch_entries: int = 1000,
         **kwargs: Any,
     ) -> None:
         """
@@ -47,6 +61,13 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
         :param debug: Enable debug mode for additional logging
+        :param max_upload_workers: Number of threads uploading large payloads to GCS
+        :param max_pending_uploads: Maximum number of queued or running uploads,
+            further uploads are dropped
+        :param bucket_check_interval: Seconds before re-checking a missing GCS bucket
+        :param max_batch_bytes: Maximum estimated size of one Cloud Logging write,
+            below its 10 MB request limit
+        :param max_batch_entries: Maximum number of log entries in one write
         :param kwargs: Additional arguments to pass to the parent class
         """
         super().__init__(**kwargs)
@@ -59,6 +80,45 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         self.bucket_name = bucket_name or f"{self.project_id}-logs-data"
         self.bucket = self.storage_client.bucket(self.bucket_name)
 
+        self.max_pending_uploads = max_pending_uploads
+        self.bucket_check_interval = bucket_check_interval
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_entries = max_batch_entries
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=max_upload_workers, thread_name_prefix="span-upload"
+        )
+        self._lock = threading.Lock()
+        self._pending_uploads = 0
+        self._bucket_exists: Optional[bool] = None
+        self._bucket_checked_at = 0.0
+
+        self.exported_spans = 0
+        self.failed_log_writes = 0
+        self.dropped_uploads = 0
+        self.failed_uploads = 0
+
+    @property
+    def upload_queue_depth(self) -> int:
+        """The number of large payload uploads queued or in progress."""
+        with self._lock:
+            return self._pending_uploads
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Return the exporter's counters.
+
+        :return: Exported spans, failed log writes, upload queue depth,
+            dropped and failed uploads
+        """
+        with self._lock:
+            return {
+                "exported_spans": self.exported_spans,
+                "failed_log_writes": self.failed_log_writes,
+                "upload_queue_depth": self._pending_uploads,
+                "dropped_uploads": self.dropped_uploads,
+                "failed_uploads": self.failed_uploads,
+            }
+
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
         Export the spans to Google Cloud Logging and Cloud Trace.
@@ -66,11 +126,14 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param spans: A sequence of spans to export
         :return: The result of the export operation
         """
+        batch = self.logger.batch()
+        batch_entries = 0
+        batch_bytes = 0
         for span in spans:
             span_context = span.get_span_context()
             trace_id = format(span_context.trace_id, "x")
             span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
+            span_dict = self._span_to_dict(span)
 
             span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
             span_dict["span_id"] = span_id
@@ -82,12 +145,135 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             if self.debug:
                 print(span_dict)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(span_dict, severity="INFO")
+            # Start a new write before the batch would exceed the request limits
+            entry_bytes = len(json.dumps(span_dict, default=str).encode())
+            if batch_entries and (
+                batch_entries >= self.max_batch_entries
+                or batch_bytes + entry_bytes > self.max_batch_bytes
+            ):
+                self._commit_batch(batch, batch_entries)
+                batch = self.logger.batch()
+                batch_entries = batch_bytes = 0
+
+            batch.log_struct(span_dict, severity="INFO")
+            batch_entries += 1
+            batch_bytes += entry_bytes
+
+        if batch_entries:
+            self._commit_batch(batch, batch_entries)
 
         # Export spans to Google Cloud Trace using the parent class method
         return super().export(spans)
 
+    def _commit_batch(self, batch: Any, num_entries: int) -> None:
+        """
+        Write a batch of span entries to Google Cloud Logging in a single call,
+        counting failures instead of raising them.
+
+        :param batch: The Cloud Logging batch to commit
+        :param num_entries: The number of span entries in the batch
+        """
+        try:
+            batch.commit()
+        except Exception:
+            with self._lock:
+                self.failed_log_writes += num_entries
+            logging.exception("Failed to write %d spans to Cloud Logging", num_entries)
+        else:
+            with self._lock:
+                self.exported_spans += num_entries
+
+    def shutdown(self) -> None:
+        """Wait for the pending uploads to finish, then shut down the exporter."""
+        self._upload_executor.shutdown(wait=True)
+        super().shutdown()
+
+    @staticmethod
+    def _span_to_dict(span: ReadableSpan) -> Dict[str, Any]:
+        """
+        Convert a span to the same dictionary as `json.loads(span.to_json())`,
+        without the round trip through a JSON string.
+
+        :param span: The span to convert
+        :return: The span dictionary
+        """
+
+        def format_context(context: trace.SpanContext) -> Dict[str, str]:
+            return {
+                "trace_id": f"0x{trace.format_trace_id(context.trace_id)}",
+                "span_id": f"0x{trace.format_span_id(context.span_id)}",
+                "trace_state": repr(context.trace_state),
+            }
+
+        def format_attributes(attributes: Any) -> Optional[Dict[str, Any]]:
+            if attributes is None:
+                return None
+            # Attribute values may be tuples, which log entries do not accept
+            return {
+                k: list(v) if isinstance(v, tuple) else v for k, v in attributes.items()
+            }
+
+        status = {"status_code": str(span.status.status_code.name)}
+        if span.status.description:
+            status["description"] = span.status.description
+
+        return {
+            "name": span.name,
+            "context": format_context(span.context) if span.context else None,
+            "kind": str(span.kind),
+            "parent_id": (
+                f"0x{trace.format_span_id(span.parent.span_id)}"
+                if span.parent is not None
+                else None
+            ),
+            "start_time": (
+                util.ns_to_iso_str(span.start_time) if span.start_time else None
+            ),
+            "end_time": util.ns_to_iso_str(span.end_time) if span.end_time else None,
+            "status": status,
+            "attributes": format_attributes(span.attributes),
+            "events": [
+                {
+                    "name": event.name,
+                    "timestamp": util.ns_to_iso_str(event.timestamp),
+                    "attributes": format_attributes(event.attributes),
+                }
+                for event in span.events
+            ],
+            "links": [
+                {
+                    "context": format_context(link.context),
+                    "attributes": format_attributes(link.attributes),
+                }
+                for link in span.links
+            ],
+            "resource": {
+                "attributes": format_attributes(span.resource.attributes),
+                "schema_url": span.resource.schema_url,
+            },
+        }
+
+    def _is_bucket_available(self) -> bool:
+        """
+        Check whether the GCS bucket exists. An existing bucket is only checked
+        once, a missing one again after `bucket_check_interval` seconds.
+
+        :return: Whether the bucket exists
+        """
+        with self._lock:
+            if self._bucket_exists or (
+                self._bucket_exists is not None
+                and time.monotonic() - self._bucket_checked_at
+                < self.bucket_check_interval
+            ):
+                return bool(self._bucket_exists)
+
+        exists = bool(self.bucket.exists())
+        with self._lock:
+            self._bucket_exists = exists
+            self._bucket_checked_at = time.monotonic()
+        return exists
+
     def store_in_gcs(self, content: str, span_id: str) -> str:
         """
         Initiate storing large content in Google Cloud Storage/
@@ -96,7 +282,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param span_id: The ID of the span
         :return: The  GCS URI of the stored content
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
+        if not self._is_bucket_available():
             logging.warning(
                 f"Bucket {self.bucket_name} not found. "
                 "Unable to store span attributes in GCS."
@@ -109,6 +295,49 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         blob.upload_from_string(content, "application/json")
         return f"gs://{self.bucket_name}/{blob_name}"
 
+    def _submit_upload(self, content: str, span_id: str) -> str:
+        """
+        Queue storing large content in Google Cloud Storage on the upload pool.
+
+        :param content: The content to store
+        :param span_id: The ID of the span
+        :return: The GCS URI the content will be stored at
+        """
+        if not self._is_bucket_available():
+            logging.warning(
+                f"Bucket {self.bucket_name} not found. "
+                "Unable to store span attributes in GCS."
+            )
+            return "GCS bucket not found"
+
+        with self._lock:
+            dropped = self._pending_uploads >= self.max_pending_uploads
+            if dropped:
+                self.dropped_uploads += 1
+            else:
+                self._pending_uploads += 1
+        if dropped:
+            logging.warning(
+                f"{self.max_pending_uploads} span uploads pending. "
+                f"Dropping the attributes of span {span_id}."
+            )
+            return "GCS upload dropped"
+
+        self._upload_executor.submit(self._upload, content, span_id)
+        return f"gs://{self.bucket_name}/spans/{span_id}.json"
+
+    def _upload(self, content: str, span_id: str) -> None:
+        """Store content in GCS, counting failures. Runs on the upload pool."""
+        try:
+            self.store_in_gcs(content, span_id)
+        except Exception:
+            with self._lock:
+                self.failed_uploads += 1
+            logging.exception(f"Failed to store the attributes of span {span_id}")
+        finally:
+            with self._lock:
+                self._pending_uploads -= 1
+
     def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
         """
         Process large attribute values by storing them in GCS if they exceed the size
@@ -134,7 +363,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             }
 
             # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
+            gcs_uri = self._submit_upload(json.dumps(attributes_payload), span_id)
             attributes_retain["uri_payload"] = gcs_uri
             attributes_retain["url_payload"] = (
                 f"https://storage.mtls.cloud.google.com/"
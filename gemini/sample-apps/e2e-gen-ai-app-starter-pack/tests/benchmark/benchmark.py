@@ -0,0 +1,369 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# pylint: disable=W0718
+
+"""
+Latency benchmark of the `/stream_events` endpoint under concurrency sweeps.
+
+By default the server is started locally with a deterministic fake LLM
+(see `fake_server.py`), so results reflect the server itself:
+
+    python -m tests.benchmark.benchmark --concurrency 1 8 32 \\
+        --output tests/benchmark/.results/baseline.json
+
+Compare a new run against a saved baseline, failing on regressions:
+
+    python -m tests.benchmark.benchmark --compare tests/benchmark/.results/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+TOPICS = [
+    "a vegetarian lasagna",
+    "gluten-free bread",
+    "a quick weeknight curry",
+    "chocolate chip cookies",
+    "a dairy-free risotto",
+    "homemade ramen",
+]
+
+# Latency metrics compared against the baseline, lower is better
+COMPARED_METRICS = [
+    "time_to_first_event",
+    "time_to_first_token",
+    "inter_token_gap",
+    "total_time",
+    "cpu_seconds_per_stream",
+]
+
+
+def make_conversations(
+    num_conversations: int, max_turns: int, seed: int = 0
+) -> List[List[Dict[str, str]]]:
+    """Build conversations of varying length, each ending with a human message."""
+    rng = random.Random(seed)
+    conversations = []
+    for _ in range(num_conversations):
+        messages = []
+        for turn in range(rng.randint(1, max_turns)):
+            topic = rng.choice(TOPICS)
+            if turn:
+                messages.append(
+                    {"type": "ai", "content": f"Here is a recipe for {topic}. " * 20}
+                )
+            messages.append(
+                {
+                    "type": "human",
+                    "content": f"How do I make {topic}?"
+                    + " Please keep it simple." * rng.randint(0, 10),
+                }
+            )
+        conversations.append(messages)
+    return conversations
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile (0-100) of values, interpolating linearly."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Summarize a latency distribution in seconds."""
+    return {
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+async def run_stream(
+    client: httpx.AsyncClient, messages: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """Send one conversation and time the events of the streamed response."""
+    data = {
+        "input": {
+            "messages": messages,
+            "user_id": "benchmark-user",
+            "session_id": "benchmark-session",
+        }
+    }
+    start = time.perf_counter()
+    first_event = None
+    token_times = []
+    async with client.stream("POST", "/stream_events", json=data) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            now = time.perf_counter()
+            event = json.loads(line)
+            if first_event is None:
+                first_event = now - start
+            if event["event"] == "on_chat_model_stream":
+                token_times.append(now - start)
+            if event["event"] == "end":
+                break
+    return {
+        "time_to_first_event": first_event,
+        "time_to_first_token": token_times[0] if token_times else None,
+        "inter_token_gaps": [b - a for a, b in zip(token_times, token_times[1:])],
+        "total_time": time.perf_counter() - start,
+    }
+
+
+async def get_server_cpu_seconds(client: httpx.AsyncClient) -> Optional[float]:
+    """Read the server's CPU time, only available on the fake server."""
+    try:
+        response = await client.get("/benchmark/cpu")
+        response.raise_for_status()
+        return response.json()["cpu_seconds"]
+    except Exception:
+        return None
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    conversations: List[List[Dict[str, str]]],
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Stream all conversations with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_stream(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        async with semaphore:
+            return await run_stream(client, messages)
+
+    cpu_start = await get_server_cpu_seconds(client)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(bounded_stream(messages) for messages in conversations),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+    cpu_end = await get_server_cpu_seconds(client)
+
+    streams = [result for result in results if isinstance(result, dict)]
+    errors = [repr(result) for result in results if not isinstance(result, dict)]
+    summary: Dict[str, Any] = {
+        "concurrency": concurrency,
+        "streams": len(streams),
+        "errors": len(errors),
+        "streams_per_second": len(streams) / elapsed,
+        "time_to_first_event": summarize(
+            [
+                s["time_to_first_event"]
+                for s in streams
+                if s["time_to_first_event"] is not None
+            ]
+        ),
+        "time_to_first_token": summarize(
+            [
+                s["time_to_first_token"]
+                for s in streams
+                if s["time_to_first_token"] is not None
+            ]
+        ),
+        "inter_token_gap": summarize(
+            [gap for s in streams for gap in s["inter_token_gaps"]]
+        ),
+        "total_time": summarize([s["total_time"] for s in streams]),
+    }
+    if cpu_start is not None and cpu_end is not None and streams:
+        cpu_per_stream = (cpu_end - cpu_start) / len(streams)
+        summary["cpu_seconds_per_stream"] = {"mean": cpu_per_stream}
+    if errors:
+        summary["first_error"] = errors[0]
+    return summary
+
+
+def compare_to_baseline(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    Return the metrics that regressed by more than `tolerance` (a fraction)
+    relative to the baseline, for concurrency levels present in both runs.
+
+    A level that completed no streams, or had more failed requests than the
+    baseline (or any, without a baseline level), is always a regression, as
+    its timings would otherwise only cover the requests that succeeded.
+    """
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    regressions = []
+    for level in results["levels"]:
+        baseline_level = baseline_levels.get(level["concurrency"])
+        if level.get("streams") == 0:
+            regressions.append(
+                f"concurrency={level['concurrency']}: no stream completed"
+            )
+        baseline_errors = (baseline_level or {}).get("errors", 0)
+        if level.get("errors", 0) > baseline_errors:
+            regressions.append(
+                f"concurrency={level['concurrency']} errors: "
+                f"{level['errors']} vs baseline {baseline_errors}"
+            )
+        if baseline_level is None:
+            continue
+        for metric in COMPARED_METRICS:
+            for stat, value in level.get(metric, {}).items():
+                baseline_value = baseline_level.get(metric, {}).get(stat)
+                if baseline_value and value > baseline_value * (1 + tolerance):
+                    regressions.append(
+                        f"concurrency={level['concurrency']} {metric}.{stat}: "
+                        f"{value:.4f}s vs baseline {baseline_value:.4f}s"
+                    )
+    return regressions
+
+
+def start_fake_server(args: argparse.Namespace) -> subprocess.Popen:
+    """Start the fake server in a subprocess and wait until it accepts requests."""
+    process = subprocess.Popen(  # pylint: disable=R1732
+        [
+            sys.executable,
+            "-m",
+            "tests.benchmark.fake_server",
+            "--port",
+            str(args.port),
+            "--first-token-delay",
+            str(args.first_token_delay),
+            "--tokens-per-second",
+            str(args.tokens_per_second),
+            "--response-tokens",
+            str(args.response_tokens),
+        ]
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The fake server exited before it started")
+        try:
+            httpx.get(f"http://127.0.0.1:{args.port}/docs", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("Timed out waiting for the fake server to start")
+
+
+async def run_benchmark(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    """Run every concurrency level of the sweep against base_url."""
+    headers = {}
+    if os.environ.get("_ID_TOKEN"):
+        headers["Authorization"] = f'Bearer {os.environ["_ID_TOKEN"]}'
+
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(
+        base_url=base_url, headers=headers, limits=limits, timeout=args.timeout
+    ) as client:
+        # Warm up the server before measuring
+        await run_stream(client, make_conversations(1, 1, seed=-1)[0])
+
+        levels = []
+        for concurrency in args.concurrency:
+            conversations = make_conversations(
+                args.requests_per_level, args.max_turns, seed=concurrency
+            )
+            level = await run_level(client, conversations, concurrency)
+            levels.append(level)
+            print(
+                f"concurrency={concurrency:<4} streams={level['streams']:<5} "
+                f"errors={level['errors']:<3} "
+                f"ttfe_p50={level['time_to_first_event']['p50']:.4f}s "
+                f"ttfe_p99={level['time_to_first_event']['p99']:.4f}s "
+                f"gap_p99={level['inter_token_gap']['p99']:.4f}s "
+                f"total_p95={level['total_time']['p95']:.4f}s"
+            )
+
+    return {
+        "config": {
+            "url": base_url,
+            "requests_per_level": args.requests_per_level,
+            "max_turns": args.max_turns,
+            "first_token_delay": args.first_token_delay,
+            "tokens_per_second": args.tokens_per_second,
+            "response_tokens": args.response_tokens,
+        },
+        "levels": levels,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--url", help="Benchmark a running server instead of the local fake server"
+    )
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests-per-level", type=int, default=64)
+    parser.add_argument("--max-turns", type=int, default=8)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Save the results as a JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to compare the results to")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative slowdown against the baseline",
+    )
+    args = parser.parse_args()
+
+    process = None if args.url else start_fake_server(args)
+    try:
+        base_url = args.url or f"http://127.0.0.1:{args.port}"
+        results = asyncio.run(run_benchmark(args, base_url))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORDS = (
+    "preheat the oven to 180 degrees whisk flour sugar eggs butter milk "
+    "until smooth then bake for 25 minutes season with salt and pepper "
+    "serve warm garnish with fresh herbs"
+).split()
+
+
+class FakeChatVertexAI(BaseChatModel):
+    """
+    Deterministic offline stand-in for ChatVertexAI.
+
+    The same conversation always produces the same response of
+    `response_tokens` tokens. Streaming waits `first_token_delay` seconds
+    before the first token, then emits tokens at `tokens_per_second`, so
+    latency benchmarks measure the server rather than the model.
+    """
+
+    first_token_delay: float = 0.2
+    tokens_per_second: float = 50.0
+    response_tokens: int = 100
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-vertexai"
+
+    def get_response_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        """Return the deterministic response tokens for a conversation."""
+        conversation = "\n".join(str(message.content) for message in messages)
+        seed = hashlib.sha256(conversation.encode("utf-8")).hexdigest()
+        rng = random.Random(seed)
+        return [f"{rng.choice(WORDS)} " for _ in range(self.response_tokens)]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self.get_response_tokens(messages)
+        time.sleep(self.first_token_delay + len(tokens) / self.tokens_per_second)
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self.get_response_tokens(messages)):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(self.get_response_tokens(messages)):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,79 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# pylint: disable=C0415
+
+"""
+Runs `app/server.py` offline, with `FakeChatVertexAI` in place of ChatVertexAI
+and fake Google Cloud clients, for latency benchmarks:
+
+    python -m tests.benchmark.fake_server --port 8001 --tokens-per-second 50
+"""
+
+import argparse
+import os
+import time
+from typing import Dict
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from google.auth.credentials import Credentials
+from tests.benchmark.fake_llm import FakeChatVertexAI
+
+
+def create_app(
+    first_token_delay: float, tokens_per_second: float, response_tokens: int
+) -> FastAPI:
+    """Import the server app without Google Cloud access and swap in the fake LLM."""
+    os.environ.setdefault("TRACELOOP_TELEMETRY", "false")
+    with patch(
+        "google.auth.default",
+        return_value=(MagicMock(spec=Credentials), "fake-project"),
+    ), patch("google.cloud.logging.Client"), patch("google.cloud.storage.Client"):
+        from app import chain as chain_module
+        from app import server
+
+    fake_llm = FakeChatVertexAI(
+        first_token_delay=first_token_delay,
+        tokens_per_second=tokens_per_second,
+        response_tokens=response_tokens,
+    )
+    server.chain = chain_module.template | fake_llm
+
+    @server.app.get("/benchmark/cpu")
+    async def get_cpu_time() -> Dict[str, float]:
+        """Report the CPU time used by the server process so far."""
+        return {"cpu_seconds": time.process_time()}
+
+    return server.app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=100)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(
+        args.first_token_delay, args.tokens_per_second, args.response_tokens
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
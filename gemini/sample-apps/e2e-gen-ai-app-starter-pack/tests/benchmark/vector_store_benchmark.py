@@ -0,0 +1,188 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Recall and latency benchmark of `LocalANNVectorStore` against `SKLearnVectorStore`
+on synthetic clustered embeddings, so no embedding model is called:
+
+    python -m tests.benchmark.vector_store_benchmark --sizes 10000 100000 1000000 \\
+        --output tests/benchmark/.results/vector_store.json
+
+Recall@k is measured against an exact brute-force search.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from app.patterns.custom_rag_qa.ann_vector_store import LocalANNVectorStore
+from langchain_core.embeddings import Embeddings
+import numpy as np
+from tests.benchmark.benchmark import summarize
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Embeddings that look up texts of the form `chunk-<index>` in a matrix."""
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[int(text.split("-")[1])].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_vectors(
+    num_vectors: int, dim: int, num_clusters: int, seed: int = 0
+) -> np.ndarray:
+    """Build normalized vectors drawn around random cluster centers."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, num_clusters, num_vectors)]
+    vectors += 0.5 * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    """Return the ids of the exact top-k neighbors of each query."""
+    top_k = []
+    for query in queries:
+        scores = vectors @ query
+        top_k.append(set(np.argpartition(-scores, k - 1)[:k].tolist()))
+    return top_k
+
+
+def run_store(
+    name: str,
+    store: Any,
+    num_vectors: int,
+    query_ids: List[int],
+    truth: List[set],
+    k: int,
+    batch_size: int,
+) -> Dict[str, Any]:
+    """Add all chunks to a store, then time its searches and measure recall@k."""
+    start = time.perf_counter()
+    for batch_start in range(0, num_vectors, batch_size):
+        batch = range(batch_start, min(batch_start + batch_size, num_vectors))
+        store.add_texts(
+            [f"chunk-{i}" for i in batch], metadatas=[{"index": i} for i in batch]
+        )
+    build_seconds = time.perf_counter() - start
+    if hasattr(store, "persist"):
+        store.persist()
+
+    latencies = []
+    recalls = []
+    for query_id, expected in zip(query_ids, truth):
+        start = time.perf_counter()
+        docs = store.similarity_search(f"chunk-{query_id}", k=k)
+        latencies.append(time.perf_counter() - start)
+        found = {doc.metadata["index"] for doc in docs}
+        recalls.append(len(found & expected) / k)
+
+    return {
+        "store": name,
+        "build_seconds": build_seconds,
+        "recall_at_k": float(np.mean(recalls)),
+        "latency": summarize(latencies),
+    }
+
+
+def make_sklearn_store(embedding: Embeddings, persist_dir: str) -> Optional[Any]:
+    """Create the previous SKLearnVectorStore, if it is installed."""
+    try:
+        from langchain_community.vectorstores import SKLearnVectorStore
+    except ImportError:
+        return None
+    return SKLearnVectorStore(
+        embedding=embedding, persist_path=os.path.join(persist_dir, "sklearn.json")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--n-probe", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument(
+        "--max-sklearn-size",
+        type=int,
+        default=100_000,
+        help="Skip SKLearnVectorStore above this size, as it is too slow to build",
+    )
+    parser.add_argument("--output", help="Save the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        vectors = make_vectors(
+            size + args.queries, args.dim, num_clusters=max(10, size // 1000)
+        )
+        # Queries are embedded through the same lookup as the chunks, so both
+        # stores are timed on `similarity_search`.
+        embedding = PrecomputedEmbeddings(vectors)
+        query_ids = list(range(size, size + args.queries))
+        truth = exact_top_k(vectors[:size], vectors[size:], args.k)
+
+        with tempfile.TemporaryDirectory() as persist_dir:
+            stores: List[Any] = [
+                (
+                    "LocalANNVectorStore",
+                    LocalANNVectorStore(
+                        embedding=embedding,
+                        persist_path=os.path.join(persist_dir, "ann"),
+                        n_probe=args.n_probe,
+                    ),
+                )
+            ]
+            sklearn_store = make_sklearn_store(embedding, persist_dir)
+            if sklearn_store is not None and size <= args.max_sklearn_size:
+                stores.append(("SKLearnVectorStore", sklearn_store))
+
+            for name, store in stores:
+                result = run_store(
+                    name, store, size, query_ids, truth, args.k, args.batch_size
+                )
+                result["size"] = size
+                results.append(result)
+                print(
+                    f"size={size:<8} store={name:<20} "
+                    f"build_s={result['build_seconds']:<8.2f} "
+                    f"recall@{args.k}={result['recall_at_k']:.3f} "
+                    f"p50_ms={result['latency']['p50'] * 1000:.2f} "
+                    f"p95_ms={result['latency']['p95'] * 1000:.2f}"
+                )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+from app.patterns.custom_rag_qa.ann_vector_store import (
+    DOCUMENTS_FILE,
+    META_FILE,
+    OFFSETS_FILE,
+    VECTORS_FILE,
+    LocalANNVectorStore,
+)
+import numpy as np
+from tests.benchmark.vector_store_benchmark import (
+    PrecomputedEmbeddings,
+    exact_top_k,
+    make_vectors,
+)
+
+DIM = 16
+
+
+def make_store(
+    persist_path: str, vectors: np.ndarray, **kwargs: int
+) -> LocalANNVectorStore:
+    return LocalANNVectorStore(
+        embedding=PrecomputedEmbeddings(vectors), persist_path=persist_path, **kwargs
+    )
+
+
+def add_chunks(store: LocalANNVectorStore, ids: range) -> None:
+    store.add_texts(
+        [f"chunk-{i}" for i in ids],
+        metadatas=[{"index": i, "parity": i % 2} for i in ids],
+    )
+
+
+def test_search_returns_nearest_documents(tmp_path: str) -> None:
+    """Test that the nearest document is returned first with its metadata."""
+    vectors = make_vectors(101, DIM, num_clusters=5)
+    store = make_store(str(tmp_path), vectors)
+    add_chunks(store, range(100))
+
+    docs = store.similarity_search("chunk-42", k=3)
+
+    assert docs[0].page_content == "chunk-42"
+    assert docs[0].metadata == {"index": 42, "parity": 0}
+    assert len(docs) == 3
+
+
+def test_incremental_adds_persist_across_reopen(tmp_path: str) -> None:
+    """Test that appended documents survive reopening the store."""
+    vectors = make_vectors(200, DIM, num_clusters=5)
+    store = make_store(str(tmp_path), vectors)
+    add_chunks(store, range(100))
+    add_chunks(store, range(100, 200))
+
+    reopened = make_store(str(tmp_path), vectors)
+
+    assert len(reopened) == 200
+    assert reopened.similarity_search("chunk-150", k=1)[0].page_content == "chunk-150"
+
+
+def test_metadata_filter(tmp_path: str) -> None:
+    """Test exact value and list of allowed values filters."""
+    vectors = make_vectors(100, DIM, num_clusters=5)
+    store = make_store(str(tmp_path), vectors)
+    add_chunks(store, range(100))
+
+    odd = store.similarity_search("chunk-42", k=5, filter={"parity": 1})
+    chosen = store.similarity_search("chunk-42", k=5, filter={"index": [3, 7]})
+
+    assert len(odd) == 5
+    assert all(doc.metadata["parity"] == 1 for doc in odd)
+    assert {doc.metadata["index"] for doc in chosen} == {3, 7}
+
+
+def test_filter_probes_more_lists_when_underfilled(tmp_path: str) -> None:
+    """Test that a selective filter still returns k matches from a trained index."""
+    vectors = make_vectors(1000, DIM, num_clusters=20)
+    store = make_store(str(tmp_path), vectors, min_train_size=500, n_probe=1)
+    add_chunks(store, range(1000))
+
+    chosen = list(range(0, 1000, 97))
+    docs = store.similarity_search("chunk-42", k=len(chosen), filter={"index": chosen})
+
+    assert {doc.metadata["index"] for doc in docs} == set(chosen)
+
+
+def test_ivf_index_recall(tmp_path: str) -> None:
+    """Test that searches stay accurate once the IVF index is trained."""
+    vectors = make_vectors(2050, DIM, num_clusters=20)
+    store = make_store(str(tmp_path), vectors, min_train_size=1000, n_probe=8)
+    add_chunks(store, range(500))
+    add_chunks(store, range(500, 2000))
+    assert os.path.exists(os.path.join(str(tmp_path), "centroids.npy"))
+
+    truth = exact_top_k(vectors[:2000], vectors[2000:], k=10)
+    recalls = []
+    for query_id, expected in zip(range(2000, 2050), truth):
+        docs = store.similarity_search(f"chunk-{query_id}", k=10)
+        recalls.append(len({doc.metadata["index"] for doc in docs} & expected) / 10)
+
+    assert np.mean(recalls) >= 0.9
+
+
+def test_interrupted_add_is_discarded(tmp_path: str) -> None:
+    """Test that data written after the last committed add is truncated on open."""
+    vectors = make_vectors(100, DIM, num_clusters=5)
+    store = make_store(str(tmp_path), vectors)
+    add_chunks(store, range(50))
+    for name in (VECTORS_FILE, DOCUMENTS_FILE, OFFSETS_FILE):
+        with open(os.path.join(str(tmp_path), name), "ab") as f:
+            f.write(b"partial")
+
+    reopened = make_store(str(tmp_path), vectors)
+    add_chunks(reopened, range(50, 100))
+
+    assert len(reopened) == 100
+    assert reopened.similarity_search("chunk-75", k=1)[0].page_content == "chunk-75"
+
+
+def test_interrupted_training_falls_back_to_exhaustive_search(tmp_path: str) -> None:
+    """Test that a store saved mid-training is searched exactly and retrained."""
+    vectors = make_vectors(1000, DIM, num_clusters=5)
+    store = make_store(str(tmp_path), vectors, min_train_size=500)
+    add_chunks(store, range(600))
+    # The state committed before the centroids and assignments are replaced
+    with open(os.path.join(str(tmp_path), META_FILE), "w") as f:
+        json.dump({"dim": DIM, "count": 600, "trained_count": 0}, f)
+
+    reopened = make_store(str(tmp_path), vectors, min_train_size=500)
+    assert reopened.similarity_search("chunk-300", k=1)[0].page_content == "chunk-300"
+    add_chunks(reopened, range(600, 700))
+
+    assert len(reopened) == 700
+    assert reopened.similarity_search("chunk-650", k=1)[0].page_content == "chunk-650"
@@ -0,0 +1,107 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from app.patterns.custom_rag_qa.retrieval_cache import (
+    RetrievalCache,
+    get_store_version,
+)
+from langchain_core.documents import Document
+
+DOCS = [Document(page_content="How to deploy a model")]
+
+
+def test_exact_hit_ignores_case_and_whitespace() -> None:
+    """Test that exact lookups match normalized query text."""
+    cache = RetrievalCache()
+    cache.put("How do I deploy?", [1.0, 0.0], DOCS)
+
+    assert cache.get("  how do I   DEPLOY? ") == DOCS
+    assert cache.get("How do I train?") is None
+    assert cache.get_stats()["exact_hits"] == 1
+
+
+def test_semantic_hit_above_threshold() -> None:
+    """Test that similar query embeddings hit and dissimilar ones miss."""
+    cache = RetrievalCache(similarity_threshold=0.9)
+    cache.put("How do I deploy?", [1.0, 0.0], DOCS)
+
+    assert cache.get_similar([0.99, 0.1]) == DOCS
+    assert cache.get_similar([0.0, 1.0]) is None
+
+    stats = cache.get_stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_entries_expire_after_ttl() -> None:
+    """Test that expired results are neither exact nor semantic hits."""
+    cache = RetrievalCache(ttl_seconds=0)
+    cache.put("How do I deploy?", [1.0, 0.0], DOCS)
+
+    assert cache.get("How do I deploy?") is None
+    assert cache.get_similar([1.0, 0.0]) is None
+
+
+def test_lru_eviction() -> None:
+    """Test that the least recently used result is evicted first."""
+    cache = RetrievalCache(max_entries=2)
+    cache.put("first", [1.0, 0.0], DOCS)
+    cache.put("second", [0.0, 1.0], DOCS)
+    cache.get("first")
+    cache.put("third", [-1.0, 0.0], DOCS)
+
+    assert cache.get("first") == DOCS
+    assert cache.get("second") is None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_semantic_lookup_after_eviction_and_update() -> None:
+    """Test that evicted and replaced embeddings are not semantic hits."""
+    other_docs = [Document(page_content="How to train a model")]
+    cache = RetrievalCache(max_entries=2, similarity_threshold=0.9)
+    cache.put("first", [1.0, 0.0], DOCS)
+    cache.put("second", [0.0, 1.0], DOCS)
+    cache.put("third", [-1.0, 0.0], other_docs)
+    cache.put("second", [0.0, -1.0], other_docs)
+
+    assert cache.get_similar([1.0, 0.0]) is None
+    assert cache.get_similar([0.0, 1.0]) is None
+    assert cache.get_similar([0.0, -1.0]) == other_docs
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_store_version_change_invalidates_results(tmp_path: str) -> None:
+    """Test that results are dropped when the persisted vector store changes."""
+    persist_path = os.path.join(tmp_path, "store.json")
+    assert get_store_version(persist_path) is None
+
+    with open(persist_path, "w") as f:
+        f.write("v1")
+    cache = RetrievalCache()
+    cache.set_version(get_store_version(persist_path))
+    cache.put("How do I deploy?", [1.0, 0.0], DOCS)
+    cache.put_embedding("How do I deploy?", [1.0, 0.0])
+
+    cache.set_version(get_store_version(persist_path))
+    assert cache.get("How do I deploy?") == DOCS
+
+    with open(persist_path, "w") as f:
+        f.write("version 2")
+    cache.set_version(get_store_version(persist_path))
+    assert cache.get("How do I deploy?") is None
+    assert cache.get_embedding("How do I deploy?") == [1.0, 0.0]
+    assert cache.get_stats()["invalidations"] == 1
@@ -0,0 +1,101 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from langchain_core.messages import HumanMessage
+import pytest
+from tests.benchmark.benchmark import (
+    compare_to_baseline,
+    make_conversations,
+    percentile,
+)
+from tests.benchmark.fake_llm import FakeChatVertexAI
+
+
+@pytest.mark.asyncio
+async def test_fake_llm_streams_deterministic_tokens() -> None:
+    """Test that the fake LLM streams the same response for the same conversation."""
+    llm = FakeChatVertexAI(
+        first_token_delay=0, tokens_per_second=10_000, response_tokens=5
+    )
+    messages = [HumanMessage(content="How do I make bread?")]
+
+    chunks = [str(chunk.content) async for chunk in llm.astream(messages)]
+
+    assert len(chunks) == 5
+    assert "".join(chunks) == llm.invoke(messages).content
+    assert chunks != [
+        str(chunk.content)
+        async for chunk in llm.astream([HumanMessage(content="And pasta?")])
+    ]
+
+
+def test_make_conversations_vary_in_length() -> None:
+    """Test that generated conversations vary in length and end with a human turn."""
+    conversations = make_conversations(20, max_turns=5)
+    assert len({len(messages) for messages in conversations}) > 1
+    assert all(messages[-1]["type"] == "human" for messages in conversations)
+
+
+def test_percentile() -> None:
+    """Test the linear interpolation of percentiles."""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([], 95) == 0.0
+
+
+def test_compare_to_baseline() -> None:
+    """Test that only slowdowns beyond the tolerance are reported."""
+    baseline = {
+        "levels": [
+            {"concurrency": 1, "total_time": {"p50": 1.0, "p99": 2.0}},
+            {"concurrency": 8, "total_time": {"p50": 1.0}},
+        ]
+    }
+    results = {
+        "levels": [
+            {"concurrency": 1, "total_time": {"p50": 1.1, "p99": 3.0}},
+            {"concurrency": 16, "total_time": {"p50": 5.0}},
+        ]
+    }
+
+    regressions = compare_to_baseline(results, baseline, tolerance=0.2)
+
+    assert len(regressions) == 1
+    assert "concurrency=1 total_time.p99" in regressions[0]
+
+
+def test_compare_to_baseline_reports_failed_requests() -> None:
+    """Test that errors and levels without any stream are regressions."""
+    baseline = {
+        "levels": [
+            {"concurrency": 1, "streams": 10, "errors": 1},
+            {"concurrency": 8, "streams": 10, "errors": 0},
+        ]
+    }
+    results = {
+        "levels": [
+            {"concurrency": 1, "streams": 9, "errors": 1},
+            {"concurrency": 8, "streams": 0, "errors": 10},
+            {"concurrency": 16, "streams": 9, "errors": 1},
+        ]
+    }
+
+    regressions = compare_to_baseline(results, baseline, tolerance=0.2)
+
+    assert regressions == [
+        "concurrency=8: no stream completed",
+        "concurrency=8 errors: 10 vs baseline 0",
+        "concurrency=16 errors: 1 vs baseline 0",
+    ]
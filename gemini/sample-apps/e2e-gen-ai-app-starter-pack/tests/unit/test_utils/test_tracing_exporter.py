@@ -13,13 +13,17 @@
 # limitations under the License.
 # pylint: disable=W0621, W0613, W0212
 
-from typing import Any, Generator
+import threading
+from typing import Any, Generator, Optional
 from unittest.mock import Mock, patch
 
 from app.utils.tracing import CloudTraceLoggingSpanExporter
 from google.cloud import logging as google_cloud_logging
 from google.cloud import storage
+from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
 from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.trace import SpanContext
 import pytest
 
 
@@ -60,6 +64,15 @@ def patch_clients(
             yield
 
 
+@pytest.fixture
+def patch_trace_export() -> Generator[Mock, None, None]:
+    """Patch the Cloud Trace export of the parent class."""
+    with patch.object(
+        CloudTraceSpanExporter, "export", return_value=SpanExportResult.SUCCESS
+    ) as mock_export:
+        yield mock_export
+
+
 @pytest.fixture
 def exporter(
     mock_logging_client: Mock,
@@ -67,6 +80,7 @@ def exporter(
     patch_auth: Any,
     mock_credentials: Any,
     patch_clients: Any,
+    patch_trace_export: Mock,
 ) -> CloudTraceLoggingSpanExporter:
     """Create a CloudTraceLoggingSpanExporter instance for testing."""
     exporter = CloudTraceLoggingSpanExporter(
@@ -124,19 +138,133 @@ def test_process_large_attributes_large_payload(
     assert "traceloop.association.properties.key2" in result["attributes"]
 
 
+def make_span(span_id: int, attributes: Optional[dict] = None) -> ReadableSpan:
+    """Create a finished span for testing."""
+    return ReadableSpan(
+        name="test-span",
+        context=SpanContext(trace_id=123, span_id=span_id, is_remote=False),
+        attributes=attributes or {"key": "value"},
+        start_time=1,
+        end_time=2,
+    )
+
+
 @patch.object(CloudTraceLoggingSpanExporter, "_process_large_attributes")
 def test_export(
     mock_process_large_attributes: Mock, exporter: CloudTraceLoggingSpanExporter
 ) -> None:
     """Test the export method of CloudTraceLoggingSpanExporter."""
-    mock_span = Mock(spec=ReadableSpan)
-    mock_span.get_span_context.return_value.trace_id = 123
-    mock_span.get_span_context.return_value.span_id = 456
-    mock_span.to_json.return_value = '{"key": "value"}'
-
     mock_process_large_attributes.return_value = {"processed": "data"}
 
-    exporter.export([mock_span])
+    exporter.export([make_span(456)])
 
     mock_process_large_attributes.assert_called_once()
-    exporter.logger.log_struct.assert_called_once()
+    span_dict = mock_process_large_attributes.call_args.kwargs["span_dict"]
+    assert span_dict["attributes"] == {"key": "value"}
+    assert span_dict["trace"] == "projects/test-project/traces/7b"
+    assert span_dict["span_id"] == "1c8"
+    batch = exporter.logger.batch.return_value
+    batch.log_struct.assert_called_once_with({"processed": "data"}, severity="INFO")
+    batch.commit.assert_called_once()
+
+
+def test_export_batches_log_writes(exporter: CloudTraceLoggingSpanExporter) -> None:
+    """Test that all spans of an export are written in a single logging call."""
+    exporter.export([make_span(span_id) for span_id in range(1, 6)])
+
+    batch = exporter.logger.batch.return_value
+    assert batch.log_struct.call_count == 5
+    batch.commit.assert_called_once()
+    exporter.logger.log_struct.assert_not_called()
+    assert exporter.get_stats()["exported_spans"] == 5
+
+
+def test_export_splits_log_writes_by_size_and_count(
+    exporter: CloudTraceLoggingSpanExporter,
+) -> None:
+    """Test that writes stay under the entry count and request size limits."""
+    batches = [Mock(), Mock(), Mock(), Mock()]
+    exporter.logger.batch.side_effect = batches
+    exporter.max_batch_entries = 3
+    exporter.max_batch_bytes = 100 * 1024
+
+    spans = [make_span(span_id) for span_id in range(1, 5)]
+    spans += [make_span(span_id, {"key": "a" * 60 * 1024}) for span_id in (5, 6)]
+    exporter.export(spans)
+
+    assert [batch.log_struct.call_count for batch in batches] == [3, 2, 1, 0]
+    for batch in batches[:3]:
+        batch.commit.assert_called_once()
+    assert exporter.get_stats()["exported_spans"] == 6
+
+
+def test_export_counts_failed_log_writes(
+    exporter: CloudTraceLoggingSpanExporter,
+) -> None:
+    """Test that a failed logging call is counted instead of raised."""
+    exporter.logger.batch.return_value.commit.side_effect = RuntimeError("boom")
+
+    exporter.export([make_span(1), make_span(2)])
+
+    assert exporter.get_stats()["failed_log_writes"] == 2
+
+
+def test_large_payload_uploaded_in_background(
+    exporter: CloudTraceLoggingSpanExporter,
+) -> None:
+    """Test that large payloads are uploaded by the upload pool."""
+    span = make_span(456, {"key": "a" * (400 * 1024)})
+
+    exporter.export([span])
+    exporter.shutdown()
+
+    exporter.bucket.blob.assert_called_once_with("spans/1c8.json")
+    exporter.bucket.blob.return_value.upload_from_string.assert_called_once()
+    assert exporter.get_stats()["upload_queue_depth"] == 0
+
+
+def test_uploads_dropped_when_queue_full(
+    exporter: CloudTraceLoggingSpanExporter,
+) -> None:
+    """Test that uploads beyond max_pending_uploads are dropped and counted."""
+    release = threading.Event()
+    exporter.bucket.blob.return_value.upload_from_string.side_effect = (
+        lambda *args: release.wait()
+    )
+    exporter.max_pending_uploads = 2
+
+    uris = [exporter._submit_upload("content", str(i)) for i in range(3)]
+
+    assert uris[:2] == [
+        "gs://test-bucket/spans/0.json",
+        "gs://test-bucket/spans/1.json",
+    ]
+    assert uris[2] == "GCS upload dropped"
+    assert exporter.upload_queue_depth == 2
+    assert exporter.get_stats()["dropped_uploads"] == 1
+    release.set()
+    exporter.shutdown()
+    assert exporter.upload_queue_depth == 0
+
+
+def test_bucket_check_cached(exporter: CloudTraceLoggingSpanExporter) -> None:
+    """Test that the bucket existence check is cached."""
+    exporter.bucket.exists.return_value = True
+
+    for i in range(3):
+        exporter.store_in_gcs("content", str(i))
+
+    exporter.bucket.exists.assert_called_once()
+
+
+def test_missing_bucket_rechecked_after_interval(
+    exporter: CloudTraceLoggingSpanExporter,
+) -> None:
+    """Test that a missing bucket is only checked again after the interval."""
+    exporter.bucket.exists.return_value = False
+    exporter.bucket_check_interval = 0
+
+    assert exporter.store_in_gcs("content", "1") == "GCS bucket not found"
+    exporter.bucket.exists.return_value = True
+    assert exporter.store_in_gcs("content", "2") == "gs://test-bucket/spans/2.json"
+    assert exporter.bucket.exists.call_count == 2
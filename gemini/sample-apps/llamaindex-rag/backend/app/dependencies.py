@@ -1,6 +1,7 @@
 import logging
 
-from backend.app.shared_state import index_manager, prompts
+from backend.app.eval_jobs import EvalJobManager
+from backend.app.shared_state import eval_job_manager, index_manager, prompts
 from shared_state import IndexManager, Prompts
 
 logger = logging.getLogger(__name__)
@@ -15,3 +16,7 @@ def get_index_manager() -> IndexManager:
 
 def get_prompts() -> Prompts:
     return prompts
+
+
+def get_eval_job_manager() -> EvalJobManager:
+    return eval_job_manager
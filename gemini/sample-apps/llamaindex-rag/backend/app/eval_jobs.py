@@ -0,0 +1,75 @@
+"""Background worker pool for response evaluation jobs"""
+
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class EvalJobManager:
+    """
+    Runs evaluation jobs on a bounded thread pool so that the blocking
+    evaluation calls stay off the FastAPI event loop. Each job gets an id
+    whose status and result can be polled until it completes. Only the
+    most recent max_jobs jobs are kept.
+    """
+
+    def __init__(self, max_workers: int = 4, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="eval-job"
+        )
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, *args, **kwargs) -> str:
+        """Queue func(*args, **kwargs) on the worker pool and return the job id"""
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "pending",
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "completed_at": None,
+            }
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job_id, func, *args, **kwargs)
+        return job_id
+
+    def _run(self, job_id: str, func: Callable, *args, **kwargs) -> None:
+        self._update(job_id, status="running")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"Evaluation job {job_id} failed")
+            self._update(
+                job_id, status="failed", error=str(e), completed_at=time.time()
+            )
+        else:
+            self._update(
+                job_id, status="completed", result=result, completed_at=time.time()
+            )
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            # The job may have been evicted while it was running
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> dict | None:
+        """Return a snapshot of the job's status and result, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs and wait for the running ones to finish"""
+        self._executor.shutdown(wait=True)
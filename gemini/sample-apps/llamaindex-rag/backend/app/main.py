@@ -1,6 +1,10 @@
+import asyncio
+from contextlib import asynccontextmanager
 import logging
 
 from backend.app.routers import evaluation, indexes, prompts, rag
+from backend.app.shared_state import eval_job_manager
+from backend.rag.node_reranker import aclose_http_client
 from fastapi import FastAPI
 import uvicorn
 
@@ -8,7 +12,17 @@ import uvicorn
 logging.basicConfig(filename="eval.log", encoding="utf-8", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Let running evaluation jobs finish without blocking the event loop
+    await asyncio.to_thread(eval_job_manager.shutdown)
+    # Close the reranker's pooled connections on the server's event loop
+    await aclose_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Include routers
 app.include_router(prompts.router, tags=["prompts"])
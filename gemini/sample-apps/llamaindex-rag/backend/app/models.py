@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class IndexUpdate(BaseModel):
@@ -31,6 +31,8 @@ class RAGConfig(BaseModel):
 class RAGRequest(RAGConfig):
     query: str = "What were Google's Q1 Earnings?"
     evaluate_response: bool
+    # Evaluate before responding instead of in a background job
+    inline_evaluation: bool = False
     eval_model_name: str | None = "gemini-1.5-flash"
     embedding_model_name: str | None = "text-embedding-004"
 
@@ -41,3 +43,8 @@ class EvalRequest(RAGConfig):
     input_eval_dataset_bucket_uri: str = "test_rag_questions/test_ground_truth.csv"
     bq_eval_results_table_id: str = "eval_results.eval_results_table"
     ragas_metrics: list[str] = ["faithfulness", "answer_relevancy"]
+    max_concurrency: int = Field(default=8, ge=1)
+    # Local JSONL file used to resume an interrupted evaluation run
+    checkpoint_path: str | None = None
+    # Write evaluated items to bq_eval_results_table_id in batches as they finish
+    write_results_to_bq: bool = False
@@ -1,9 +1,10 @@
+import asyncio
 from datetime import datetime
 import logging
 import uuid
 
 from backend.app.dependencies import get_index_manager, get_prompts
-from backend.app.models import EvalRequest
+from backend.app.models import EvalRequest, RAGConfig
 from backend.rag.evaluate import LLMEvaluator
 from common.utils import download_blob
 from datasets import Dataset
@@ -36,7 +37,7 @@ ragas_metrics_dict = {
 
 
 @router.post("/eval_batch")
-def eval_batch(
+async def eval_batch(
     eval_batch_request: EvalRequest,
     index_manager=Depends(get_index_manager),
     prompts=Depends(get_prompts),
@@ -59,7 +60,7 @@ def eval_batch(
     )
     logger.info(bucket_name)
     logger.info(file_name)
-    download_blob(bucket_name, file_name, "ground_truth.csv")
+    await asyncio.to_thread(download_blob, bucket_name, file_name, "ground_truth.csv")
     eval_df = pd.read_csv("./ground_truth.csv")
     eval_df = eval_df[["question", "ground_truth"]]
     eval_df = eval_df.astype({"question": str, "ground_truth": str})
@@ -70,6 +71,7 @@ def eval_batch(
         user_prompt=prompts.eval_prompt_wcontext_user,
         eval_model_name=eval_batch_request.eval_model_name,
         temperature=eval_batch_request.temperature,
+        max_concurrency=eval_batch_request.max_concurrency,
     )
 
     if eval_batch_request.use_react:
@@ -78,9 +80,34 @@ def eval_batch(
             llm_name=eval_batch_request.llm_name,
             temperature=eval_batch_request.temperature,
         )
-        eval_df = llm_evaluator.evaluate(react_agent.achat, eval_df)
+        retrieval_qa_func = react_agent.achat
     else:
-        eval_df = llm_evaluator.evaluate(query_engine.aquery, eval_df)
+        retrieval_qa_func = query_engine.aquery
+    eval_df = await llm_evaluator.async_eval_retrieval(
+        retrieval_qa_func,
+        eval_df,
+        checkpoint_path=eval_batch_request.checkpoint_path,
+        bq_table_id=(
+            eval_batch_request.bq_eval_results_table_id
+            if eval_batch_request.write_results_to_bq
+            else None
+        ),
+        run_config=eval_batch_request.model_dump(include=set(RAGConfig.model_fields)),
+    )
+    logger.info(llm_evaluator.progress)
+    eval_df["question_idx"] = eval_df.index
+
+    # ragas expects an answer and contexts for every row, so questions that
+    # failed after retries are reported separately instead of evaluated
+    failed_df = eval_df[eval_df["error"].notna()]
+    eval_df = (
+        eval_df[eval_df["error"].isna()].drop(columns="error").reset_index(drop=True)
+    )
+    if not failed_df.empty:
+        logger.warning(f"{len(failed_df)} questions failed to evaluate")
+    failed_items = failed_df[["question_idx", "question", "error"]].to_dict(
+        orient="records"
+    )
 
     vertexai_llm = ChatVertexAI(model_name=eval_batch_request.eval_model_name)
     vertexai_embeddings = VertexAIEmbeddings(
@@ -91,10 +118,18 @@ def eval_batch(
     logger.info(eval_df.columns)
 
     metrics = [ragas_metrics_dict[m] for m in eval_batch_request.ragas_metrics]
-    result = evaluate(
-        eval_df_ds, metrics=metrics, llm=vertexai_llm, embeddings=vertexai_embeddings
-    )
-    ragas_results_df = result.to_pandas()[eval_batch_request.ragas_metrics].fillna(0)
+    if eval_df.empty:
+        ragas_results_df = pd.DataFrame(columns=eval_batch_request.ragas_metrics)
+    else:
+        result = await asyncio.to_thread(
+            evaluate,
+            eval_df_ds,
+            metrics=metrics,
+            llm=vertexai_llm,
+            embeddings=vertexai_embeddings,
+        )
+        ragas_results_df = result.to_pandas()[eval_batch_request.ragas_metrics]
+        ragas_results_df = ragas_results_df.fillna(0)
 
     eval_uuid = str(uuid.uuid4())
     eval_df["date_time"] = datetime.now()
@@ -103,7 +138,6 @@ def eval_batch(
     eval_df["eval_model_name"] = eval_batch_request.eval_model_name
     eval_df["similarity_top_k"] = eval_batch_request.similarity_top_k
     eval_df["llm_model_name"] = eval_batch_request.llm_name
-    eval_df["question_idx"] = eval_df.index
 
     eval_df = pd.concat([eval_df, ragas_results_df], axis=1)
     logging.info(eval_df.to_dict(orient="list"))
@@ -111,4 +145,4 @@ def eval_batch(
     # Uncomment the following line if you want to write results to BigQuery
     # write_results_to_bq(eval_df, table_id=eval_batch_request.bq_eval_results_table_id)
     logging.info(f"EVAL ID: {eval_uuid}")
-    return eval_df.to_dict(orient="list")
+    return {**eval_df.to_dict(orient="list"), "failed_items": failed_items}
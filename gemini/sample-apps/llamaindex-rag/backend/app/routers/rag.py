@@ -1,10 +1,21 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from functools import lru_cache
+import json
 import logging
 
-from backend.app.dependencies import get_index_manager, get_prompts
+from backend.app.dependencies import (
+    get_eval_job_manager,
+    get_index_manager,
+    get_prompts,
+)
 from backend.app.models import RAGRequest
 from datasets import Dataset
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from langchain_google_vertexai import ChatVertexAI, VertexAIEmbeddings
+from llama_index.core import QueryBundle
+from llama_index.core.base.response.schema import AsyncStreamingResponse
 import pandas as pd
 from ragas import evaluate
 from ragas.metrics import answer_relevancy, context_relevancy, faithfulness
@@ -18,6 +29,7 @@ async def query_rag(
     rag_request: RAGRequest,
     index_manager=Depends(get_index_manager),
     prompts=Depends(get_prompts),
+    eval_job_manager=Depends(get_eval_job_manager),
 ) -> dict:
     query_engine = index_manager.get_query_engine(
         prompts=prompts,
@@ -41,39 +53,179 @@ async def query_rag(
     else:
         response = await query_engine.aquery(rag_request.query)
 
-    if rag_request.evaluate_response:
-        retrieved_contexts = [r.node.text for r in response.source_nodes]
-        eval_df = pd.DataFrame(
-            {
-                "question": rag_request.query,
-                "answer": [response.response],
-                "contexts": [retrieved_contexts],
-            }
-        )
-        eval_df_ds = Dataset.from_pandas(eval_df)
-
-        vertexai_llm = ChatVertexAI(model_name=rag_request.eval_model_name)
-        vertexai_embeddings = VertexAIEmbeddings(
-            model_name=rag_request.embedding_model_name
-        )
-
-        metrics = [answer_relevancy, faithfulness, context_relevancy]
-        result = evaluate(
-            eval_df_ds,
-            metrics=metrics,
-            llm=vertexai_llm,
-            embeddings=vertexai_embeddings,
-        )
-        result_dict = (
-            result.to_pandas()[
-                ["answer_relevancy", "faithfulness", "context_relevancy"]
-            ]
-            .fillna(0)
-            .iloc[0]
-            .to_dict()
+    if rag_request.evaluate_response and rag_request.inline_evaluation:
+        # Evaluation is blocking, so keep it off the event loop
+        result_dict = await asyncio.to_thread(
+            evaluate_rag_response,
+            rag_request,
+            response.response,
+            response.source_nodes,
         )
         retrieved_context_dict = {"retrieved_chunks": response.source_nodes}
-        logger.info(result_dict)
         return {"response": response.response} | result_dict | retrieved_context_dict
+    elif rag_request.evaluate_response:
+        eval_job_id = eval_job_manager.submit(
+            evaluate_rag_response,
+            rag_request,
+            response.response,
+            response.source_nodes,
+        )
+        return {
+            "response": response.response,
+            "retrieved_chunks": response.source_nodes,
+            "eval_job_id": eval_job_id,
+        }
     else:
         return {"response": response.response}
+
+
+@router.get("/eval_jobs/{job_id}")
+async def get_eval_job(job_id: str, eval_job_manager=Depends(get_eval_job_manager)):
+    """Poll the status and, once completed, the metrics of an evaluation job"""
+    job = eval_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    return job
+
+
+@lru_cache(maxsize=8)
+def get_eval_clients(
+    eval_model_name: str, embedding_model_name: str
+) -> tuple[ChatVertexAI, VertexAIEmbeddings]:
+    """Return the evaluation LLM and embeddings, reused across requests"""
+    vertexai_llm = ChatVertexAI(model_name=eval_model_name)
+    vertexai_embeddings = VertexAIEmbeddings(model_name=embedding_model_name)
+    return vertexai_llm, vertexai_embeddings
+
+
+def evaluate_rag_response(
+    rag_request: RAGRequest, answer: str, source_nodes: list
+) -> dict:
+    """Score a RAG answer and its retrieved nodes with ragas"""
+    retrieved_contexts = [r.node.text for r in source_nodes]
+    eval_df = pd.DataFrame(
+        {
+            "question": rag_request.query,
+            "answer": [answer],
+            "contexts": [retrieved_contexts],
+        }
+    )
+    eval_df_ds = Dataset.from_pandas(eval_df)
+
+    vertexai_llm, vertexai_embeddings = get_eval_clients(
+        rag_request.eval_model_name, rag_request.embedding_model_name
+    )
+
+    metrics = [answer_relevancy, faithfulness, context_relevancy]
+    result = evaluate(
+        eval_df_ds,
+        metrics=metrics,
+        llm=vertexai_llm,
+        embeddings=vertexai_embeddings,
+    )
+    result_dict = (
+        result.to_pandas()[["answer_relevancy", "faithfulness", "context_relevancy"]]
+        .fillna(0)
+        .iloc[0]
+        .to_dict()
+    )
+    logger.info(result_dict)
+    return result_dict
+
+
+def format_sse(event: str, data) -> str:
+    """Format a server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def serialize_source_nodes(source_nodes) -> list[dict]:
+    """Return the JSON-serializable fields of retrieved nodes"""
+    return [
+        {
+            "node_id": n.node.node_id,
+            "text": n.node.get_content(),
+            "score": n.score,
+            "metadata": n.node.metadata,
+        }
+        for n in source_nodes
+    ]
+
+
+@router.post("/query_rag_stream")
+async def query_rag_stream(
+    rag_request: RAGRequest,
+    index_manager=Depends(get_index_manager),
+    prompts=Depends(get_prompts),
+    eval_job_manager=Depends(get_eval_job_manager),
+) -> StreamingResponse:
+    """
+    Streaming variant of /query_rag using server-sent events. Emits a
+    `sources` event with the retrieved nodes as soon as retrieval completes,
+    then one `token` event per synthesized token and finally a `done` event
+    with the full response. When evaluate_response is set, the `done` event
+    also carries the id of the background evaluation job, or an `evaluation`
+    event with the metrics precedes it if inline_evaluation is set.
+    """
+    query_engine = index_manager.get_query_engine(
+        prompts=prompts,
+        llm_name=rag_request.llm_name,
+        temperature=rag_request.temperature,
+        similarity_top_k=rag_request.similarity_top_k,
+        retrieval_strategy=rag_request.retrieval_strategy,
+        use_hyde=rag_request.use_hyde,
+        use_refine=rag_request.use_refine,
+        use_node_rerank=rag_request.use_node_rerank,
+        qa_followup=rag_request.qa_followup,
+        hybrid_retrieval=rag_request.hybrid_retrieval,
+        # The ReAct agent wraps this engine as a tool and needs full responses
+        streaming=not rag_request.use_react,
+    )
+    react_agent = None
+    if rag_request.use_react:
+        react_agent = index_manager.get_react_agent(
+            prompts=prompts,
+            llm_name=rag_request.llm_name,
+            temperature=rag_request.temperature,
+        )
+
+    async def event_stream() -> AsyncGenerator[str, None]:
+        try:
+            if react_agent is not None:
+                # The ReAct agent reasons over several steps, so it is not streamed
+                response = await react_agent.achat(rag_request.query)
+                answer, source_nodes = response.response, response.source_nodes
+                yield format_sse("sources", serialize_source_nodes(source_nodes))
+                yield format_sse("token", {"delta": answer})
+            else:
+                # Works for both the plain and the HyDE-wrapped query engine
+                query_bundle = QueryBundle(rag_request.query)
+                source_nodes = await query_engine.aretrieve(query_bundle)
+                yield format_sse("sources", serialize_source_nodes(source_nodes))
+
+                response = await query_engine.asynthesize(query_bundle, source_nodes)
+                if isinstance(response, AsyncStreamingResponse):
+                    tokens = []
+                    async for token in response.async_response_gen():
+                        tokens.append(token)
+                        yield format_sse("token", {"delta": token})
+                    answer = "".join(tokens)
+                else:
+                    answer = str(response)
+                    yield format_sse("token", {"delta": answer})
+
+            done = {"response": answer}
+            if rag_request.evaluate_response and rag_request.inline_evaluation:
+                result_dict = await asyncio.to_thread(
+                    evaluate_rag_response, rag_request, answer, source_nodes
+                )
+                yield format_sse("evaluation", result_dict)
+            elif rag_request.evaluate_response:
+                done["eval_job_id"] = eval_job_manager.submit(
+                    evaluate_rag_response, rag_request, answer, source_nodes
+                )
+            yield format_sse("done", done)
+        except Exception as e:
+            logger.exception("Streaming query failed")
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
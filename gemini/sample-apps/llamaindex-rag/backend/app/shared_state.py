@@ -1,3 +1,4 @@
+from backend.app.eval_jobs import EvalJobManager
 from backend.rag.index_manager import IndexManager
 from backend.rag.prompts import Prompts
 from common.utils import load_config
@@ -34,3 +35,5 @@ index_manager = IndexManager(
     firestore_namespace=FIRESTORE_NAMESPACE,
     vs_bucket_name=BUCKET_NAME,
 )
+
+eval_job_manager = EvalJobManager()
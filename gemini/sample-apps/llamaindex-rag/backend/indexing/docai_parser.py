@@ -1,5 +1,9 @@
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
+import os
+import re
 import time
 import traceback
 
@@ -42,7 +46,8 @@ class DocAIParser:
         chunk_size: int = 500,
         include_ancestor_headings: bool = True,
         timeout_sec: int = 3600,
-        check_in_interval_sec: int = 60,
+        check_in_interval_sec: int = 10,
+        manifest_path: str | None = None,
     ) -> tuple[list[Document], list["DocAIParsingResults"]]:  # noqa: F821
         """
         Parses a list of blobs using Document AI.
@@ -53,25 +58,27 @@ class DocAIParser:
             include_ancestor_headings: Whether to include ancestor headings.
             timeout_sec: Timeout in seconds for the operation.
             check_in_interval_sec: Check-in interval in seconds.
+            manifest_path: Optional local manifest of already parsed sources,
+                see iter_batch_parse.
 
         Returns:
             A tuple containing a list of parsed documents and a list of
             DocAIParsingResults.
         """
+        parsed_docs = []
+        results = []
         try:
-            operations = self._start_batch_process(
-                blobs, chunk_size, include_ancestor_headings
-            )
-            print(f"Number of operations started: {len(operations)}")
-            self._wait_for_operations(operations, timeout_sec, check_in_interval_sec)
-            print("Operations completed successfully")
-
-            for i, operation in enumerate(operations):
-                print(f"Operation {i + 1} metadata: {operation.metadata}")
-
-            results = self._get_results(operations)
+            for result, documents in self.iter_batch_parse(
+                blobs,
+                chunk_size=chunk_size,
+                include_ancestor_headings=include_ancestor_headings,
+                timeout_sec=timeout_sec,
+                check_in_interval_sec=check_in_interval_sec,
+                manifest_path=manifest_path,
+            ):
+                results.append(result)
+                parsed_docs.extend(documents)
             print(f"Number of results: {len(results)}")
-            parsed_docs = self._parse_from_results(results)
             print(f"Number of parsed documents: {len(parsed_docs)}")
             return parsed_docs, results
         except Exception as e:
@@ -80,7 +87,131 @@ class DocAIParser:
             traceback.print_exc()
             # Return any successfully parsed documents
             # instead of raising an exception
-            return [], []
+            return parsed_docs, results
+
+    def iter_batch_parse(
+        self,
+        blobs: list[Blob],
+        chunk_size: int = 500,
+        include_ancestor_headings: bool = True,
+        timeout_sec: int = 3600,
+        check_in_interval_sec: int = 10,
+        max_documents_per_operation: int = 50,
+        max_concurrent_operations: int = 5,
+        max_download_workers: int = 8,
+        manifest_path: str | None = None,
+    ) -> Iterator[tuple["DocAIParsingResults", list[Document]]]:  # noqa: F821
+        """
+        Parses a list of blobs using Document AI, yielding the parsed documents
+        of each source as soon as its operation finishes.
+
+        The blobs are split into shards of max_documents_per_operation, and up to
+        max_concurrent_operations batch operations run at once. The output JSON
+        files of each finished operation are downloaded and parsed in parallel.
+
+        A source that could not be parsed, because its operation failed or timed
+        out, Document AI reported an error for it, or one of its output files
+        could not be downloaded, is yielded with its error set and no documents.
+        The other sources are not affected.
+
+        If manifest_path is set, it points to a local JSON manifest of the
+        sources parsed by previous runs. Sources whose generation, or MD5 hash
+        when the generation is unknown, has not changed since are skipped. A
+        source is recorded once all of its output files were parsed and its
+        documents have been consumed, and the manifest is saved once per shard.
+
+        Args:
+            blobs: List of GCS Blobs to parse.
+            chunk_size: Chunk size for Document AI processing.
+            include_ancestor_headings: Whether to include ancestor headings.
+            timeout_sec: Timeout in seconds for each operation. Operations that
+                take longer are cancelled and their sources reported as failed.
+            check_in_interval_sec: Check-in interval in seconds.
+            max_documents_per_operation: Maximum number of blobs per operation.
+            max_concurrent_operations: Maximum number of operations in flight.
+            max_download_workers: Number of threads parsing output files.
+            manifest_path: Optional local manifest of already parsed sources.
+
+        Yields:
+            Tuples of DocAIParsingResults and the documents parsed from that source.
+        """
+        manifest = load_manifest(manifest_path)
+        pending_blobs = [
+            blob for blob in blobs if not is_parsed(manifest.get(blob.path), blob)
+        ]
+        print(
+            f"Skipping {len(blobs) - len(pending_blobs)} already parsed documents, "
+            f"parsing {len(pending_blobs)}"
+        )
+        shards = [
+            pending_blobs[i : i + max_documents_per_operation]
+            for i in range(0, len(pending_blobs), max_documents_per_operation)
+        ]
+        storage_client = storage.Client()
+
+        with ThreadPoolExecutor(max_workers=max_download_workers) as pool:
+            in_flight = []
+            next_shard = 0
+            while next_shard < len(shards) or in_flight:
+                while (
+                    next_shard < len(shards)
+                    and len(in_flight) < max_concurrent_operations
+                ):
+                    shard = shards[next_shard]
+                    (operation,) = self._start_batch_process(
+                        shard, chunk_size, include_ancestor_headings
+                    )
+                    in_flight.append((operation, shard, time.monotonic()))
+                    next_shard += 1
+
+                finished = [
+                    entry
+                    for entry in in_flight
+                    if entry[0].done() or time.monotonic() - entry[2] > timeout_sec
+                ]
+                if not finished:
+                    time.sleep(check_in_interval_sec)
+                    continue
+
+                for entry in finished:
+                    in_flight.remove(entry)
+                    operation, shard, _ = entry
+                    error = self._get_operation_error(operation, timeout_sec)
+                    if error:
+                        # Keep going so one failed shard does not lose the others
+                        print(f"Operation failed for {len(shard)} documents: {error}")
+                        for blob in shard:
+                            yield DocAIParsingResults(
+                                source_path=blob.path, parsed_path="", error=error
+                            ), []
+                        continue
+                    print(f"Operation completed, metadata: {operation.metadata}")
+
+                    blobs_by_path = {blob.path: blob for blob in shard}
+                    results = self._get_results([operation])
+                    recorded = False
+                    for result, documents in self._iter_parsed_results(
+                        results, storage_client, pool
+                    ):
+                        yield result, documents
+                        blob = blobs_by_path.get(result.source_path)
+                        if (
+                            manifest_path
+                            and blob is not None
+                            and result.error is None
+                            and documents
+                        ):
+                            manifest[blob.path] = {
+                                "generation": getattr(blob, "generation", None),
+                                "md5_hash": getattr(blob, "md5_hash", None),
+                                "parsed_path": result.parsed_path,
+                                "num_documents": len(documents),
+                            }
+                            recorded = True
+                    # Rewriting the manifest per source would be quadratic in
+                    # the number of sources
+                    if recorded:
+                        save_manifest(manifest_path, manifest)
 
     def _start_batch_process(
         self, blobs: list[Blob], chunk_size: int, include_ancestor_headings: bool
@@ -127,18 +258,17 @@ class DocAIParser:
             print(f"Error starting batch process: {str(e)}")
             raise
 
-    def _wait_for_operations(self, operations, timeout_sec, check_in_interval_sec):
-        time_elapsed = 0
-        while any(not operation.done() for operation in operations):
-            time.sleep(check_in_interval_sec)
-            time_elapsed += check_in_interval_sec
-            if time_elapsed > timeout_sec:
-                raise TimeoutError("Timeout exceeded!")
-
-        # Check for errors in completed operations
-        for operation in operations:
-            if operation.exception():
-                raise KeyError(f"Operation failed: {operation.exception()}")
+    @staticmethod
+    def _get_operation_error(operation, timeout_sec: int) -> str | None:
+        """Returns why a finished or timed-out operation failed, or None."""
+        if not operation.done():
+            try:
+                operation.cancel()
+            except Exception as e:
+                print(f"Error cancelling timed-out operation: {str(e)}")
+            return f"Operation timed out after {timeout_sec} seconds"
+        exception = operation.exception()
+        return str(exception) if exception else None
 
     def _get_results(self, operations) -> list["DocAIParsingResults"]:  # noqa: F821
         results = []
@@ -146,75 +276,136 @@ class DocAIParser:
             metadata = operation.metadata
             if hasattr(metadata, "individual_process_statuses"):
                 for status in metadata.individual_process_statuses:
+                    error = None
+                    # A non-zero google.rpc.Code means the document failed
+                    if status.status.code != 0:
+                        error = status.status.message or (
+                            f"Document AI status code {status.status.code}"
+                        )
+                    elif not status.output_gcs_destination:
+                        error = "Document AI returned no output destination"
+                    if error:
+                        print(f"Failed to parse {status.input_gcs_source}: {error}")
                     results.append(
                         DocAIParsingResults(
                             source_path=status.input_gcs_source,
                             parsed_path=status.output_gcs_destination,
+                            error=error,
                         )
                     )
             else:
                 print(f"Warning: Unexpected metadata structure: {metadata}")
         return results
 
-    def _parse_from_results(self, results: list["DocAIParsingResults"]):  # noqa: F821
-        documents = []
-        storage_client = storage.Client()
+    def _iter_parsed_results(
+        self,
+        results: list["DocAIParsingResults"],  # noqa: F821
+        storage_client: storage.Client,
+        pool: ThreadPoolExecutor,
+    ) -> Iterator[tuple["DocAIParsingResults", list[Document]]]:  # noqa: F821
+        """Downloads and parses the output files of all results in parallel,
+        yielding the documents of each result in order. A result whose output
+        could not be listed or downloaded is yielded with its error set and no
+        documents."""
+        listings = [
+            (
+                None
+                if result.error
+                else pool.submit(self._list_output_blobs, storage_client, result)
+            )
+            for result in results
+        ]
+        parsing = []
+        for result, listing in zip(results, listings):
+            futures = []
+            if listing is not None:
+                try:
+                    futures = [
+                        pool.submit(self._parse_output_blob, blob, result.source_path)
+                        for blob in listing.result()
+                    ]
+                except Exception as e:
+                    result.error = f"Error listing {result.parsed_path}: {str(e)}"
+            parsing.append((result, futures))
+
+        for result, futures in parsing:
+            documents = []
+            try:
+                documents = [doc for future in futures for doc in future.result()]
+            except Exception as e:
+                result.error = f"Error parsing output of {result.source_path}: {str(e)}"
+            if result.error:
+                print(result.error)
+                yield result, []
+                continue
+            print(f"Parsed {len(documents)} documents from {result.source_path}")
+            yield result, documents
+
+    @staticmethod
+    def _list_output_blobs(
+        storage_client: storage.Client,
+        result: "DocAIParsingResults",  # noqa: F821
+    ) -> list:
+        """Lists the output JSON files of a result in shard order."""
+        print(
+            f"Processing result: source_path={result.source_path}, "
+            f"parsed_path={result.parsed_path}"
+        )
+        if not result.parsed_path:
+            print(
+                "Warning: Empty parsed_path for source "
+                f"{result.source_path}. Skipping."
+            )
+            return []
 
-        for result in results:
+        try:
+            bucket_name, prefix = result.parsed_path.replace("gs://", "").split("/", 1)
+        except ValueError:
             print(
-                f"Processing result: source_path={result.source_path}, "
-                f"parsed_path={result.parsed_path}"
+                f"Error: Invalid parsed_path format for {result.source_path}. Skipping."
             )
-            if not result.parsed_path:
-                print(
-                    "Warning: Empty parsed_path for source "
-                    f"{result.source_path}. Skipping."
-                )
-                continue
+            return []
 
-            try:
-                bucket_name, prefix = result.parsed_path.replace("gs://", "").split(
-                    "/", 1
-                )
-            except ValueError:
-                print(
-                    f"Error: Invalid parsed_path format for {result.source_path}. Skipping."
-                )
-                continue
+        bucket = storage_client.bucket(bucket_name)
+        blobs = [
+            blob
+            for blob in bucket.list_blobs(prefix=prefix)
+            if blob.name.endswith(".json")
+        ]
+        print(f"Found {len(blobs)} blobs in {result.parsed_path}")
 
-            bucket = storage_client.bucket(bucket_name)
-            blobs = list(bucket.list_blobs(prefix=prefix))
-            print(f"Found {len(blobs)} blobs in {result.parsed_path}")
+        # Output shards are named <name>-<shard index>.json
+        def shard_index(blob) -> int:
+            match = re.search(r"-(\d+)\.json$", blob.name)
+            return int(match.group(1)) if match else 0
 
-            for blob in blobs:
-                if blob.name.endswith(".json"):
-                    print(f"Processing JSON blob: {blob.name}")
-                    try:
-                        content = blob.download_as_text()
-                        doc_data = json.loads(content)
+        return sorted(blobs, key=shard_index)
 
-                        if (
-                            "chunkedDocument" in doc_data
-                            and "chunks" in doc_data["chunkedDocument"]
-                        ):
-                            for chunk in doc_data["chunkedDocument"]["chunks"]:
-                                doc = Document(
-                                    text=chunk["content"],
-                                    metadata={
-                                        "chunk_id": chunk["chunkId"],
-                                        "source": result.source_path,
-                                    },
-                                )
-                                documents.append(doc)
-                        else:
-                            print(
-                                "Warning: Expected 'chunkedDocument' "
-                                f"structure not found in {blob.name}"
-                            )
-                    except Exception as e:
-                        print(f"Error processing blob {blob.name}: {str(e)}")
-
-        print(f"Total documents created: {len(documents)}")
+    @staticmethod
+    def _parse_output_blob(blob, source_path: str) -> list[Document]:
+        """Downloads one output JSON file and turns its chunks into documents."""
+        print(f"Processing JSON blob: {blob.name}")
+        documents = []
+        # Download and decoding errors propagate, so that a source is never
+        # recorded as parsed with some of its output missing
+        content = blob.download_as_text()
+        doc_data = json.loads(content)
+
+        if "chunkedDocument" in doc_data and "chunks" in doc_data["chunkedDocument"]:
+            for chunk in doc_data["chunkedDocument"]["chunks"]:
+                doc = Document(
+                    text=chunk["content"],
+                    metadata={
+                        "chunk_id": chunk["chunkId"],
+                        "source": source_path,
+                    },
+                )
+                documents.append(doc)
+        else:
+            print(
+                "Warning: Expected 'chunkedDocument' "
+                f"structure not found in {blob.name}"
+            )
         return documents
 
 
@@ -223,9 +414,45 @@ class DocAIParsingResults:
     Document AI Parsing Results
     """
 
-    def __init__(self, source_path: str, parsed_path: str):
+    def __init__(self, source_path: str, parsed_path: str, error: str | None = None):
         self.source_path = source_path
         self.parsed_path = parsed_path
+        # Why the source could not be parsed, None on success
+        self.error = error
+
+
+def load_manifest(manifest_path: str | None) -> dict[str, dict]:
+    """
+    Loads a local JSON manifest of parsed sources, keyed by source GCS URI.
+    """
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def is_parsed(entry: dict | None, blob: Blob) -> bool:
+    """
+    Checks whether a manifest entry was recorded for the current content of a
+    blob, by generation or, when the generation is unknown or changed, by MD5.
+    """
+    if not entry:
+        return False
+    generation = getattr(blob, "generation", None)
+    if generation is not None and entry.get("generation") == generation:
+        return True
+    md5_hash = getattr(blob, "md5_hash", None)
+    return md5_hash is not None and entry.get("md5_hash") == md5_hash
+
+
+def save_manifest(manifest_path: str, manifest: dict[str, dict]) -> None:
+    """
+    Atomically writes a manifest of parsed sources.
+    """
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(tmp_path, manifest_path)
 
 
 def get_or_create_docai_processor(
@@ -0,0 +1,97 @@
+"""Manifest of indexed source documents, for incremental re-indexing"""
+
+import json
+import logging
+import os
+
+from common.utils import Blob
+from google.cloud import storage
+
+logging.basicConfig(level=logging.INFO)  # Set the desired logging level
+logger = logging.getLogger(__name__)
+
+
+class IndexManifest:
+    """
+    Persisted record of every indexed source document: its GCS generation
+    and content hash, and the ids of the nodes it produced in the docstore
+    and the vector stores. Comparing it with the current bucket listing tells
+    which sources are new, changed or deleted since the last run.
+
+    The manifest is stored as JSON, either on GCS (gs://bucket/path) or
+    on the local filesystem.
+    """
+
+    def __init__(self, path: str, entries: dict[str, dict] | None = None):
+        self.path = path
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, path: str) -> "IndexManifest":
+        """Load the manifest at path, or start an empty one if there is none"""
+        if path.startswith("gs://"):
+            blob = cls._get_gcs_blob(path)
+            entries = json.loads(blob.download_as_text()) if blob.exists() else {}
+        elif os.path.exists(path):
+            with open(path) as manifest_file:
+                entries = json.load(manifest_file)
+        else:
+            entries = {}
+        logger.info(f"Loaded index manifest with {len(entries)} sources from {path}")
+        return cls(path, entries)
+
+    def save(self) -> None:
+        """Write the manifest back to its path"""
+        content = json.dumps(self.entries, indent=2)
+        if self.path.startswith("gs://"):
+            self._get_gcs_blob(self.path).upload_from_string(
+                content, content_type="application/json"
+            )
+        else:
+            # Write to a temporary file first so a crash never leaves a partial manifest
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as manifest_file:
+                manifest_file.write(content)
+            os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _get_gcs_blob(path: str) -> storage.Blob:
+        bucket_name, blob_name = path.replace("gs://", "").split("/", 1)
+        return storage.Client().bucket(bucket_name).blob(blob_name)
+
+    def diff(self, blobs: list[Blob]) -> tuple[list[Blob], list[str]]:
+        """
+        Compare the manifest with the current source blobs.
+
+        Returns the blobs that are new or changed and so need to be indexed,
+        and the source URIs whose nodes need to be removed because the source
+        changed or was deleted. A source whose generation changed but whose
+        content hash did not (e.g. it was rewritten with the same bytes) only
+        has its recorded generation updated.
+        """
+        blobs_to_index = []
+        sources_to_remove = []
+        for blob in blobs:
+            entry = self.entries.get(blob.path)
+            if entry is None:
+                blobs_to_index.append(blob)
+            elif entry.get("generation") != blob.generation:
+                if blob.md5_hash and entry.get("md5_hash") == blob.md5_hash:
+                    entry["generation"] = blob.generation
+                else:
+                    blobs_to_index.append(blob)
+                    sources_to_remove.append(blob.path)
+
+        current_paths = {blob.path for blob in blobs}
+        sources_to_remove.extend(
+            source for source in self.entries if source not in current_paths
+        )
+        return blobs_to_index, sources_to_remove
+
+    def record(self, blob: Blob, node_ids: dict[str, list[str]]) -> None:
+        """Record an indexed source with the ids of the nodes it produced"""
+        self.entries[blob.path] = {
+            "generation": blob.generation,
+            "md5_hash": blob.md5_hash,
+            **node_ids,
+        }
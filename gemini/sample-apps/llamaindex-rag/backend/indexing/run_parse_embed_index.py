@@ -6,15 +6,12 @@ import logging
 import os
 
 from backend.indexing.docai_parser import DocAIParser
+from backend.indexing.index_manifest import IndexManifest
 from backend.indexing.prompts import QA_EXTRACTION_PROMPT, QA_PARSER_PROMPT
 from backend.indexing.vector_search_utils import (
     get_or_create_existing_index,
 )  # noqa: E501
-from common.utils import (
-    create_pdf_blob_list,
-    download_bucket_with_transfer_manager,
-    link_nodes,
-)
+from common.utils import create_pdf_blob_list, link_nodes
 from google.cloud import aiplatform
 from llama_index.core import Document, Settings, StorageContext, VectorStoreIndex
 from llama_index.core.extractors import QuestionsAnsweredExtractor
@@ -69,6 +66,11 @@ FIRESTORE_DB_NAME = config.get("firestore_db_name")
 FIRESTORE_NAMESPACE = config.get("firestore_namespace")
 QA_INDEX_NAME = config.get("qa_index_name")
 QA_ENDPOINT_NAME = config.get("qa_endpoint_name")
+INCREMENTAL_INDEXING = config.get("incremental_indexing", True)
+INDEX_MANIFEST_PATH = config.get(
+    "index_manifest_path",
+    f"gs://{DOCSTORE_BUCKET_NAME}/{VECTOR_DATA_PREFIX}/index_manifest.json",
+)
 
 
 class QuesionsAnswered(BaseModel):
@@ -77,18 +79,8 @@ class QuesionsAnswered(BaseModel):
     questions_list: list[str]
 
 
-def create_qa_index(li_docs, docstore, embed_model, llm):
+def create_qa_index(li_docs, docstore, qa_vector_store, embed_model, llm):
     """creates index of hypothetical questions"""
-    qa_index, qa_endpoint = get_or_create_existing_index(
-        QA_INDEX_NAME, QA_ENDPOINT_NAME, APPROXIMATE_NEIGHBORS_COUNT
-    )
-    qa_vector_store = VertexAIVectorStore(
-        project_id=PROJECT_ID,
-        region=LOCATION,
-        index_id=qa_index.name,  # Use .name instead of .resource_name
-        endpoint_id=qa_endpoint.name,
-        gcs_bucket_name=DOCSTORE_BUCKET_NAME,
-    )
     qa_extractor = QuestionsAnsweredExtractor(
         llm, questions=5, prompt_template=QA_EXTRACTION_PROMPT
     )
@@ -98,8 +90,7 @@ def create_qa_index(li_docs, docstore, embed_model, llm):
             *[qa_extractor._aextract_questions_from_node(doc) for doc in li_docs]
         )
 
-    loop = asyncio.get_event_loop()
-    metadata_list = loop.run_until_complete(extract_batch(li_docs))
+    metadata_list = asyncio.run(extract_batch(li_docs))
 
     program = LLMTextCompletionProgram.from_defaults(
         output_cls=QuesionsAnswered,
@@ -113,9 +104,7 @@ def create_qa_index(li_docs, docstore, embed_model, llm):
             return_exceptions=True,
         )
 
-    parsed_questions = loop.run_until_complete(parse_batch(metadata_list))
-
-    loop.close()
+    parsed_questions = asyncio.run(parse_batch(metadata_list))
 
     q_docs = []
     for doc, questions in zip(li_docs, parsed_questions):
@@ -140,6 +129,7 @@ def create_qa_index(li_docs, docstore, embed_model, llm):
         embed_model=embed_model,
         llm=llm,
     )
+    return q_docs
 
 
 def create_hierarchical_index(li_docs, docstore, vector_store, embed_model, llm):
@@ -161,6 +151,7 @@ def create_hierarchical_index(li_docs, docstore, vector_store, embed_model, llm)
         embed_model=embed_model,
         llm=llm,
     )
+    return nodes, leaf_nodes
 
 
 def create_flat_index(li_docs, docstore, vector_store, embed_model, llm):
@@ -206,6 +197,56 @@ def create_flat_index(li_docs, docstore, vector_store, embed_model, llm):
         embed_model=embed_model,
         llm=llm,
     )
+    return nodes
+
+
+def index_documents(
+    li_docs, docstore, vector_store, qa_vector_store, embed_model, llm
+) -> dict[str, list[str]]:
+    """
+    Indexes the documents parsed from one source and returns the ids of the
+    nodes written to the docstore and the vector stores
+    """
+    docstore_ids = [doc.doc_id for doc in li_docs]
+    vector_ids = []
+    qa_vector_ids = []
+    if not li_docs:
+        return {
+            "docstore_ids": docstore_ids,
+            "vector_ids": vector_ids,
+            "qa_vector_ids": qa_vector_ids,
+        }
+
+    if qa_vector_store is not None:
+        q_docs = create_qa_index(li_docs, docstore, qa_vector_store, embed_model, llm)
+        qa_vector_ids = [q_doc.doc_id for q_doc in q_docs]
+
+    if INDEXING_METHOD == "hierarchical":
+        nodes, leaf_nodes = create_hierarchical_index(
+            li_docs, docstore, vector_store, embed_model, llm
+        )
+        docstore_ids.extend(node.node_id for node in nodes)
+        vector_ids = [node.node_id for node in leaf_nodes]
+
+    elif INDEXING_METHOD == "flat":
+        nodes = create_flat_index(li_docs, docstore, vector_store, embed_model, llm)
+        vector_ids = [node.node_id for node in nodes]
+
+    return {
+        "docstore_ids": docstore_ids,
+        "vector_ids": vector_ids,
+        "qa_vector_ids": qa_vector_ids,
+    }
+
+
+def remove_source_nodes(entry, docstore, vs_index, qa_index):
+    """Removes the nodes of a source recorded in the index manifest"""
+    if entry.get("vector_ids"):
+        vs_index.remove_datapoints(datapoint_ids=entry["vector_ids"])
+    if qa_index is not None and entry.get("qa_vector_ids"):
+        qa_index.remove_datapoints(datapoint_ids=entry["qa_vector_ids"])
+    for doc_id in entry.get("docstore_ids", []):
+        docstore.delete_document(doc_id, raise_error=False)
 
 
 def main():
@@ -249,49 +290,74 @@ def main():
         gcs_output_path=GCS_OUTPUT_PATH,
     )
 
-    # Download data from specified bucket and parse
-    local_data_path = os.path.join("/tmp", BUCKET_PREFIX)
-    os.makedirs(local_data_path, exist_ok=True)
+    qa_index = None
+    qa_vector_store = None
+    if QA_INDEX_NAME or QA_ENDPOINT_NAME:
+        qa_index, qa_endpoint = get_or_create_existing_index(
+            QA_INDEX_NAME, QA_ENDPOINT_NAME, APPROXIMATE_NEIGHBORS_COUNT
+        )
+        qa_vector_store = VertexAIVectorStore(
+            project_id=PROJECT_ID,
+            region=LOCATION,
+            index_id=qa_index.name,  # Use .name instead of .resource_name
+            endpoint_id=qa_endpoint.name,
+            gcs_bucket_name=DOCSTORE_BUCKET_NAME,
+        )
+
+    # Work out which sources are new, changed or deleted since the last run
+    manifest = IndexManifest.load(INDEX_MANIFEST_PATH)
     blobs = create_pdf_blob_list(INPUT_BUCKET_NAME, BUCKET_PREFIX)
-    logger.info("downloading data")
-    download_bucket_with_transfer_manager(
-        INPUT_BUCKET_NAME, prefix=BUCKET_PREFIX, destination_directory=local_data_path
+    if INCREMENTAL_INDEXING:
+        blobs_to_index, sources_to_remove = manifest.diff(blobs)
+    else:
+        blobs_to_index, sources_to_remove = blobs, list(manifest.entries)
+    logger.info(
+        f"{len(blobs)} source documents: indexing {len(blobs_to_index)}, "
+        f"removing the nodes of {len(sources_to_remove)}"
     )
 
-    # Parse documents using Document AI
+    for source in sources_to_remove:
+        logger.info(f"Removing the nodes of {source}")
+        remove_source_nodes(manifest.entries.pop(source), docstore, vs_index, qa_index)
+    manifest.save()
+
+    # Parse documents using Document AI, indexing each source as soon as it is
+    # parsed and recording it in the manifest so an interrupted run can resume
+    blobs_by_path = {blob.path: blob for blob in blobs_to_index}
     try:
-        parsed_docs, raw_results = parser.batch_parse(
-            blobs, chunk_size=CHUNK_SIZE, include_ancestor_headings=True
-        )
-        print(f"Number of documents parsed by Document AI: {len(parsed_docs)}")
-        if parsed_docs:
+        for result, parsed_docs in parser.iter_batch_parse(
+            blobs_to_index, chunk_size=CHUNK_SIZE, include_ancestor_headings=True
+        ):
             print(
-                f"First parsed document text (first 100 chars): {parsed_docs[0].text[:100]}..."  # noqa: E501
+                f"Number of documents parsed by Document AI from "
+                f"{result.source_path}: {len(parsed_docs)}"
             )
-        else:
-            print("No documents were parsed by Document AI.")
-
-        # Print raw results for debugging
-        print("Raw results:")
-        for result in raw_results:
-            print(f"  Source: {result.source_path}")
-            print(f"  Parsed: {result.parsed_path}")
+            blob = blobs_by_path.get(result.source_path)
+            if blob is None:
+                logger.warning(
+                    f"Document AI returned {result.source_path}, which does not "
+                    "match any source being indexed, skipping"
+                )
+                continue
+            # Leave failed sources out of the manifest so the next run retries them
+            if result.error or not parsed_docs:
+                logger.warning(
+                    f"Not indexing {result.source_path}: "
+                    f"{result.error or 'no documents were parsed'}"
+                )
+                continue
+
+            # Turn each parsed document into a llamaindex Document
+            li_docs = [
+                Document(text=doc.text, metadata=doc.metadata) for doc in parsed_docs
+            ]
+            node_ids = index_documents(
+                li_docs, docstore, vector_store, qa_vector_store, embed_model, llm
+            )
+            manifest.record(blob, node_ids)
+            manifest.save()
     except Exception as e:
-        print(f"Error processing single document: {str(e)}")
-        parsed_docs = []
-        raw_results = []
-
-    # Turn each parsed document into a llamaindex Document
-    li_docs = [Document(text=doc.text, metadata=doc.metadata) for doc in parsed_docs]
-
-    if QA_INDEX_NAME or QA_ENDPOINT_NAME:
-        create_qa_index(li_docs, docstore, embed_model, llm)
-
-    if INDEXING_METHOD == "hierarchical":
-        create_hierarchical_index(li_docs, docstore, vector_store, embed_model, llm)
-
-    elif INDEXING_METHOD == "flat":
-        create_flat_index(li_docs, docstore, vector_store, embed_model, llm)
+        print(f"Error processing documents: {str(e)}")
 
 
 if __name__ == "__main__":
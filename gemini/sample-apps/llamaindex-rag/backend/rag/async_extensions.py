@@ -1,8 +1,12 @@
 """Extensions to Llamaindex Base classes to allow for asynchronous execution"""
 
+import asyncio
+from collections import OrderedDict
 from collections.abc import Sequence
 import logging
+import time
 
+from llama_index.core.base.embeddings.base import BaseEmbedding, mean_agg
 from llama_index.core.base.response.schema import RESPONSE_TYPE
 from llama_index.core.callbacks import CallbackManager
 from llama_index.core.indices.query.query_transform.base import BaseQueryTransform
@@ -18,6 +22,15 @@ from pydantic import Field
 logging.basicConfig(level=logging.INFO)  # Set the desired logging level
 logger = logging.getLogger(__name__)
 
+# Appended to the question of every hypothesis after the first, so that
+# several hypotheses from a deterministic LLM cover different phrasings
+HYDE_VARIATIONS = (
+    "Write the passage as an excerpt from technical documentation.",
+    "Write the passage as an explanation for a newcomer, defining key terms.",
+    "Write the passage as a short list of the most relevant facts.",
+    "Write the passage as an answer on a question and answer forum.",
+)
+
 
 class AsyncTransformQueryEngine(BaseQueryEngine):
     """Transform query engine.
@@ -131,6 +144,15 @@ class AsyncHyDEQueryTransform(BaseQueryTransform):
     It uses an LLM to generate hypothetical answer(s) to a given query,
     and use the resulting documents as embedding strings.
 
+    The num_hypotheses hypothetical documents are generated concurrently, each
+    after the first with a different style instruction from HYDE_VARIATIONS so
+    that they are not identical at temperature 0. When an embed_model is given,
+    the hypothetical documents are embedded in one document-mode batch and the
+    original query in query mode, and all are averaged into a single query
+    embedding, so the retrievers run one
+    vector search instead of embedding each string themselves. Hypothetical
+    documents and fused embeddings are cached per normalized query text.
+
     As described in
     `[Precise Zero-Shot Dense Retrieval without Relevance Labels]
     (https://arxiv.org/abs/2212.10496)`
@@ -141,6 +163,10 @@ class AsyncHyDEQueryTransform(BaseQueryTransform):
         llm: LLMPredictorType | None = None,
         hyde_prompt: BasePromptTemplate | None = None,
         include_original: bool = True,
+        num_hypotheses: int = 1,
+        embed_model: BaseEmbedding | None = None,
+        cache_ttl_seconds: float = 600.0,
+        max_cached_queries: int = 1000,
     ) -> None:
         """Initialize HyDEQueryTransform.
 
@@ -150,12 +176,26 @@ class AsyncHyDEQueryTransform(BaseQueryTransform):
             hyde_prompt (Optional[BasePromptTemplate]): Custom prompt for HyDE
             include_original (bool): Whether to include original query
                 string as one of the embedding strings
+            num_hypotheses (int): Number of hypothetical documents to generate
+            embed_model (Optional[BaseEmbedding]): Model used to fuse the
+                embedding strings into one query embedding
+            cache_ttl_seconds (float): How long cached hypothetical
+                documents and embeddings stay valid
+            max_cached_queries (int): Maximum number of cached queries
         """
         super().__init__()
 
         self._llm = llm or Settings.llm
         self._hyde_prompt = hyde_prompt or DEFAULT_HYDE_PROMPT
         self._include_original = include_original
+        self._num_hypotheses = num_hypotheses
+        self._embed_model = embed_model
+        self._cache_ttl_seconds = cache_ttl_seconds
+        self._max_cached_queries = max_cached_queries
+        # normalized query -> (expiry, hypothetical docs, fused embedding)
+        self._cache: OrderedDict[str, tuple[float, list[str], list[float] | None]] = (
+            OrderedDict()
+        )
 
     def _get_prompts(self) -> PromptDictType:
         """Get prompts."""
@@ -165,33 +205,127 @@ class AsyncHyDEQueryTransform(BaseQueryTransform):
         """Update prompts."""
         if "hyde_prompt" in prompts:
             self._hyde_prompt = prompts["hyde_prompt"]
+            self._cache.clear()
+
+    @staticmethod
+    def _normalize_query(query_str: str) -> str:
+        """Normalize casing and whitespace so near-identical queries share a cache entry"""
+        return " ".join(query_str.lower().split())
+
+    def _get_cached(
+        self, query_str: str
+    ) -> tuple[list[str], list[float] | None] | None:
+        """Return the cached hypothetical documents and embedding of a query"""
+        key = self._normalize_query(query_str)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1], entry[2]
+
+    def _put_cached(
+        self,
+        query_str: str,
+        hypothetical_docs: list[str],
+        embedding: list[float] | None,
+    ) -> None:
+        """Cache the hypothetical documents and embedding of a query"""
+        key = self._normalize_query(query_str)
+        expiry = time.monotonic() + self._cache_ttl_seconds
+        self._cache[key] = (expiry, hypothetical_docs, embedding)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_cached_queries:
+            self._cache.popitem(last=False)
+
+    def _get_hyde_inputs(self, query_str: str) -> list[str]:
+        """Return the context string of each hypothesis"""
+        return [query_str] + [
+            f"{query_str}\n\n{HYDE_VARIATIONS[i % len(HYDE_VARIATIONS)]}"
+            for i in range(self._num_hypotheses - 1)
+        ]
+
+    def _get_embedding_strs(
+        self, query_bundle: QueryBundle, hypothetical_docs: list[str]
+    ) -> list[str]:
+        embedding_strs = list(hypothetical_docs)
+        if self._include_original:
+            embedding_strs.extend(query_bundle.embedding_strs)
+        return embedding_strs
 
     def _run(self, query_bundle: QueryBundle, metadata: dict) -> QueryBundle:
         """Run query transform."""
-        # TODO: support generating multiple hypothetical docs
         query_str = query_bundle.query_str
-        hypothetical_doc = self._llm.predict(self._hyde_prompt, context_str=query_str)
-        embedding_strs = [hypothetical_doc]
-        if self._include_original:
-            embedding_strs.extend(query_bundle.embedding_strs)
+        cached = self._get_cached(query_str)
+        if cached is None:
+            hypothetical_docs = [
+                self._llm.predict(self._hyde_prompt, context_str=context_str)
+                for context_str in self._get_hyde_inputs(query_str)
+            ]
+            embedding_strs = self._get_embedding_strs(query_bundle, hypothetical_docs)
+            embedding = None
+            if self._embed_model is not None:
+                embeddings = self._embed_model.get_text_embedding_batch(
+                    hypothetical_docs
+                )
+                if self._include_original:
+                    embeddings.extend(
+                        self._embed_model.get_query_embedding(query_str)
+                        for query_str in query_bundle.embedding_strs
+                    )
+                embedding = mean_agg(embeddings)
+            self._put_cached(query_str, hypothetical_docs, embedding)
+        else:
+            logger.info("Reusing cached hypothetical documents")
+            hypothetical_docs, embedding = cached
+            embedding_strs = self._get_embedding_strs(query_bundle, hypothetical_docs)
         return QueryBundle(
             query_str=query_str,
             custom_embedding_strs=embedding_strs,
+            embedding=embedding,
         )
 
-    async def _arun(self, query_bundle: QueryBundle) -> QueryBundle:
+    async def _arun(
+        self, query_bundle: QueryBundle, metadata: dict | None = None
+    ) -> QueryBundle:
         """Run query transform."""
-        # TODO: support generating multiple hypothetical docs
         query_str = query_bundle.query_str
-        hypothetical_doc = await self._llm.apredict(
-            self._hyde_prompt, context_str=query_str
-        )
-        embedding_strs = [hypothetical_doc]
-        if self._include_original:
-            embedding_strs.extend(query_bundle.embedding_strs)
+        cached = self._get_cached(query_str)
+        if cached is None:
+            hypothetical_docs = list(
+                await asyncio.gather(
+                    *(
+                        self._llm.apredict(self._hyde_prompt, context_str=context_str)
+                        for context_str in self._get_hyde_inputs(query_str)
+                    )
+                )
+            )
+            embedding_strs = self._get_embedding_strs(query_bundle, hypothetical_docs)
+            embedding = None
+            if self._embed_model is not None:
+                # The original query keeps the query task type of the retriever
+                original_strs = (
+                    query_bundle.embedding_strs if self._include_original else []
+                )
+                document_embeddings, *query_embeddings = await asyncio.gather(
+                    self._embed_model.aget_text_embedding_batch(hypothetical_docs),
+                    *(
+                        self._embed_model.aget_query_embedding(query_str)
+                        for query_str in original_strs
+                    ),
+                )
+                embedding = mean_agg(document_embeddings + query_embeddings)
+            self._put_cached(query_str, hypothetical_docs, embedding)
+        else:
+            logger.info("Reusing cached hypothetical documents")
+            hypothetical_docs, embedding = cached
+            embedding_strs = self._get_embedding_strs(query_bundle, hypothetical_docs)
         return QueryBundle(
             query_str=query_str,
             custom_embedding_strs=embedding_strs,
+            embedding=embedding,
         )
 
 
@@ -5,6 +5,7 @@ from typing import Any
 from anthropic import AnthropicVertex, AsyncAnthropicVertex
 from llama_index.core.llms import (
     CompletionResponse,
+    CompletionResponseAsyncGen,
     CompletionResponseGen,
     CustomLLM,
     LLMMetadata,
@@ -84,3 +85,21 @@ class ClaudeVertexLLM(CustomLLM):
             for text in stream.text_stream:
                 response += text
                 yield CompletionResponse(text=response, delta=text)
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        async def gen() -> CompletionResponseAsyncGen:
+            async with self.async_client.messages.stream(
+                model=self.model_name,
+                max_tokens=self.max_tokens,
+                system=self.system_prompt,
+                messages=[{"role": "user", "content": prompt}],
+            ) as stream:
+                response = ""
+                async for text in stream.text_stream:
+                    response += text
+                    yield CompletionResponse(text=response, delta=text)
+
+        return gen()
@@ -2,8 +2,14 @@
 
 import asyncio
 from collections.abc import Callable
+from functools import lru_cache
+import hashlib
+import json
 import logging
+import os
+import random
 import re
+import time
 
 from backend.rag.claude_vertex import ClaudeVertexLLM
 from google.cloud import bigquery
@@ -28,6 +34,7 @@ class LLMEvaluator:
     LLMEvaluator.extract_score
     LLMEvaluator.async_eval_question_answer_pair
     LLMEvaluator.async_eval_answer
+    LLMEvaluator.progress
     """
 
     def __init__(
@@ -36,10 +43,18 @@ class LLMEvaluator:
         user_prompt: str,
         eval_model_name: str,
         temperature: float,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        initial_backoff: float = 1.0,
     ):
         self.system_prompt = system_prompt
         self.user_prompt = user_prompt
         self.eval_model_name = eval_model_name
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.progress: dict[str, int | float] = {}
 
         if "gemini" in self.eval_model_name:
             self.eval_model = GenerativeModel(
@@ -126,6 +141,8 @@ class LLMEvaluator:
         Returns:
             str or None: The extracted number as a string, or None if no number is found.
         """
+        if not text:
+            return 0  # The item failed to evaluate
         first_line = text.splitlines()[0]  # Get the first line
         match = re.search(r"\d{1,3}", first_line)  # Search for a number (1-3 digits)
         if match:
@@ -133,37 +150,258 @@ class LLMEvaluator:
         else:
             return 0  # Return None if no number is found
 
+    async def _eval_item_with_retries(
+        self,
+        retrieval_qa_func: Callable,
+        question: str,
+        ground_truth: str,
+    ) -> tuple:
+        """
+        LLMEvaluator._eval_item_with_retries
+        Evaluates one question, retrying with exponential backoff and jitter.
+        Returns (answer, eval_result, retrieved_context, error).
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                answer, score, retrieved_context = (
+                    await self.async_eval_question_answer_pair(
+                        retrieval_qa_func, self.eval_model, question, ground_truth
+                    )
+                )
+                return answer, score, retrieved_context, None
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Giving up on question {question}: {e}")
+                    return None, "", None, str(e)
+                backoff = self.initial_backoff * 2**attempt
+                backoff += random.uniform(0, backoff)
+                logger.warning(
+                    f"Evaluation of question {question} failed ({e}), "
+                    f"retrying in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff)
+
+    def _fingerprint(
+        self, question: str, ground_truth: str, run_config: dict | None
+    ) -> str:
+        """
+        LLMEvaluator._fingerprint
+        Hashes an item together with everything that affects its evaluation.
+        """
+        payload = {
+            "question": question,
+            "ground_truth": ground_truth,
+            "system_prompt": self.system_prompt,
+            "user_prompt": self.user_prompt,
+            "eval_model_name": self.eval_model_name,
+            "temperature": self.temperature,
+            "run_config": run_config or {},
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def _load_checkpoint(
+        self,
+        checkpoint_path: str | None,
+        fingerprints: dict[int, str],
+        bq_table_id: str | None = None,
+    ) -> tuple[dict[int, dict], set[int]]:
+        """
+        LLMEvaluator._load_checkpoint
+        Returns the successfully evaluated items of a previous run by question
+        index, and the indexes of those already written to bq_table_id.
+        Items whose fingerprint does not match the current question,
+        ground truth and run config are ignored and evaluated again.
+        """
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return {}, set()
+        completed = {}
+        bq_written = set()
+        stale = 0
+        with open(checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    # A partially written last line from an interrupted run
+                    continue
+                if "bq_written" in item:
+                    # Marker appended after a successful BigQuery batch write
+                    if item["bq_table_id"] == bq_table_id:
+                        bq_written.update(
+                            idx
+                            for idx, fingerprint in item["bq_written"]
+                            if fingerprints.get(idx) == fingerprint
+                        )
+                    continue
+                if item["error"] is not None:
+                    continue
+                if item.get("fingerprint") != fingerprints.get(item["question_idx"]):
+                    stale += 1
+                    continue
+                completed[item["question_idx"]] = item
+        if stale:
+            logger.warning(
+                f"Ignoring {stale} checkpointed items from a different dataset "
+                f"or run config"
+            )
+        logger.info(f"Resuming from {len(completed)} checkpointed items")
+        return completed, bq_written & completed.keys()
+
     async def async_eval_retrieval(
-        self, retrieval_qa_func: Callable, eval_df: pd.DataFrame
+        self,
+        retrieval_qa_func: Callable,
+        eval_df: pd.DataFrame,
+        checkpoint_path: str | None = None,
+        bq_table_id: str | None = None,
+        bq_batch_size: int = 100,
+        run_config: dict | None = None,
     ) -> pd.DataFrame:
         """
         LLMEvaluator.async_eval_retrieval
+        Evaluates every question with at most max_concurrency in flight.
+        Each finished item is appended to the JSONL checkpoint_path, so a rerun
+        with the same path, dataset and run_config (the settings of
+        retrieval_qa_func) only evaluates the missing items. If bq_table_id is
+        set, completed items are also written to BigQuery in batches, and
+        each written batch is marked in the checkpoint. Resumed items without
+        that mark, e.g. buffered when the previous run was interrupted, are
+        written again.
+        Items that still fail after retries have their error set, and no
+        answer, context or score.
         """
-        results = await asyncio.gather(
-            *[
-                self.async_eval_question_answer_pair(
-                    retrieval_qa_func, self.eval_model, x["question"], x["ground_truth"]
+        fingerprints = {
+            idx: self._fingerprint(x["question"], x["ground_truth"], run_config)
+            for idx, x in eval_df[["question", "ground_truth"]].iterrows()
+        }
+        completed, bq_written = self._load_checkpoint(
+            checkpoint_path, fingerprints, bq_table_id
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        write_lock = asyncio.Lock()
+        bq_buffer: list[dict] = []
+        start_time = time.perf_counter()
+        self.progress = {
+            "total": len(eval_df),
+            "resumed": len(completed),
+            "completed": 0,
+            "failed": 0,
+            "elapsed_sec": 0.0,
+            "items_per_sec": 0.0,
+        }
+
+        async def flush_bq_buffer() -> None:
+            rows = bq_buffer.copy()
+            bq_buffer.clear()
+            await asyncio.to_thread(
+                write_results_to_bq, pd.DataFrame(rows), table_id=bq_table_id
+            )
+            if checkpoint_path:
+                marker = {
+                    "bq_table_id": bq_table_id,
+                    "bq_written": [
+                        [row["question_idx"], row["fingerprint"]] for row in rows
+                    ],
+                }
+                with open(checkpoint_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(marker) + "\n")
+
+        async def eval_item(question_idx: int, question: str, ground_truth: str):
+            if question_idx in completed:
+                item = completed[question_idx]
+                if bq_table_id and question_idx not in bq_written:
+                    async with write_lock:
+                        bq_buffer.append(item)
+                        if len(bq_buffer) >= bq_batch_size:
+                            await flush_bq_buffer()
+                return item
+            async with semaphore:
+                answer, eval_result, retrieved_context, error = (
+                    await self._eval_item_with_retries(
+                        retrieval_qa_func, question, ground_truth
+                    )
+                )
+            item = {
+                "question_idx": question_idx,
+                "fingerprint": fingerprints[question_idx],
+                "question": question,
+                "answer": answer,
+                "retrieved_context": retrieved_context,
+                "eval_result": eval_result,
+                "error": error,
+            }
+            async with write_lock:
+                if checkpoint_path:
+                    with open(checkpoint_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(item) + "\n")
+                self.progress["failed" if error else "completed"] += 1
+                elapsed = time.perf_counter() - start_time
+                done = self.progress["completed"] + self.progress["failed"]
+                self.progress["elapsed_sec"] = elapsed
+                self.progress["items_per_sec"] = done / elapsed if elapsed else 0.0
+                logger.info(
+                    f"Evaluated {done + len(completed)}/{len(eval_df)} questions "
+                    f"({self.progress['items_per_sec']:.2f} questions/s)"
                 )
+                if bq_table_id and error is None:
+                    bq_buffer.append(item)
+                    if len(bq_buffer) >= bq_batch_size:
+                        await flush_bq_buffer()
+            return item
+
+        items = await asyncio.gather(
+            *[
+                eval_item(idx, x["question"], x["ground_truth"])
                 for idx, x in eval_df[["question", "ground_truth"]].iterrows()
             ]
         )
-        answers, eval_result, retrieved_context = list(zip(*results))
-        eval_df["answer"] = answers
-        eval_df["retrieved_context"] = retrieved_context
-        eval_df["eval_result"] = eval_result
-        eval_df["score"] = eval_df["eval_result"].apply(lambda x: self.extract_score(x))
+        if bq_table_id and bq_buffer:
+            await flush_bq_buffer()
+
+        eval_df["answer"] = [item["answer"] for item in items]
+        eval_df["retrieved_context"] = [item["retrieved_context"] for item in items]
+        eval_df["eval_result"] = [item["eval_result"] for item in items]
+        # Failed items get no score instead of 0, so they don't skew averages
+        eval_df["score"] = [
+            float("nan") if item["error"] else self.extract_score(item["eval_result"])
+            for item in items
+        ]
+        eval_df["error"] = [item["error"] for item in items]
         return eval_df
 
     def evaluate(
-        self, retrieval_qa_func: Callable, eval_df: pd.DataFrame
+        self,
+        retrieval_qa_func: Callable,
+        eval_df: pd.DataFrame,
+        checkpoint_path: str | None = None,
+        run_config: dict | None = None,
     ) -> pd.DataFrame:
         """
         LLMEvaluator.evaluate
+        Synchronous entry point, must not be called from a running event loop.
+        Use async_eval_retrieval from async code instead.
         """
-        eval_df = asyncio.run(self.async_eval_retrieval(retrieval_qa_func, eval_df))
+        eval_df = asyncio.run(
+            self.async_eval_retrieval(
+                retrieval_qa_func,
+                eval_df,
+                checkpoint_path=checkpoint_path,
+                run_config=run_config,
+            )
+        )
         return eval_df
 
 
+@lru_cache(maxsize=1)
+def get_bq_client() -> bigquery.Client:
+    """
+    get_bq_client
+    Returns a BigQuery client shared by all batched writes.
+    """
+    return bigquery.Client()
+
+
 def write_results_to_bq(
     pd_dataframe: pd.DataFrame, table_id: str = "eval_results.eval_results_table"
 ):
@@ -171,7 +409,7 @@ def write_results_to_bq(
     write_results_to_bq
     """
     logger.info("Writing results to BQ...")
-    client = bigquery.Client()
+    client = get_bq_client()
 
     # Define the job configuration
     job_config = bigquery.LoadJobConfig(
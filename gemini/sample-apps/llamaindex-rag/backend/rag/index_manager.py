@@ -1,7 +1,9 @@
 """Main state management class for indices and prompts for
 experimentation UI"""
 
+from collections import OrderedDict
 import logging
+import threading
 
 import Stemmer
 from backend.rag.async_extensions import (
@@ -10,6 +12,7 @@ from backend.rag.async_extensions import (
     AsyncTransformQueryEngine,
 )
 from backend.rag.claude_vertex import ClaudeVertexLLM
+from backend.rag.node_cache import NodeCache
 from backend.rag.node_reranker import CustomLLMRerank
 from backend.rag.parent_retriever import ParentRetriever
 from backend.rag.prompts import Prompts
@@ -45,6 +48,11 @@ class IndexManager:
     This includes:
     - Switching out vector indices or docstores
     - Changing retrieval parameters (e.g. temperature, llm model, etc.)
+
+    Built query engines and BM25 retrievers are cached, since constructing
+    them (and tokenizing the whole docstore for BM25) dominates request
+    latency. The caches are keyed by the retrieval parameters, prompts and
+    current indexes, and are cleared whenever the indexes are switched.
     """
 
     def __init__(
@@ -59,6 +67,8 @@ class IndexManager:
         firestore_db_name: str | None,
         firestore_namespace: str | None,
         vs_bucket_name: str,
+        max_cached_query_engines: int = 32,
+        hyde_num_hypotheses: int = 1,
     ):
         self.project_id = project_id
         self.location = location
@@ -70,6 +80,12 @@ class IndexManager:
         self.firestore_db_name = firestore_db_name
         self.firestore_namespace = firestore_namespace
         self.vs_bucket_name = vs_bucket_name
+        self.max_cached_query_engines = max_cached_query_engines
+        self.hyde_num_hypotheses = hyde_num_hypotheses
+        self._query_engine_cache: OrderedDict[tuple, tuple] = OrderedDict()
+        self._bm25_retriever_cache: dict[int, BM25Retriever] = {}
+        self._cache_lock = threading.Lock()
+        self.node_cache = NodeCache()
         self.embed_model = VertexTextEmbedding(
             model_name=self.embeddings_model_name,
             project=self.project_id,
@@ -155,6 +171,34 @@ class IndexManager:
             )
         else:
             self.qa_index = None
+        self.clear_query_engine_cache()
+
+    def clear_query_engine_cache(self) -> None:
+        """Drop all cached query engines, BM25 retrievers and docstore nodes"""
+        with self._cache_lock:
+            self._query_engine_cache.clear()
+            self._bm25_retriever_cache.clear()
+        self.node_cache.clear()
+
+    def get_bm25_retriever(self, similarity_top_k: int) -> BM25Retriever:
+        """
+        Returns a BM25 retriever over the base docstore, building the
+        BM25 index only once per similarity_top_k and set of indexes.
+        """
+        with self._cache_lock:
+            bm25_retriever = self._bm25_retriever_cache.get(similarity_top_k)
+        if bm25_retriever is None:
+            bm25_retriever = BM25Retriever.from_defaults(
+                docstore=self.base_index.docstore,
+                similarity_top_k=similarity_top_k,
+                stemmer=Stemmer.Stemmer("english"),
+                language="english",
+            )
+            with self._cache_lock:
+                bm25_retriever = self._bm25_retriever_cache.setdefault(
+                    similarity_top_k, bm25_retriever
+                )
+        return bm25_retriever
 
     def get_vector_index(
         self,
@@ -221,10 +265,76 @@ class IndexManager:
         use_node_rerank: bool = False,
         qa_followup: bool = True,
         hybrid_retrieval: bool = True,
+        streaming: bool = False,
     ) -> AsyncRetrieverQueryEngine:
         """
-        Creates a llamaindex QueryEngine given a
-        VectorStoreIndex and hyperparameters
+        Returns a llamaindex QueryEngine given a
+        VectorStoreIndex and hyperparameters, reusing a cached
+        engine when one was already built with the same configuration.
+        With streaming=True the engine synthesizes streaming responses.
+        """
+        cache_key = (
+            tuple(self.get_current_index_info().values()),
+            tuple(prompts.to_dict().items()),
+            llm_name,
+            temperature,
+            similarity_top_k,
+            retrieval_strategy,
+            use_hyde,
+            use_refine,
+            use_node_rerank,
+            qa_followup,
+            hybrid_retrieval,
+            streaming,
+        )
+        with self._cache_lock:
+            cached = self._query_engine_cache.get(cache_key)
+            if cached is not None:
+                self._query_engine_cache.move_to_end(cache_key)
+
+        if cached is None:
+            cached = self._build_query_engine(
+                prompts=prompts,
+                llm_name=llm_name,
+                temperature=temperature,
+                similarity_top_k=similarity_top_k,
+                retrieval_strategy=retrieval_strategy,
+                use_hyde=use_hyde,
+                use_refine=use_refine,
+                use_node_rerank=use_node_rerank,
+                qa_followup=qa_followup,
+                hybrid_retrieval=hybrid_retrieval,
+                streaming=streaming,
+            )
+            with self._cache_lock:
+                self._query_engine_cache[cache_key] = cached
+                while len(self._query_engine_cache) > self.max_cached_query_engines:
+                    self._query_engine_cache.popitem(last=False)
+        else:
+            logger.info("Reusing cached query engine")
+
+        query_engine, llm = cached
+        Settings.llm = llm
+        self.query_engine = query_engine
+        return query_engine
+
+    def _build_query_engine(
+        self,
+        prompts: Prompts,
+        llm_name: str,
+        temperature: float,
+        similarity_top_k: int,
+        retrieval_strategy: str,
+        use_hyde: bool,
+        use_refine: bool,
+        use_node_rerank: bool,
+        qa_followup: bool,
+        hybrid_retrieval: bool,
+        streaming: bool = False,
+    ) -> tuple[AsyncRetrieverQueryEngine, Vertex | ClaudeVertexLLM]:
+        """
+        Builds a query engine from scratch and returns it
+        along with the LLM it was configured with
         """
         llm = self.get_vertex_llm(
             llm_name=llm_name,
@@ -242,10 +352,14 @@ class IndexManager:
                 refine_template=refine_prompt,
                 response_mode="compact",
                 use_async=True,
+                streaming=streaming,
             )
         else:
             synth = get_response_synthesizer(
-                text_qa_template=qa_prompt, response_mode="compact", use_async=True
+                text_qa_template=qa_prompt,
+                response_mode="compact",
+                use_async=True,
+                streaming=streaming,
             )
 
         base_retriever = self.base_index.as_retriever(similarity_top_k=similarity_top_k)
@@ -265,26 +379,25 @@ class IndexManager:
             )
         elif retrieval_strategy == "parent":
             retriever = ParentRetriever(
-                base_retriever, docstore=self.base_index.docstore
+                base_retriever,
+                docstore=self.base_index.docstore,
+                node_cache=self.node_cache,
             )
         elif retrieval_strategy == "baseline":
             retriever = base_retriever
 
         if qa_followup:
             qa_retriever = QARetriever(
-                qa_vector_retriever=qa_vector_retriever, docstore=self.qa_index.docstore
+                qa_vector_retriever=qa_vector_retriever,
+                docstore=self.qa_index.docstore,
+                node_cache=self.node_cache,
             )
             retriever = QAFollowupRetriever(
                 qa_retriever=qa_retriever, base_retriever=retriever
             )
 
         if hybrid_retrieval:
-            bm25_retriever = BM25Retriever.from_defaults(
-                docstore=self.base_index.docstore,
-                similarity_top_k=similarity_top_k,
-                stemmer=Stemmer.Stemmer("english"),
-                language="english",
-            )
+            bm25_retriever = self.get_bm25_retriever(similarity_top_k)
             retriever = QueryFusionRetriever(
                 [retriever, bm25_retriever],
                 similarity_top_k=similarity_top_k,
@@ -322,14 +435,16 @@ class IndexManager:
         if use_hyde:
             hyde_prompt = PromptTemplate(prompts.hyde_prompt_tmpl)
             hyde = AsyncHyDEQueryTransform(
-                include_original=True, hyde_prompt=hyde_prompt
+                include_original=True,
+                hyde_prompt=hyde_prompt,
+                num_hypotheses=self.hyde_num_hypotheses,
+                embed_model=self.embed_model,
             )
             query_engine = AsyncTransformQueryEngine(
                 query_engine=query_engine, query_transform=hyde
             )
 
-        self.query_engine = query_engine
-        return query_engine
+        return query_engine, llm
 
     def get_react_agent(
         self,
@@ -0,0 +1,103 @@
+"""Short-lived in-process cache of docstore nodes"""
+
+import asyncio
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+
+logging.basicConfig(level=logging.INFO)  # Set the desired logging level
+logger = logging.getLogger(__name__)
+
+
+class NodeCache:
+    """Bounded LRU cache of docstore nodes whose entries expire after a TTL.
+
+    Sits in front of a (remote) document store such as FirestoreDocumentStore
+    so that nodes retrieved repeatedly across queries are read only once per
+    TTL window, and batches the reads of the nodes that are missing.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 10_000) -> None:
+        """
+        Args:
+            ttl_seconds (float): How long a cached node stays valid
+            max_entries (int): Maximum number of nodes kept in memory
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._nodes: OrderedDict[str, tuple[float, BaseNode]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, node_id: str) -> BaseNode | None:
+        """Return a cached node, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._nodes.get(node_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._nodes.move_to_end(node_id)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._nodes[node_id]
+            self.misses += 1
+            return None
+
+    def put(self, node_id: str, node: BaseNode) -> None:
+        """Add a node to the cache, evicting the least recently used nodes"""
+        with self._lock:
+            self._nodes[node_id] = (time.monotonic() + self.ttl_seconds, node)
+            self._nodes.move_to_end(node_id)
+            while len(self._nodes) > self.max_entries:
+                self._nodes.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached nodes"""
+        with self._lock:
+            self._nodes.clear()
+
+    def get_documents(
+        self, docstore: BaseDocumentStore, node_ids: list[str]
+    ) -> dict[str, BaseNode]:
+        """
+        Return the nodes for the given ids, reading each distinct
+        id missing from the cache from the docstore once
+        """
+        nodes = {}
+        for node_id in dict.fromkeys(node_ids):
+            node = self.get(node_id)
+            if node is None:
+                node = docstore.get_document(node_id)
+                self.put(node_id, node)
+            nodes[node_id] = node
+        return nodes
+
+    async def aget_documents(
+        self, docstore: BaseDocumentStore, node_ids: list[str]
+    ) -> dict[str, BaseNode]:
+        """
+        Return the nodes for the given ids, reading all distinct
+        ids missing from the cache from the docstore concurrently
+        """
+        nodes = {}
+        missing_ids = []
+        for node_id in dict.fromkeys(node_ids):
+            node = self.get(node_id)
+            if node is None:
+                missing_ids.append(node_id)
+            else:
+                nodes[node_id] = node
+
+        if missing_ids:
+            logger.info(f"Reading {len(missing_ids)} nodes from the docstore")
+            fetched = await asyncio.gather(
+                *(docstore.aget_document(node_id) for node_id in missing_ids)
+            )
+            for node_id, node in zip(missing_ids, fetched):
+                self.put(node_id, node)
+                nodes[node_id] = node
+        return nodes
@@ -1,10 +1,16 @@
 """Node Re-ranker class for async execution"""
 
+import asyncio
+from collections import OrderedDict
 from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
 import logging
+import threading
+import weakref
 
 import google.auth
 import google.auth.transport.requests
+import httpx
 from llama_index.core import QueryBundle, Settings
 from llama_index.core.bridge.pydantic import Field, PrivateAttr
 from llama_index.core.indices.utils import (
@@ -16,7 +22,7 @@ from llama_index.core.postprocessor.types import BaseNodePostprocessor
 from llama_index.core.prompts import BasePromptTemplate
 from llama_index.core.prompts.default_prompts import DEFAULT_CHOICE_SELECT_PROMPT
 from llama_index.core.prompts.mixin import PromptDictType
-from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.schema import BaseNode, NodeWithScore, TextNode
 from llama_index.core.service_context import ServiceContext
 from llama_index.core.settings import llm_from_settings_or_context
 from llama_index.llms.vertex import Vertex
@@ -31,55 +37,154 @@ llm = Vertex(model="gemini-1.5-flash", temperature=0.0)
 Settings.llm = llm
 
 
-def authenticate_google():
-    """Authenticate using Google credentials and return the access token."""
-    credentials, project_id = google.auth.default(
-        quota_project_id="pr-sbx-vertex-genai"
-    )
-    auth_req = google.auth.transport.requests.Request()
-    credentials.refresh(auth_req)
-    return credentials.token
+# Replace 'your-project-id' with your actual Google Cloud project ID
+RERANKER_PROJECT_ID = "pr-sbx-vertex-genai"
+RERANKER_MODEL_NAME = "semantic-ranker-512@latest"
+RERANKER_URL = f"https://discoveryengine.googleapis.com/v1alpha/projects/{RERANKER_PROJECT_ID}/locations/global/rankingConfigs/default_ranking_config:rank"
+# Maximum number of records the ranking API accepts per request
+RERANKER_MAX_RECORDS = 200
+# Refresh cached credentials this long before they expire
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
 
+_credentials = None
+_credentials_lock = threading.Lock()
+# An httpx client is bound to the event loop it was first used on, so each loop
+# gets its own client, dropped together with the loop
+_http_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, httpx.AsyncClient
+] = weakref.WeakKeyDictionary()
+_http_clients_lock = threading.Lock()
 
-def call_reranker(query, records, google_token):
-    """Calls the reranker API with the given query and records.
 
-    Args:
-      query: The search query.
-      records: A list of dictionaries, where each dictionary represents a record
-        with "id", "title", and "content" fields.
+def authenticate_google():
+    """Authenticate using Google credentials and return the access token.
 
-    Returns:
-      The API response as a dictionary.
+    The credentials are cached across calls and only refreshed when they
+    are invalid or about to expire.
     """
-    # Replace 'your-project-id' with your actual Google Cloud project ID
-    project_id = "pr-sbx-vertex-genai"
-    model_name = "semantic-ranker-512@latest"
-    url = f"https://discoveryengine.googleapis.com/v1alpha/projects/{project_id}/locations/global/rankingConfigs/default_ranking_config:rank"
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials, project_id = google.auth.default(
+                quota_project_id=RERANKER_PROJECT_ID
+            )
+        expires_soon = (
+            _credentials.expiry is not None
+            and _credentials.expiry - TOKEN_REFRESH_MARGIN
+            <= datetime.now(timezone.utc).replace(tzinfo=None)
+        )
+        if not _credentials.valid or expires_soon:
+            auth_req = google.auth.transport.requests.Request()
+            _credentials.refresh(auth_req)
+        return _credentials.token
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the HTTP client of the running event loop, whose connections
+    are reused across calls on that loop."""
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        client = _http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=8),
+            )
+            _http_clients[loop] = client
+        return client
+
 
+async def aclose_http_client() -> None:
+    """Close the HTTP client of the running event loop, e.g. on shutdown."""
+    with _http_clients_lock:
+        client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _get_reranker_request(query, records, google_token):
+    """Returns the headers and body of a reranker API request."""
     headers = {
         "Authorization": "Bearer " + google_token,
         "Content-Type": "application/json",
-        "X-Goog-User-Project": project_id,
+        "X-Goog-User-Project": RERANKER_PROJECT_ID,
     }
 
     data = {
-        "model": model_name,
+        "model": RERANKER_MODEL_NAME,
         "query": query,
         "records": records,
     }
+    return headers, data
+
+
+def call_reranker(query, records, google_token):
+    """Calls the reranker API with the given query and records.
+
+    Args:
+      query: The search query.
+      records: A list of dictionaries, where each dictionary represents a record
+        with "id", "title", and "content" fields.
 
-    response = requests.post(url, headers=headers, json=data)
+    Returns:
+      The API response as a dictionary.
+    """
+    headers, data = _get_reranker_request(query, records, google_token)
+    response = requests.post(RERANKER_URL, headers=headers, json=data)
     print(response)
     response.raise_for_status()  # Raise an error if the request failed
     return response.json()
 
 
+async def acall_reranker(query, records, google_token):
+    """Asynchronously calls the reranker API with the given query and records,
+    using the shared pooled HTTP client.
+
+    Args:
+      query: The search query.
+      records: A list of dictionaries, where each dictionary represents a record
+        with "id", "title", and "content" fields.
+
+    Returns:
+      The API response as a dictionary.
+    """
+    headers, data = _get_reranker_request(query, records, google_token)
+    response = await get_http_client().post(RERANKER_URL, headers=headers, json=data)
+    logger.info(response)
+    response.raise_for_status()  # Raise an error if the request failed
+    return response.json()
+
+
 class GoogleReRankerSecretSauce(BaseNodePostprocessor):
-    def _postprocess_nodes(
+    """Reranker backed by the Vertex AI Search ranking API.
+
+    Inputs larger than the API's record limit are split into chunks
+    which are ranked concurrently and merged by score.
+    """
+
+    async def postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+        query_str: str | None = None,
+    ) -> list[NodeWithScore]:
+        """Postprocess nodes."""
+        if query_str is not None and query_bundle is not None:
+            raise ValueError("Cannot specify both query_str and query_bundle")
+        elif query_str is not None:
+            query_bundle = QueryBundle(query_str)
+        return await self._postprocess_nodes(nodes, query_bundle)
+
+    async def _postprocess_nodes(
         self, nodes: list[NodeWithScore], query_bundle: QueryBundle | None
     ) -> list[NodeWithScore]:
-        google_token = authenticate_google()
+        if query_bundle is None:
+            raise ValueError("Query bundle must be provided.")
+        if len(nodes) == 0:
+            return []
+
+        # Only blocks when the cached credentials need a refresh
+        google_token = await asyncio.to_thread(authenticate_google)
 
         records = []
         for node_wscore in nodes:
@@ -90,20 +195,35 @@ class GoogleReRankerSecretSauce(BaseNodePostprocessor):
                     "content": node_wscore.node.text,
                 }
             )
-        response_json = call_reranker(query_bundle.query_str, records, google_token)
+        responses = await asyncio.gather(
+            *(
+                acall_reranker(
+                    query_bundle.query_str,
+                    records[idx : idx + RERANKER_MAX_RECORDS],
+                    google_token,
+                )
+                for idx in range(0, len(records), RERANKER_MAX_RECORDS)
+            )
+        )
 
-        records = response_json["records"]
         new_nodes_wscores = []
-        for r in records:
-            node = TextNode(id_=r["id"], text=r["content"])
-            node_wscore = NodeWithScore(node=node, score=r["score"])
-            new_nodes_wscores.append(node_wscore)
+        for response_json in responses:
+            for r in response_json["records"]:
+                node = TextNode(id_=r["id"], text=r["content"])
+                node_wscore = NodeWithScore(node=node, score=r["score"])
+                new_nodes_wscores.append(node_wscore)
 
         return sorted(new_nodes_wscores, key=lambda x: x.score or 0.0, reverse=True)
 
 
 class CustomLLMRerank(BaseNodePostprocessor):
-    """LLM-based reranker."""
+    """LLM-based reranker.
+
+    Choice-select batches are scored concurrently (at most max_concurrency
+    LLM calls at a time) and the relevance of every scored node is cached per
+    (query, node id). If relevance_threshold is set, scoring stops as soon as
+    top_n nodes at or above the threshold have been found.
+    """
 
     top_n: int = Field(description="Top N nodes to return.")
     choice_select_prompt: BasePromptTemplate = Field(
@@ -111,9 +231,19 @@ class CustomLLMRerank(BaseNodePostprocessor):
     )
     choice_batch_size: int = Field(description="Batch size for choice select.")
     llm: LLM = Field(description="The LLM to rerank with.")
+    max_concurrency: int = Field(
+        description="Maximum number of batches scored concurrently."
+    )
+    relevance_threshold: float | None = Field(
+        description="Stop scoring once top_n nodes reach this relevance."
+    )
+    max_cached_relevances: int = Field(
+        description="Maximum number of (query, node id) relevances cached."
+    )
 
     _format_node_batch_fn: Callable = PrivateAttr()
     _parse_choice_select_answer_fn: Callable = PrivateAttr()
+    _relevance_cache: OrderedDict = PrivateAttr()
 
     def __init__(
         self,
@@ -124,25 +254,34 @@ class CustomLLMRerank(BaseNodePostprocessor):
         parse_choice_select_answer_fn: Callable | None = None,
         service_context: ServiceContext | None = None,
         top_n: int = 10,
+        max_concurrency: int = 4,
+        relevance_threshold: float | None = None,
+        max_cached_relevances: int = 10_000,
     ) -> None:
         choice_select_prompt = choice_select_prompt or DEFAULT_CHOICE_SELECT_PROMPT
 
         llm = llm or llm_from_settings_or_context(Settings, service_context)
 
-        self._format_node_batch_fn = (
-            format_node_batch_fn or default_format_node_batch_fn
-        )
-        self._parse_choice_select_answer_fn = (
-            parse_choice_select_answer_fn or default_parse_choice_select_answer_fn
-        )
-
         super().__init__(
             llm=llm,
             choice_select_prompt=choice_select_prompt,
             choice_batch_size=choice_batch_size,
             service_context=service_context,
             top_n=top_n,
+            max_concurrency=max_concurrency,
+            relevance_threshold=relevance_threshold,
+            max_cached_relevances=max_cached_relevances,
+        )
+
+        # Private attributes must be set after the pydantic model is initialized
+        self._format_node_batch_fn = (
+            format_node_batch_fn or default_format_node_batch_fn
         )
+        self._parse_choice_select_answer_fn = (
+            parse_choice_select_answer_fn or default_parse_choice_select_answer_fn
+        )
+        # (query, node id) -> relevance, or None if the node was not selected
+        self._relevance_cache = OrderedDict()
 
     def _get_prompts(self) -> PromptDictType:
         """Get prompts."""
@@ -152,6 +291,7 @@ class CustomLLMRerank(BaseNodePostprocessor):
         """Update prompts."""
         if "choice_select_prompt" in prompts:
             self.choice_select_prompt = prompts["choice_select_prompt"]
+            self._relevance_cache.clear()
 
     @classmethod
     def class_name(cls) -> str:
@@ -172,25 +312,26 @@ class CustomLLMRerank(BaseNodePostprocessor):
             pass
         return await self._postprocess_nodes(nodes, query_bundle)
 
-    async def _postprocess_nodes(
+    def _cache_relevances(
+        self, query_str: str, relevances: dict[str, float | None]
+    ) -> None:
+        """Store the relevances of a scored batch, evicting the oldest entries"""
+        for node_id, relevance in relevances.items():
+            self._relevance_cache[(query_str, node_id)] = relevance
+            self._relevance_cache.move_to_end((query_str, node_id))
+        while len(self._relevance_cache) > self.max_cached_relevances:
+            self._relevance_cache.popitem(last=False)
+
+    async def _score_batch(
         self,
-        nodes: list[NodeWithScore],
-        query_bundle: QueryBundle | None = None,
-    ) -> list[NodeWithScore]:
-        if query_bundle is None:
-            raise ValueError("Query bundle must be provided.")
-        if len(nodes) == 0:
-            return []
-
-        initial_results: list[NodeWithScore] = []
-        for idx in range(0, len(nodes), self.choice_batch_size):
-            nodes_batch = [
-                node.node for node in nodes[idx : idx + self.choice_batch_size]
-            ]
-
-            query_str = query_bundle.query_str
-            fmt_batch_str = self._format_node_batch_fn(nodes_batch)
-            # call each batch independently
+        nodes_batch: list[BaseNode],
+        query_str: str,
+        semaphore: asyncio.Semaphore,
+    ) -> dict[str, float | None]:
+        """Score one batch with the LLM and return the relevance per node id.
+        Nodes the LLM did not select get a relevance of None."""
+        fmt_batch_str = self._format_node_batch_fn(nodes_batch)
+        async with semaphore:
             raw_response = await self.llm.apredict(
                 self.choice_select_prompt,
                 context_str=fmt_batch_str,
@@ -212,16 +353,80 @@ class CustomLLMRerank(BaseNodePostprocessor):
                 raw_choices, relevances = self._parse_choice_select_answer_fn(
                     raw_response, len(nodes_batch)
                 )
-            choice_idxs = [int(choice) - 1 for choice in raw_choices]
-            choice_nodes = [nodes_batch[idx] for idx in choice_idxs]
-            relevances = relevances or [1.0 for _ in choice_nodes]
-            initial_results.extend(
-                [
-                    NodeWithScore(node=node, score=relevance)
-                    for node, relevance in zip(choice_nodes, relevances)
-                ]
-            )
+        choice_idxs = [int(choice) - 1 for choice in raw_choices]
+        relevances = relevances or [1.0 for _ in choice_idxs]
+
+        batch_relevances: dict[str, float | None] = {
+            node.node_id: None for node in nodes_batch
+        }
+        for idx, relevance in zip(choice_idxs, relevances):
+            batch_relevances[nodes_batch[idx].node_id] = relevance
+        self._cache_relevances(query_str, batch_relevances)
+        return batch_relevances
+
+    def _has_enough_relevant(self, relevances: dict[str, float | None]) -> bool:
+        """Whether top_n nodes at or above the relevance threshold were found"""
+        if self.relevance_threshold is None:
+            return False
+        num_relevant = sum(
+            1
+            for relevance in relevances.values()
+            if relevance is not None and relevance >= self.relevance_threshold
+        )
+        return num_relevant >= self.top_n
 
+    async def _postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Query bundle must be provided.")
+        if len(nodes) == 0:
+            return []
+
+        query_str = query_bundle.query_str
+        nodes_by_id = {node.node.node_id: node.node for node in nodes}
+
+        relevances: dict[str, float | None] = {}
+        uncached_nodes = []
+        for node_id, node in nodes_by_id.items():
+            if (query_str, node_id) in self._relevance_cache:
+                relevances[node_id] = self._relevance_cache[(query_str, node_id)]
+            else:
+                uncached_nodes.append(node)
+        logger.info(
+            f"Reranking {len(uncached_nodes)} nodes, "
+            f"{len(relevances)} relevances cached"
+        )
+
+        if uncached_nodes and not self._has_enough_relevant(relevances):
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            tasks = [
+                asyncio.create_task(
+                    self._score_batch(
+                        uncached_nodes[idx : idx + self.choice_batch_size],
+                        query_str,
+                        semaphore,
+                    )
+                )
+                for idx in range(0, len(uncached_nodes), self.choice_batch_size)
+            ]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    relevances.update(await task)
+                    if self._has_enough_relevant(relevances):
+                        logger.info("Found enough relevant nodes, stopping early")
+                        break
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        initial_results = [
+            NodeWithScore(node=node, score=relevances[node_id])
+            for node_id, node in nodes_by_id.items()
+            if relevances.get(node_id) is not None
+        ]
         return sorted(initial_results, key=lambda x: x.score or 0.0, reverse=True)[
             : self.top_n
         ]
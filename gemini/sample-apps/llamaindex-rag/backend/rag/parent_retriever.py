@@ -2,53 +2,92 @@
 
 import logging
 
+from backend.rag.node_cache import NodeCache
 from llama_index.core import QueryBundle
 from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
-from llama_index.core.schema import NodeRelationship, NodeWithScore, TextNode
+from llama_index.core.schema import BaseNode, NodeRelationship, NodeWithScore, TextNode
 from llama_index.storage.docstore.firestore import FirestoreDocumentStore
-import pandas as pd
 
 # Set the desired logging level
 logging.basicConfig(encoding="utf-8", level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+SCORE_AGGREGATIONS = {
+    "max": max,
+    "mean": lambda scores: sum(scores) / len(scores),
+    "sum": sum,
+}
+
+
 class ParentRetriever(BaseRetriever):
     """Custom retriever which performs retrieves
     the source document associated with a node."""
 
     def __init__(
-        self, vector_retriever: VectorIndexRetriever, docstore: FirestoreDocumentStore
+        self,
+        vector_retriever: VectorIndexRetriever,
+        docstore: FirestoreDocumentStore,
+        score_aggregation: str = "mean",
+        node_cache: NodeCache | None = None,
     ) -> None:
         """
-        This retriever uses a vector store to do initial node retriever and a documentstore to retrieve nodes by id
+        This retriever uses a vector store to do initial node retriever and a documentstore to retrieve nodes by id.
+        The scores of nodes sharing a source document are combined with score_aggregation
+        (one of "max", "mean" or "sum"), and source documents are cached in a bounded LRU.
         """
+        if score_aggregation not in SCORE_AGGREGATIONS:
+            raise ValueError(
+                f"Unknown score aggregation: {score_aggregation}. "
+                f"Expected one of {list(SCORE_AGGREGATIONS)}"
+            )
 
         self._vector_retriever = vector_retriever
         self._docstore = docstore
+        self._aggregate_scores = SCORE_AGGREGATIONS[score_aggregation]
+        self._node_cache = node_cache or NodeCache()
         super().__init__()
 
+    def _get_source_id_scores(
+        self, initial_nodes: list[NodeWithScore]
+    ) -> dict[str, float]:
+        """Aggregate the scores of the retrieved nodes per source document id"""
+        source_id_scores: dict[str, list[float]] = {}
+        for n in initial_nodes:
+            source_id = n.node.relationships[NodeRelationship.SOURCE].node_id
+            source_id_scores.setdefault(source_id, []).append(n.score or 0.0)
+        return {
+            source_id: self._aggregate_scores(scores)
+            for source_id, scores in source_id_scores.items()
+        }
+
+    @staticmethod
+    def _to_source_nodes(
+        source_id_scores: dict[str, float], source_docs: dict[str, BaseNode]
+    ) -> list[NodeWithScore]:
+        """Wrap each source document into a scored text node"""
+        return [
+            NodeWithScore(
+                node=TextNode(id_=source_id, text=source_docs[source_id].text),
+                score=score,
+            )
+            for source_id, score in source_id_scores.items()
+        ]
+
     def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
         """Expand retrieved nodes into all their source documents"""
         initial_nodes = self._vector_retriever.retrieve(query_bundle)
-        node_source_id_score_df = pd.DataFrame(
-            [
-                {
-                    "source_id": n.node.relationships[NodeRelationship.SOURCE].node_id,
-                    "score": n.score,
-                }
-                for n in initial_nodes
-            ]
+        source_id_scores = self._get_source_id_scores(initial_nodes)
+        source_docs = self._node_cache.get_documents(
+            self._docstore, list(source_id_scores)
         )
-        final_df = (
-            node_source_id_score_df.groupby("source_id")["score"].mean().reset_index()
-        )
-        unique_source_doc_ids_scores = final_df.to_dict("records")
-
-        source_docs = []
-        for doc_score in unique_source_doc_ids_scores:
-            source_doc = self._docstore.get_document(doc_score["source_id"])
-            node = TextNode(id_=doc_score["source_id"], text=source_doc.text)
-            source_docs.append(NodeWithScore(node=node, score=doc_score["score"]))
+        return self._to_source_nodes(source_id_scores, source_docs)
 
-        return source_docs
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        """Expand retrieved nodes into all their source documents"""
+        initial_nodes = await self._vector_retriever.aretrieve(query_bundle)
+        source_id_scores = self._get_source_id_scores(initial_nodes)
+        source_docs = await self._node_cache.aget_documents(
+            self._docstore, list(source_id_scores)
+        )
+        return self._to_source_nodes(source_id_scores, source_docs)
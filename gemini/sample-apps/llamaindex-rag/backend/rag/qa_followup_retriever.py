@@ -1,8 +1,10 @@
 """Custom retriever which implements
 retrieval based on hypothetical questions"""
 
+import asyncio
 import logging
 
+from backend.rag.node_cache import NodeCache
 from llama_index.core import QueryBundle
 from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
 from llama_index.core.schema import NodeRelationship, NodeWithScore
@@ -15,12 +17,15 @@ logger = logging.getLogger(__name__)
 
 class QARetriever(BaseRetriever):
     """Retrieves nodes based on questions answered by nodes. First identifies
-    document ids based on vector search and then does lookup in document store."""
+    document ids based on vector search and then does lookup in document store.
+    Source documents are read once per distinct id through a short-TTL node cache.
+    """
 
     def __init__(
         self,
         qa_vector_retriever: VectorIndexRetriever,
         docstore: FirestoreDocumentStore,
+        node_cache: NodeCache | None = None,
     ) -> None:
         """
         This retriever uses a vector store to do
@@ -29,40 +34,40 @@ class QARetriever(BaseRetriever):
 
         self._qa_vector_retriever = qa_vector_retriever
         self._docstore = docstore
+        self._node_cache = node_cache or NodeCache()
         super().__init__()
 
+    @staticmethod
+    def _get_source_doc_ids(qa_nodes: list[NodeWithScore]) -> list[str]:
+        """Return the id of the source document of each matched question"""
+        return [
+            nodewscore.node.relationships[NodeRelationship.SOURCE].node_id
+            for nodewscore in qa_nodes
+        ]
+
     def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
         qa_nodes = self._qa_vector_retriever.retrieve(query_bundle)
-        og_docs = []
         for nodewscore in qa_nodes:
             logger.info(nodewscore.node.text)
-            source_doc_id = nodewscore.node.relationships[
-                NodeRelationship.SOURCE
-            ].node_id
-            og_docs.append(
-                NodeWithScore(
-                    node=self._docstore.get_document(source_doc_id),
-                    score=nodewscore.score,
-                )
-            )
-
-        return og_docs
+        source_doc_ids = self._get_source_doc_ids(qa_nodes)
+        source_docs = self._node_cache.get_documents(self._docstore, source_doc_ids)
+        return [
+            NodeWithScore(node=source_docs[source_doc_id], score=nodewscore.score)
+            for source_doc_id, nodewscore in zip(source_doc_ids, qa_nodes)
+        ]
 
     async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
         qa_nodes = await self._qa_vector_retriever.aretrieve(query_bundle)
-        og_docs = []
         for nodewscore in qa_nodes:
             logger.info(f"Matched Question: {nodewscore.node.text}")
-            source_doc_id = nodewscore.node.relationships[
-                NodeRelationship.SOURCE
-            ].node_id
-            og_docs.append(
-                NodeWithScore(
-                    node=self._docstore.get_document(source_doc_id),
-                    score=nodewscore.score,
-                )
-            )
-        return og_docs
+        source_doc_ids = self._get_source_doc_ids(qa_nodes)
+        source_docs = await self._node_cache.aget_documents(
+            self._docstore, source_doc_ids
+        )
+        return [
+            NodeWithScore(node=source_docs[source_doc_id], score=nodewscore.score)
+            for source_doc_id, nodewscore in zip(source_doc_ids, qa_nodes)
+        ]
 
 
 class QAFollowupRetriever(BaseRetriever):
@@ -99,8 +104,11 @@ class QAFollowupRetriever(BaseRetriever):
         return retrieve_nodes
 
     async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
-        am_nodes = await self._base_retriever.aretrieve(query_bundle)
-        qa_nodes = await self._qa_retriever.aretrieve(query_bundle)
+        # The two retrievers are independent, so run them concurrently
+        am_nodes, qa_nodes = await asyncio.gather(
+            self._base_retriever.aretrieve(query_bundle),
+            self._qa_retriever.aretrieve(query_bundle),
+        )
 
         am_ids = {n.node.node_id for n in am_nodes}
         qa_ids = {n.node.node_id for n in qa_nodes}
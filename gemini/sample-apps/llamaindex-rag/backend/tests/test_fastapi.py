@@ -35,6 +35,24 @@ def test_query_rag(client, payload):
     assert response.status_code == 200
 
 
+@pytest.mark.parametrize("payload", query_rag_params)
+def test_query_rag_eval_job(client, payload):
+    response = client.post("/query_rag", json=payload)
+    assert response.status_code == 200
+    eval_job_id = response.json()["eval_job_id"]
+    job_response = client.get(f"/eval_jobs/{eval_job_id}")
+    assert job_response.status_code == 200
+    assert job_response.json()["status"] in ("pending", "running", "completed")
+
+
+@pytest.mark.parametrize("payload", query_rag_params)
+def test_query_rag_stream(client, payload):
+    response = client.post("/query_rag_stream", json=payload)
+    assert response.status_code == 200
+    assert response.text.startswith("event: sources")
+    assert "event: done" in response.text
+
+
 eval_batch_params = [
     {
         "llm_name": "gemini-1.5-flash",
@@ -1,6 +1,7 @@
 import os
 
 from backend.rag.index_manager import IndexManager
+from backend.rag.prompts import Prompts
 import yaml
 
 # Load configuration from config.yaml
@@ -59,3 +60,34 @@ def test_no_qa_vector_store():
     assert index_manager.qa_index == None
     assert index_manager.qa_endpoint_name == None
     assert index_manager.qa_index_name == None
+
+
+def test_query_engine_cache():
+    index_manager = IndexManager(
+        project_id=PROJECT_ID,
+        location=LOCATION,
+        embeddings_model_name=EMBEDDINGS_MODEL_NAME,
+        base_index_name=VECTOR_INDEX_NAME,
+        base_endpoint_name=INDEX_ENDPOINT_NAME,
+        qa_index_name=QA_INDEX_NAME,
+        qa_endpoint_name=QA_ENDPOINT_NAME,
+        firestore_db_name=FIRESTORE_DB_NAME,
+        firestore_namespace=FIRESTORE_NAMESPACE,
+        vs_bucket_name=BUCKET_NAME,
+    )
+    prompts = Prompts()
+    query_engine = index_manager.get_query_engine(prompts=prompts)
+    assert index_manager.get_query_engine(prompts=prompts) is query_engine
+    assert index_manager.get_query_engine(prompts=prompts, similarity_top_k=3) is not (
+        query_engine
+    )
+
+    index_manager.set_current_indexes(
+        VECTOR_INDEX_NAME,
+        INDEX_ENDPOINT_NAME,
+        QA_INDEX_NAME,
+        QA_ENDPOINT_NAME,
+        FIRESTORE_DB_NAME,
+        FIRESTORE_NAMESPACE,
+    )
+    assert index_manager.get_query_engine(prompts=prompts) is not query_engine
@@ -43,9 +43,18 @@ DATA_PATH = config["data_path"]
 
 
 class Blob:
-    def __init__(self, path: str, mimetype: str):
+    def __init__(
+        self,
+        path: str,
+        mimetype: str,
+        generation: str | None = None,
+        md5_hash: str | None = None,
+    ):
         self.path = path
         self.mimetype = mimetype
+        # Identify the object version, so unchanged sources can be skipped
+        self.generation = generation
+        self.md5_hash = md5_hash
 
 
 def download_blob(bucket_name, source_blob_name, destination_file_name):
@@ -178,6 +187,8 @@ def create_pdf_blob_list(bucket_name, prefix):
         Blob(
             path=f"gs://{bucket_name}/{blob.name}",
             mimetype=blob.content_type or "application/pdf",
+            generation=str(blob.generation),
+            md5_hash=blob.md5_hash,
         )
         for blob in blobs
         if blob.name.lower().endswith(".pdf")
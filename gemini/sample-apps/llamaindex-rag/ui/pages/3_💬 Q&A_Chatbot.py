@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 
 from google.cloud.logging import Client
 from google.cloud.logging.handlers import CloudLoggingHandler
@@ -116,6 +117,21 @@ def query_fastapi(
     return None
 
 
+def poll_eval_job(job_id, timeout=180, interval=1.0):
+    """Wait for a background evaluation job and return its metrics"""
+    url = f"{config['fastapi_url']}/eval_jobs/{job_id}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(url, timeout=30).json()
+        if job["status"] == "completed":
+            return job["result"]
+        if job["status"] == "failed":
+            cloud_logger.debug(f"Evaluation job failed: {job['error']}")
+            return {}
+        time.sleep(interval)
+    return {}
+
+
 def extract_top_titles_and_content(response, num_chunks=3):
     if response and "retrieved_chunks" in response:
         chunks = []
@@ -386,6 +402,9 @@ with chat_col:
                                 "No response content received from the server.",
                             )
                             st.markdown(assistant_response)
+                            if evaluate_response and "eval_job_id" in response:
+                                with st.spinner("Evaluating..."):
+                                    response |= poll_eval_job(response["eval_job_id"])
                             if evaluate_response:
                                 st.session_state.metrics = {
                                     "Answer Relevancy": response.get(
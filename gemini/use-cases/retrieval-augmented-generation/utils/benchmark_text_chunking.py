@@ -0,0 +1,107 @@
+"""
+Benchmarks `get_text_token_chunk` / `get_text_chunk_offsets` against `get_text_overlapping_chunk`
+on large synthetic pages.
+
+Importing `intro_multimodal_rag_utils` loads the Vertex AI embedding models, so run this script in an
+environment where Vertex AI is initialized, from this directory:
+
+    python benchmark_text_chunking.py --page-chars 200000 --pages 20
+"""
+
+import argparse
+from collections.abc import Callable
+import random
+import time
+import tracemalloc
+from typing import Any
+
+from intro_multimodal_rag_utils import (
+    get_text_chunk_offsets,
+    get_text_overlapping_chunk,
+    get_text_token_chunk,
+)
+
+WORDS = (
+    "revenue growth margin quarter customer cloud platform model data "
+    "infrastructure product market operating income segment services"
+).split()
+
+
+def make_page(num_chars: int, seed: int) -> str:
+    """Builds a synthetic page of sentences and paragraphs with roughly `num_chars` characters."""
+    rng = random.Random(seed)
+    parts: list[str] = []
+    size = 0
+    while size < num_chars:
+        sentence = " ".join(rng.choices(WORDS, k=rng.randint(5, 30))).capitalize()
+        sentence += rng.choice([". ", ". ", "? ", ".\n\n"])
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)
+
+
+def run(
+    name: str, chunker: Callable[[str], Any], pages: list[str]
+) -> dict[str, float | int | str]:
+    """Times a chunker over all pages, then measures its peak traced memory in a second pass."""
+    start = time.perf_counter()
+    results = [chunker(page) for page in pages]
+    elapsed = time.perf_counter() - start
+    del results
+
+    tracemalloc.start()
+    results = [chunker(page) for page in pages]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "chunker": name,
+        "chunks": sum(len(result) for result in results),
+        "seconds": round(elapsed, 4),
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--page-chars", type=int, default=200_000)
+    parser.add_argument("--character-limit", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    pages = [make_page(args.page_chars, seed) for seed in range(args.pages)]
+
+    for result in (
+        run(
+            "get_text_overlapping_chunk",
+            lambda page: get_text_overlapping_chunk(
+                page, args.character_limit, args.overlap
+            ),
+            pages,
+        ),
+        run(
+            "get_text_token_chunk",
+            lambda page: get_text_token_chunk(
+                page, args.max_tokens, args.overlap_tokens
+            ),
+            pages,
+        ),
+        run(
+            "get_text_chunk_offsets",
+            lambda page: get_text_chunk_offsets(
+                page, args.max_tokens, args.overlap_tokens
+            ),
+            pages,
+        ),
+    ):
+        print(
+            f"{result['chunker']:<28} chunks={result['chunks']:<8} "
+            f"seconds={result['seconds']:<8} peak_mb={result['peak_mb']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
-from collections.abc import Iterable
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import itertools
+import bisect
 import glob
+import hashlib
+import json
 import os
+import random
+import re
+import sqlite3
+import threading
 import time
 from typing import Any
+import weakref
 
 from IPython.display import display
 import PIL
 from colorama import Fore, Style
 import fitz
+from google.api_core import exceptions as google_exceptions
+from google.cloud import storage
 import numpy as np
 import pandas as pd
 from vertexai.generative_models import (
@@ -20,10 +34,253 @@ from vertexai.language_models import TextEmbeddingModel
 from vertexai.vision_models import Image as vision_model_Image
 from vertexai.vision_models import MultiModalEmbeddingModel
 
-text_embedding_model = TextEmbeddingModel.from_pretrained("textembedding-gecko@latest")
+TEXT_EMBEDDING_MODEL_NAME = "textembedding-gecko@latest"
+MULTIMODAL_EMBEDDING_MODEL_NAME = "multimodalembedding@001"
+
+text_embedding_model = TextEmbeddingModel.from_pretrained(TEXT_EMBEDDING_MODEL_NAME)
 multimodal_embedding_model = MultiModalEmbeddingModel.from_pretrained(
-    "multimodalembedding@001"
+    MULTIMODAL_EMBEDDING_MODEL_NAME
+)
+
+
+# Persistent embedding cache
+
+
+class EmbeddingCache:
+    """
+    A persistent, content-addressed cache of embeddings stored in a local SQLite database.
+
+    Entries are keyed by a hash of the model name, the embedding dimension and the embedded content,
+    so re-embedding the same text or image bytes is served locally. Images in Cloud Storage are keyed
+    by their URI and object generation, so an overwritten object is embedded again. When the cache grows beyond
+    `max_entries`, the least recently used entries are evicted. The cache is safe to share between threads.
+
+    Args:
+        path: The path of the SQLite database file. Parent directories are created if needed.
+        max_entries: The maximum number of embeddings kept in the cache. (Default: 1,000,000)
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(model_name: str, dimension: int | None, content: str | bytes) -> str:
+        """
+        Builds the cache key for an embedding.
+
+        Args:
+            model_name: The name of the embedding model.
+            dimension: The embedding dimension, or None when the model has a fixed dimension.
+            content: The embedded content (text or raw image bytes).
+
+        Returns:
+            A hex SHA-256 digest identifying the embedding.
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        digest = hashlib.sha256()
+        digest.update(f"{model_name}\0{dimension}\0".encode("utf-8"))
+        digest.update(content)
+        return digest.hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, list]:
+        """
+        Looks up several embeddings and marks the found ones as recently used.
+
+        Args:
+            keys: The cache keys to look up.
+
+        Returns:
+            A dictionary mapping each found key to its embedding (a list of floats).
+        """
+        found: dict[str, list] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                rows = self._connection.execute(
+                    "SELECT key, embedding FROM embeddings WHERE key IN "
+                    f"({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update(
+                    (key, np.frombuffer(embedding, dtype=np.float64).tolist())
+                    for key, embedding in rows
+                )
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._connection.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> list | None:
+        """Returns the cached embedding for a key, or None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: dict[str, Iterable[float]]) -> None:
+        """
+        Stores several embeddings and evicts the least recently used entries above `max_entries`.
+
+        Args:
+            items: A dictionary mapping cache keys to embeddings.
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, np.fromiter(embedding, dtype=np.float64).tobytes(), now)
+                    for key, embedding in items.items()
+                ],
+            )
+            (size,) = self._connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()
+            if size > self.max_entries:
+                self._connection.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (size - self.max_entries,),
+                )
+            self._connection.commit()
+
+    def put(self, key: str, embedding: Iterable[float]) -> None:
+        """Stores one embedding in the cache."""
+        self.put_many({key: embedding})
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the hit and miss counters, the hit rate and the number of cached embeddings."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self),
+        }
+
+    def clear(self) -> None:
+        """Removes all cached embeddings and resets the counters."""
+        with self._lock:
+            self._connection.execute("DELETE FROM embeddings")
+            self._connection.commit()
+            self.hits = self.misses = 0
+
+
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "multimodal_rag", "embeddings.sqlite"
 )
+# Setting this environment variable to a database path enables the embedding cache
+EMBEDDING_CACHE_ENV_VAR = "MULTIMODAL_RAG_EMBEDDING_CACHE"
+
+# The embedding cache is disabled unless enabled with `enable_embedding_cache`, `set_embedding_cache`
+# or EMBEDDING_CACHE_ENV_VAR. It is opened on first use, so importing this module does not touch the
+# filesystem.
+embedding_cache: EmbeddingCache | None = None
+_embedding_cache_configured = False
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """
+    Returns the embedding cache used by the embedding helpers. Unless `enable_embedding_cache` or
+    `set_embedding_cache` was called, the cache is opened on first use at the path set in the
+    `MULTIMODAL_RAG_EMBEDDING_CACHE` environment variable, if any.
+
+    Returns:
+        The EmbeddingCache, or None if caching is disabled (the default).
+    """
+    global embedding_cache, _embedding_cache_configured
+    with _embedding_cache_lock:
+        if not _embedding_cache_configured:
+            path = os.environ.get(EMBEDDING_CACHE_ENV_VAR)
+            embedding_cache = EmbeddingCache(path) if path else None
+            _embedding_cache_configured = True
+        return embedding_cache
+
+
+def enable_embedding_cache(
+    path: str = DEFAULT_EMBEDDING_CACHE_PATH, max_entries: int = 1_000_000
+) -> EmbeddingCache:
+    """
+    Enables the persistent embedding cache, so embeddings are reused across runs.
+
+    Args:
+        path: The path of the SQLite database file. (Default: ~/.cache/multimodal_rag/embeddings.sqlite)
+        max_entries: The maximum number of embeddings kept in the cache. (Default: 1,000,000)
+
+    Returns:
+        The enabled EmbeddingCache.
+    """
+    cache = EmbeddingCache(path, max_entries=max_entries)
+    set_embedding_cache(cache)
+    return cache
+
+
+def set_embedding_cache(cache: EmbeddingCache | None) -> None:
+    """
+    Replaces the embedding cache used by the embedding helpers.
+
+    Args:
+        cache: The EmbeddingCache to use, or None to disable caching and always call the embedding models.
+    """
+    global embedding_cache, _embedding_cache_configured
+    with _embedding_cache_lock:
+        embedding_cache = cache
+        _embedding_cache_configured = True
+
+
+@lru_cache(maxsize=1)
+def _get_storage_client() -> storage.Client:
+    return storage.Client()
+
+
+def _get_image_content(image_uri: str) -> bytes | None:
+    """
+    Returns what identifies the content of an image in the embedding cache: the bytes of a local image,
+    or the URI and object generation of a gs:// image. Returns None when it cannot be determined, e.g. for
+    other remote URIs, and the image is then not cached.
+    """
+    if os.path.isfile(image_uri):
+        with open(image_uri, "rb") as f:
+            return f.read()
+    if image_uri.startswith("gs://"):
+        try:
+            blob = storage.Blob.from_string(image_uri, client=_get_storage_client())
+            blob.reload()
+        except Exception as e:
+            print(f"Not caching the embedding of {image_uri}: {e}")
+            return None
+        return f"{image_uri}#{blob.generation}".encode("utf-8")
+    return None
 
 
 # Functions for getting text and image embeddings
@@ -46,8 +303,7 @@ def get_text_embedding_from_text_embedding_model(
                                The format (list or NumPy array) depends on the
                                value of the 'return_array' parameter.
     """
-    embeddings = text_embedding_model.get_embeddings([text])
-    text_embedding = [embedding.values for embedding in embeddings][0]
+    text_embedding = get_text_embeddings_from_text_embedding_model([text])[0]
 
     if return_array:
         return np.fromiter(text_embedding, dtype=float)
@@ -56,11 +312,61 @@ def get_text_embedding_from_text_embedding_model(
     return text_embedding
 
 
+def get_text_embeddings_from_text_embedding_model(
+    texts: list[str],
+    batch_size: int = 25,
+    rate_limiter: "TokenBucket | None" = None,
+    max_retries: int = 0,
+) -> list[list]:
+    """
+    Generates text embeddings for a list of texts, sending them to the text embedding model in batches.
+
+    Cached embeddings are looked up first, so only requests for uncached texts wait on the rate limiter.
+
+    Args:
+        texts: The input text strings to be embedded.
+        batch_size: The maximum number of texts sent in one request. (Default: 25)
+        rate_limiter: An optional TokenBucket acquired before each request.
+        max_retries: The maximum number of retries of a request on quota and transient errors. (Default: 0)
+
+    Returns:
+        list: One embedding (a list of floats) per input text, in the same order.
+    """
+    cache = get_embedding_cache()
+    keys = [
+        EmbeddingCache.make_key(TEXT_EMBEDDING_MODEL_NAME, None, text) for text in texts
+    ]
+    cached = cache.get_many(keys) if cache is not None else {}
+
+    # Only send the texts that are not cached yet, de-duplicated
+    texts_by_key = dict(zip(keys, texts))
+    missing = [key for key in texts_by_key if key not in cached]
+    missing_texts = [texts_by_key[key] for key in missing]
+    for start in range(0, len(missing_texts), batch_size):
+        embeddings = call_with_retry(
+            text_embedding_model.get_embeddings,
+            missing_texts[start : start + batch_size],
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+        )
+        new_embeddings = {
+            key: embedding.values
+            for key, embedding in zip(missing[start : start + batch_size], embeddings)
+        }
+        if cache is not None:
+            cache.put_many(new_embeddings)
+        cached.update(new_embeddings)
+
+    return [cached[key] for key in keys]
+
+
 def get_image_embedding_from_multimodal_embedding_model(
     image_uri: str,
     embedding_size: int = 512,
     text: str | None = None,
     return_array: bool | None = False,
+    rate_limiter: "TokenBucket | None" = None,
+    max_retries: int = 0,
 ) -> list:
     """Extracts an image embedding from a multimodal embedding model.
     The function can optionally utilize contextual text to refine the embedding.
@@ -71,19 +377,44 @@ def get_image_embedding_from_multimodal_embedding_model(
         embedding_size (int): The desired dimensionality of the output embedding. Defaults to 512.
         return_array (Optional[bool]): If True, returns the embedding as a NumPy array.
         Otherwise, returns a list. Defaults to False.
+        rate_limiter (Optional[TokenBucket]): A rate limiter acquired before the model request,
+        which is skipped on a cache hit. Defaults to None.
+        max_retries (int): The maximum number of retries of the request on quota and transient errors.
+        Defaults to 0.
 
     Returns:
         list: A list containing the image embedding values. If `return_array` is True, returns a NumPy array instead.
     """
-    image = vision_model_Image.load_from_file(image_uri)
-    embeddings = multimodal_embedding_model.get_embeddings(
-        image=image, contextual_text=text, dimension=embedding_size
-    )  # 128, 256, 512, 1408
+    cache = get_embedding_cache()
+    image_content = _get_image_content(image_uri) if cache is not None else None
+    image_embedding = None
+    key = None
+    if cache is not None and image_content is not None:
+        key = EmbeddingCache.make_key(
+            MULTIMODAL_EMBEDDING_MODEL_NAME,
+            embedding_size,
+            f"{text}\0".encode("utf-8") + image_content,
+        )
+        image_embedding = cache.get(key)
+
+    if image_embedding is None:
+        image = vision_model_Image.load_from_file(image_uri)
+        embeddings = call_with_retry(
+            multimodal_embedding_model.get_embeddings,
+            image=image,
+            contextual_text=text,
+            dimension=embedding_size,  # 128, 256, 512, 1408
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+        )
+        image_embedding = embeddings.image_embedding
+        if cache is not None and key is not None:
+            cache.put(key, image_embedding)
 
     if return_array:
-        return np.fromiter(embeddings.image_embedding, dtype=float)
+        return np.fromiter(image_embedding, dtype=float)
 
-    return embeddings.image_embedding
+    return image_embedding
 
 
 def get_text_overlapping_chunk(
@@ -130,6 +461,140 @@ def get_text_overlapping_chunk(
     return chunked_text_dict
 
 
+# Approximate tokens as words or single punctuation characters, which tracks subword token counts
+# closely enough for sizing embedding inputs without loading a tokenizer. Words longer than
+# _MAX_TOKEN_CHARS (e.g. long identifiers or encoded data without whitespace) are hard-split, so a
+# chunk never holds more than max_tokens * _MAX_TOKEN_CHARS characters of tokens.
+_MAX_TOKEN_CHARS = 16
+_TOKEN_PATTERN = re.compile(rf"(\w{{1,{_MAX_TOKEN_CHARS}}})|[^\w\s]")
+_SENTENCE_END_PATTERN = re.compile(r"[.!?]+[\"')\]]*(?=\s)|\n\s*\n")
+
+
+def get_text_chunk_offsets(
+    text: str, max_tokens: int = 256, overlap_tokens: int = 32
+) -> list[tuple[int, int]]:
+    """
+    * Splits a text into sentence- and token-aware chunks without copying it.
+    * Each chunk holds at most `max_tokens` tokens and ends at a sentence boundary whenever one falls in
+      the second half of the chunk; only sentences longer than the limit are cut between tokens.
+    * Consecutive chunks overlap by up to `overlap_tokens` tokens, starting at a sentence boundary when possible
+      and always at a word rather than a punctuation token.
+
+    Args:
+        text: The text to be chunked, e.g. the text of a page.
+        max_tokens: Maximum (approximate) tokens per chunk (defaults to 256).
+        overlap_tokens: Maximum number of overlapping tokens between chunks (defaults to 32).
+
+    Returns:
+        A list of (start, end) character offsets into `text`, one per chunk, so that
+        `text[start:end]` is the chunk text.
+
+    Raises:
+        ValueError: If `overlap_tokens` is not smaller than `max_tokens`.
+    """
+
+    if overlap_tokens >= max_tokens:
+        raise ValueError("Overlap must be smaller than the token limit.")
+
+    token_starts: list[int] = []
+    token_is_word: list[bool] = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        token_starts.append(match.start())
+        token_is_word.append(match.group(1) is not None)
+    if not token_starts:
+        return []
+    num_tokens = len(token_starts)
+
+    # Token indices after which a sentence ends
+    sentence_ends = sorted(
+        {
+            bisect.bisect_left(token_starts, match.end())
+            for match in _SENTENCE_END_PATTERN.finditer(text)
+        }
+    )
+
+    offsets: list[tuple[int, int]] = []
+    start_token = 0
+    while start_token < num_tokens:
+        end_token = min(start_token + max_tokens, num_tokens)
+
+        # Prefer to end at the last sentence boundary in the second half of the chunk
+        if end_token < num_tokens:
+            boundary = bisect.bisect_right(sentence_ends, end_token) - 1
+            if (
+                boundary >= 0
+                and sentence_ends[boundary] > start_token + max_tokens // 2
+            ):
+                end_token = sentence_ends[boundary]
+
+        last_token = _TOKEN_PATTERN.match(text, token_starts[end_token - 1])
+        offsets.append((token_starts[start_token], last_token.end()))
+        if end_token == num_tokens:
+            break
+
+        # Start the next chunk inside the overlap window, at a sentence boundary if there is one
+        next_start = max(end_token - overlap_tokens, start_token + 1)
+        boundary = bisect.bisect_left(sentence_ends, next_start)
+        if boundary < len(sentence_ends) and sentence_ends[boundary] < end_token:
+            next_start = sentence_ends[boundary]
+        # Never start a chunk on punctuation, e.g. the period ending the overlapped sentence
+        while next_start < end_token and not token_is_word[next_start]:
+            next_start += 1
+        start_token = next_start
+
+    return offsets
+
+
+def get_text_token_chunk(
+    text: str, max_tokens: int = 256, overlap_tokens: int = 32
+) -> dict:
+    """
+    A drop-in replacement for `get_text_overlapping_chunk` that uses `get_text_chunk_offsets`.
+
+    Args:
+        text: The text document to be chunked.
+        max_tokens: Maximum (approximate) tokens per chunk (defaults to 256).
+        overlap_tokens: Maximum number of overlapping tokens between chunks (defaults to 32).
+
+    Returns:
+        A dictionary where keys are chunk numbers (starting at 1) and values are the corresponding text chunks.
+    """
+
+    return {
+        chunk_number: text[start:end]
+        for chunk_number, (start, end) in enumerate(
+            get_text_chunk_offsets(text, max_tokens, overlap_tokens), start=1
+        )
+    }
+
+
+def get_text_chunks(
+    text: str,
+    character_limit: int = 1000,
+    overlap: int = 100,
+    max_tokens: int | None = None,
+    overlap_tokens: int = 32,
+) -> dict:
+    """
+    Chunks the text of a page for embedding with the chunker selected by `max_tokens`.
+
+    Args:
+        text: The text document to be chunked.
+        character_limit: Maximum characters per chunk of the character-based chunker (defaults to 1000).
+        overlap: Number of overlapping characters of the character-based chunker (defaults to 100).
+        max_tokens: Maximum (approximate) tokens per chunk of `get_text_token_chunk`, e.g. 256. If None
+                    (the default), the text is chunked by characters with `get_text_overlapping_chunk`.
+        overlap_tokens: Maximum number of overlapping tokens between chunks (defaults to 32).
+
+    Returns:
+        A dictionary where keys are chunk numbers (starting at 1) and values are the corresponding text chunks.
+    """
+
+    if max_tokens is None:
+        return get_text_overlapping_chunk(text, character_limit, overlap)
+    return get_text_token_chunk(text, max_tokens, overlap_tokens)
+
+
 def get_page_text_embedding(text_data: dict | str) -> dict:
     """
     * Generates embeddings for each text chunk using a specified embedding model.
@@ -170,6 +635,8 @@ def get_chunk_text_metadata(
     character_limit: int = 1000,
     overlap: int = 100,
     embedding_size: int = 128,
+    max_tokens: int | None = None,
+    overlap_tokens: int = 32,
 ) -> tuple[str, dict, dict, dict]:
     """
     * Extracts text from a given page object, chunks it, and generates embeddings for each chunk.
@@ -181,6 +648,9 @@ def get_chunk_text_metadata(
         character_limit: Maximum characters per chunk (defaults to 1000).
         overlap: Number of overlapping characters between chunks (defaults to 100).
         embedding_size: Size of the embedding vector (defaults to 128).
+        max_tokens: Maximum (approximate) tokens per chunk, e.g. 256, to chunk with `get_text_token_chunk`.
+                    If None (the default), the text is chunked by `character_limit` and `overlap`.
+        overlap_tokens: Maximum number of overlapping tokens between chunks (defaults to 32).
 
     Returns:
         A tuple containing:
@@ -204,7 +674,9 @@ def get_chunk_text_metadata(
     page_text_embeddings_dict: dict = get_page_text_embedding(text)
 
     # Chunk the text with the given limit and overlap
-    chunked_text_dict: dict = get_text_overlapping_chunk(text, character_limit, overlap)
+    chunked_text_dict: dict = get_text_chunks(
+        text, character_limit, overlap, max_tokens, overlap_tokens
+    )
 
     # Get embeddings for the chunks
     chunk_embeddings_dict: dict = get_page_text_embedding(chunked_text_dict)
@@ -237,6 +709,39 @@ def get_image_for_gemini(
     - Tuple[Image.Image, str]: A tuple containing the Gemini Image object and the image filename.
     """
 
+    image_name = save_pdf_image(
+        doc, image, image_no, image_save_dir, file_name, page_num
+    )
+
+    # Load the saved image as a Gemini Image Object
+    image_for_gemini = Image.load_from_file(image_name)
+
+    return image_for_gemini, image_name
+
+
+def save_pdf_image(
+    doc: fitz.Document,
+    image: tuple,
+    image_no: int,
+    image_save_dir: str,
+    file_name: str,
+    page_num: int,
+) -> str:
+    """
+    Extracts an image from a PDF document, converts it to JPEG format and saves it to a specified directory.
+
+    Parameters:
+    - doc (fitz.Document): The PDF document from which the image is extracted.
+    - image (tuple): A tuple containing image information.
+    - image_no (int): The image number for naming purposes.
+    - image_save_dir (str): The directory where the image will be saved.
+    - file_name (str): The base name for the image file.
+    - page_num (int): The page number from which the image is extracted.
+
+    Returns:
+    - str: The image filename.
+    """
+
     # Extract the image from the document
     xref = image[0]
     pix = fitz.Pixmap(doc, xref)
@@ -253,10 +758,7 @@ def get_image_for_gemini(
     # Save the image to the specified location
     pix.save(image_name)
 
-    # Load the saved image as a Gemini Image Object
-    image_for_gemini = Image.load_from_file(image_name)
-
-    return image_for_gemini, image_name
+    return image_name
 
 
 def get_gemini_response(
@@ -323,6 +825,25 @@ def get_text_metadata_df(
         A Pandas DataFrame with the extracted text, chunk text, and chunk embeddings for each page.
     """
 
+    return_df = pd.DataFrame(get_text_metadata_rows(filename, text_metadata))
+    return_df = return_df.reset_index(drop=True)
+    return return_df
+
+
+def get_text_metadata_rows(
+    filename: str, text_metadata: dict[int | str, dict]
+) -> list[dict]:
+    """
+    Builds the rows of the text metadata DataFrame (one per chunk) from a text metadata dictionary.
+
+    Args:
+        filename: The filename of the document.
+        text_metadata: A dictionary containing the text metadata for each page.
+
+    Returns:
+        A list of dictionaries with the columns of `get_text_metadata_df`.
+    """
+
     final_data_text: list[dict] = []
 
     for key, values in text_metadata.items():
@@ -340,9 +861,7 @@ def get_text_metadata_df(
 
             final_data_text.append(data)
 
-    return_df = pd.DataFrame(final_data_text)
-    return_df = return_df.reset_index(drop=True)
-    return return_df
+    return final_data_text
 
 
 def get_image_metadata_df(
@@ -362,6 +881,25 @@ def get_image_metadata_df(
         A Pandas DataFrame with the extracted image path, image description, and image embeddings for each image.
     """
 
+    return_df = pd.DataFrame(get_image_metadata_rows(filename, image_metadata)).dropna()
+    return_df = return_df.reset_index(drop=True)
+    return return_df
+
+
+def get_image_metadata_rows(
+    filename: str, image_metadata: dict[int | str, dict]
+) -> list[dict]:
+    """
+    Builds the rows of the image metadata DataFrame (one per image) from an image metadata dictionary.
+
+    Args:
+        filename: The filename of the document.
+        image_metadata: A dictionary containing the image metadata for each page.
+
+    Returns:
+        A list of dictionaries with the columns of `get_image_metadata_df`.
+    """
+
     final_data_image: list[dict] = []
     for key, values in image_metadata.items():
         for _, image_values in values.items():
@@ -382,9 +920,7 @@ def get_image_metadata_df(
             ]
             final_data_image.append(data)
 
-    return_df = pd.DataFrame(final_data_image).dropna()
-    return_df = return_df.reset_index(drop=True)
-    return return_df
+    return final_data_image
 
 
 def get_document_metadata(
@@ -404,6 +940,12 @@ def get_document_metadata(
     },
     add_sleep_after_page: bool = False,
     sleep_time_after_page: int = 2,
+    character_limit: int = 1000,
+    overlap: int = 100,
+    max_tokens: int | None = None,
+    overlap_tokens: int = 32,
+    requests_per_minute: dict[str, float] | None = None,
+    max_retries: int = 5,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
     """
     This function takes a PDF path, an image save directory, an image description prompt, an embedding size, and a text embedding text limit as input.
@@ -414,6 +956,16 @@ def get_document_metadata(
         image_description_prompt: A prompt to guide Gemini for generating image descriptions.
         embedding_size: The dimensionality of the embedding vectors.
         text_emb_text_limit: The maximum number of tokens for text embedding.
+        character_limit: Maximum characters per text chunk (defaults to 1000).
+        overlap: Number of overlapping characters between chunks (defaults to 100).
+        max_tokens: Maximum (approximate) tokens per text chunk, e.g. 256, to chunk with
+                    `get_text_token_chunk`. If None (the default), the text is chunked by
+                    `character_limit` and `overlap`.
+        overlap_tokens: Maximum number of overlapping tokens between chunks (defaults to 32).
+        requests_per_minute: Per-model request quotas, see `PageProcessor`. They are not applied
+                             when `add_sleep_after_page` is set, which already paces the requests.
+        max_retries: The maximum number of retries per model call on quota and transient errors
+                     (defaults to 5).
 
     Returns:
         A tuple containing two DataFrames:
@@ -421,7 +973,23 @@ def get_document_metadata(
             * Another DataFrame containing the extracted image metadata for each image in the PDF, including the image path, image description, image embeddings (with and without context), and image description text embedding.
     """
 
-    text_metadata_df_final, image_metadata_df_final = pd.DataFrame(), pd.DataFrame()
+    text_metadata_dfs: list[pd.DataFrame] = []
+    image_metadata_dfs: list[pd.DataFrame] = []
+
+    page_processor = PageProcessor(
+        generative_multimodal_model,
+        image_description_prompt,
+        embedding_size=embedding_size,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+        character_limit=character_limit,
+        overlap=overlap,
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+        requests_per_minute=requests_per_minute,
+        max_retries=max_retries,
+        rate_limit=not add_sleep_after_page,
+    )
 
     for pdf_path in glob.glob(pdf_folder_path + "/*.pdf"):
         print(
@@ -442,61 +1010,21 @@ def get_document_metadata(
         for page_num, page in enumerate(doc):
             print(f"Processing page: {page_num + 1}")
 
-            text = page.get_text()
-            (
-                text,
-                page_text_embeddings_dict,
-                chunked_text_dict,
-                chunk_embeddings_dict,
-            ) = get_chunk_text_metadata(page, embedding_size=embedding_size)
-
-            text_metadata[page_num] = {
-                "text": text,
-                "page_text_embeddings": page_text_embeddings_dict,
-                "chunked_text_dict": chunked_text_dict,
-                "chunk_embeddings_dict": chunk_embeddings_dict,
-            }
-
-            images = page.get_images()
-            image_metadata[page_num] = {}
+            text = page.get_text().encode("ascii", "ignore").decode("utf-8", "ignore")
 
-            for image_no, image in enumerate(images):
-                image_number = int(image_no + 1)
-                image_metadata[page_num][image_number] = {}
-
-                image_for_gemini, image_name = get_image_for_gemini(
+            images = []
+            for image_no, image in enumerate(page.get_images()):
+                image_name = save_pdf_image(
                     doc, image, image_no, image_save_dir, file_name, page_num
                 )
-
                 print(
                     f"Extracting image from page: {page_num + 1}, saved as: {image_name}"
                 )
+                images.append((image_no + 1, image_name))
 
-                response = get_gemini_response(
-                    generative_multimodal_model,
-                    model_input=[image_description_prompt, image_for_gemini],
-                    generation_config=generation_config,
-                    safety_settings=safety_settings,
-                    stream=True,
-                )
-
-                image_embedding = get_image_embedding_from_multimodal_embedding_model(
-                    image_uri=image_name,
-                    embedding_size=embedding_size,
-                )
-
-                image_description_text_embedding = (
-                    get_text_embedding_from_text_embedding_model(text=response)
-                )
-
-                image_metadata[page_num][image_number] = {
-                    "img_num": image_number,
-                    "img_path": image_name,
-                    "img_desc": response,
-                    # "mm_embedding_from_text_desc_and_img": image_embedding_with_description,
-                    "mm_embedding_from_img_only": image_embedding,
-                    "text_embedding_from_image_description": image_description_text_embedding,
-                }
+            text_metadata[page_num], image_metadata[page_num] = (
+                page_processor.process_page(text, images)
+            )
 
             # Add sleep to reduce issues with Quota error on API
             if add_sleep_after_page:
@@ -507,24 +1035,795 @@ def get_document_metadata(
                     """ sec before processing the next page to avoid quota issues. You can disable it: "add_sleep_after_page = False"  """,
                 )
 
-        text_metadata_df = get_text_metadata_df(file_name, text_metadata)
-        image_metadata_df = get_image_metadata_df(file_name, image_metadata)
+        text_metadata_dfs.append(get_text_metadata_df(file_name, text_metadata))
+        image_metadata_dfs.append(
+            get_image_metadata_df(file_name, image_metadata).drop_duplicates(
+                subset=["img_desc"]
+            )
+        )
+
+    if not text_metadata_dfs:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Concatenate once at the end instead of growing the result for every file
+    return (
+        pd.concat(text_metadata_dfs, axis=0).reset_index(drop=True),
+        pd.concat(image_metadata_dfs, axis=0).reset_index(drop=True),
+    )
+
+
+# Functions for streaming, page-parallel extraction
+
+
+def _extract_pdf_pages(
+    pdf_path: str, page_numbers: list[int], image_save_dir: str
+) -> list[dict]:
+    """
+    Extracts the text and images of some pages of a PDF. Runs in a worker process of `extract_pdf_pages`.
+
+    Args:
+        pdf_path: The path to the PDF document.
+        page_numbers: The zero-based numbers of the pages to extract.
+        image_save_dir: The directory where extracted images should be saved.
+
+    Returns:
+        A list of page records, see `extract_pdf_pages`.
+    """
+
+    file_name = pdf_path.split("/")[-1]
+    page_records: list[dict] = []
+
+    with fitz.open(pdf_path) as doc:
+        for page_num in page_numbers:
+            page = doc[page_num]
+            page_records.append(
+                {
+                    "file_name": file_name,
+                    "page_num": page_num,
+                    "text": page.get_text()
+                    .encode("ascii", "ignore")
+                    .decode("utf-8", "ignore"),
+                    "images": [
+                        (
+                            image_no + 1,
+                            save_pdf_image(
+                                doc,
+                                image,
+                                image_no,
+                                image_save_dir,
+                                file_name,
+                                page_num,
+                            ),
+                        )
+                        for image_no, image in enumerate(page.get_images())
+                    ],
+                }
+            )
+
+    return page_records
+
+
+def extract_pdf_pages(
+    pdf_folder_path: str,
+    image_save_dir: str,
+    max_workers: int | None = None,
+    pages_per_task: int = 8,
+) -> Iterator[dict]:
+    """
+    Extracts the text and images of every page of the PDFs in a folder with a pool of worker processes,
+    yielding one record per page as soon as it is extracted.
+
+    Pages of all files are split into tasks of `pages_per_task` pages, and only a bounded number of tasks
+    is in flight at a time, so memory use does not grow with the size of the corpus. Records are yielded
+    in file and page order.
+
+    Args:
+        pdf_folder_path: The path to the folder containing the PDF documents.
+        image_save_dir: The directory where extracted images should be saved.
+        max_workers: The number of worker processes. Defaults to the number of CPUs.
+        pages_per_task: The number of pages extracted by one task (defaults to 8).
+
+    Yields:
+        A dictionary per page with the keys "file_name", "page_num" (zero-based), "text" and
+        "images" (a list of (image number, image path) tuples).
+    """
+
+    def get_page_tasks() -> Iterator[tuple[str, list[int]]]:
+        for pdf_path in glob.glob(pdf_folder_path + "/*.pdf"):
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+            for start in range(0, page_count, pages_per_task):
+                yield pdf_path, list(
+                    range(start, min(start + pages_per_task, page_count))
+                )
+
+    max_workers = max_workers or os.cpu_count() or 1
+    page_tasks = get_page_tasks()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Keep a bounded window of tasks in flight and yield results in submission order
+        futures: deque[Future] = deque(
+            executor.submit(_extract_pdf_pages, pdf_path, page_numbers, image_save_dir)
+            for pdf_path, page_numbers in itertools.islice(page_tasks, 2 * max_workers)
+        )
+        while futures:
+            page_records = futures.popleft().result()
+            for pdf_path, page_numbers in itertools.islice(page_tasks, 1):
+                futures.append(
+                    executor.submit(
+                        _extract_pdf_pages, pdf_path, page_numbers, image_save_dir
+                    )
+                )
+            yield from page_records
+
+
+def iter_document_metadata(
+    generative_multimodal_model,
+    pdf_folder_path: str,
+    image_save_dir: str,
+    image_description_prompt: str,
+    embedding_size: int = 128,
+    generation_config: GenerationConfig | None = GenerationConfig(
+        temperature=0.2, max_output_tokens=2048
+    ),
+    safety_settings: dict | None = {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    },
+    character_limit: int = 1000,
+    overlap: int = 100,
+    max_workers: int | None = None,
+    max_tokens: int | None = None,
+    overlap_tokens: int = 32,
+    requests_per_minute: dict[str, float] | None = None,
+    max_retries: int = 5,
+) -> Iterator[tuple[list[dict], list[dict]]]:
+    """
+    A generator version of `get_document_metadata` that yields the text and image rows of each page
+    as soon as the page is processed.
+
+    Text and images are extracted by `extract_pdf_pages` in a pool of worker processes, while the
+    embeddings and image descriptions are computed in the calling process by a `PageProcessor`, with
+    the same rate limiting and retries as `get_document_metadata_pipelined`.
+
+    Args:
+        generative_multimodal_model: The Gemini model used to describe the images.
+        pdf_folder_path: The path to the folder containing the PDF documents.
+        image_save_dir: The directory where extracted images should be saved.
+        image_description_prompt: A prompt to guide Gemini for generating image descriptions.
+        embedding_size: The dimensionality of the image embedding vectors.
+        generation_config: The generation config used for the image descriptions.
+        safety_settings: The safety settings used for the image descriptions.
+        character_limit: Maximum characters per text chunk (defaults to 1000).
+        overlap: Number of overlapping characters between chunks (defaults to 100).
+        max_workers: The number of extraction processes. Defaults to the number of CPUs.
+        max_tokens: Maximum (approximate) tokens per text chunk, e.g. 256, to chunk with
+                    `get_text_token_chunk`. If None (the default), the text is chunked by
+                    `character_limit` and `overlap`.
+        overlap_tokens: Maximum number of overlapping tokens between chunks (defaults to 32).
+        requests_per_minute: Per-model request quotas, see `PageProcessor`.
+        max_retries: The maximum number of retries per model call (defaults to 5).
+
+    Yields:
+        A tuple per page with the text rows and the image rows of the page, in the format of
+        `get_text_metadata_rows` and `get_image_metadata_rows`.
+
+    Raises:
+        ValueError: If `overlap` is greater than `character_limit`.
+    """
+
+    page_processor = PageProcessor(
+        generative_multimodal_model,
+        image_description_prompt,
+        embedding_size=embedding_size,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+        character_limit=character_limit,
+        overlap=overlap,
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+        requests_per_minute=requests_per_minute,
+        max_retries=max_retries,
+    )
+
+    for page_record in extract_pdf_pages(
+        pdf_folder_path, image_save_dir, max_workers=max_workers
+    ):
+        file_name, page_num = page_record["file_name"], page_record["page_num"]
+        print(f"Processing file: {file_name}, page: {page_num + 1}")
+
+        text_metadata: dict[int | str, dict] = {}
+        image_metadata: dict[int | str, dict] = {}
+        text_metadata[page_num], image_metadata[page_num] = page_processor.process_page(
+            page_record["text"], page_record["images"]
+        )
+
+        yield (
+            get_text_metadata_rows(file_name, text_metadata),
+            get_image_metadata_rows(file_name, image_metadata),
+        )
+
+
+def get_document_metadata_streaming(
+    generative_multimodal_model,
+    pdf_folder_path: str,
+    image_save_dir: str,
+    image_description_prompt: str,
+    embedding_size: int = 128,
+    **kwargs: Any,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Builds the same two DataFrames as `get_document_metadata` from `iter_document_metadata`, collecting
+    the rows of all pages into lists and creating each DataFrame once at the end.
+
+    Args:
+        generative_multimodal_model: The Gemini model used to describe the images.
+        pdf_folder_path: The path to the folder containing the PDF documents.
+        image_save_dir: The directory where extracted images should be saved.
+        image_description_prompt: A prompt to guide Gemini for generating image descriptions.
+        embedding_size: The dimensionality of the image embedding vectors.
+        **kwargs: Further keyword arguments passed to `iter_document_metadata`.
+
+    Returns:
+        A tuple containing the text metadata DataFrame and the image metadata DataFrame.
+    """
+
+    text_rows: list[dict] = []
+    image_rows: list[dict] = []
+
+    for page_text_rows, page_image_rows in iter_document_metadata(
+        generative_multimodal_model,
+        pdf_folder_path,
+        image_save_dir,
+        image_description_prompt,
+        embedding_size=embedding_size,
+        **kwargs,
+    ):
+        text_rows.extend(page_text_rows)
+        image_rows.extend(page_image_rows)
+
+    text_metadata_df = pd.DataFrame(text_rows)
+    image_metadata_df = pd.DataFrame(image_rows).dropna()
+    if not image_metadata_df.empty:
+        image_metadata_df = image_metadata_df.drop_duplicates(
+            subset=["file_name", "img_desc"]
+        )
+
+    return (
+        text_metadata_df.reset_index(drop=True),
+        image_metadata_df.reset_index(drop=True),
+    )
+
+
+# Functions for pipelined (concurrent, rate-limited) ingestion
+
+# Default request quotas (requests per minute) for each model used during ingestion.
+DEFAULT_REQUESTS_PER_MINUTE: dict[str, float] = {
+    "gemini": 60,
+    "text_embedding": 600,
+    "multimodal_embedding": 120,
+}
+
+RETRYABLE_EXCEPTIONS: tuple[type[Exception], ...] = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+class TokenBucket:
+    """
+    A thread-safe token-bucket rate limiter.
+
+    Args:
+        requests_per_minute: The sustained number of requests allowed per minute.
+        burst: The maximum number of requests that can be sent back to back. Defaults to one second of quota.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: float | None = None) -> None:
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a request can be sent without exceeding the rate."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def call_with_retry(
+    function: Callable[..., Any],
+    *args: Any,
+    rate_limiter: TokenBucket | None = None,
+    max_retries: int = 5,
+    initial_backoff: float = 1.0,
+    **kwargs: Any,
+) -> Any:
+    """
+    Calls a function, waiting on a rate limiter before each attempt and retrying quota and transient
+    API errors with exponential backoff and jitter.
+
+    Args:
+        function: The function to call.
+        *args: Positional arguments passed to the function.
+        rate_limiter: An optional TokenBucket to acquire before each attempt.
+        max_retries: The maximum number of retries after the first attempt. (Default: 5)
+        initial_backoff: The wait before the first retry in seconds, doubled on every retry. (Default: 1.0)
+        **kwargs: Keyword arguments passed to the function.
+
+    Returns:
+        The return value of the function.
+
+    Raises:
+        Exception: The last error raised by the function once the retries are exhausted.
+    """
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return function(*args, **kwargs)
+        except RETRYABLE_EXCEPTIONS as e:
+            if attempt == max_retries:
+                raise
+            backoff = initial_backoff * 2**attempt * (1 + random.random())
+            print(
+                f"Retrying {getattr(function, '__name__', function)} in {backoff:.1f} sec after error: {e}"
+            )
+            time.sleep(backoff)
+
+
+class PageProcessor:
+    """
+    Chunks, embeds and describes the text and images of PDF pages.
+
+    `get_document_metadata`, `iter_document_metadata` and `get_document_metadata_pipelined` all process
+    pages with it. The text of a page and all of its chunks are embedded with batched requests, every
+    model has its own token-bucket rate limiter, and quota or transient errors are retried with
+    exponential backoff. Embeddings found in the embedding cache do not wait on a rate limiter. The
+    processor is thread-safe, so pages and images can be processed concurrently.
 
-        text_metadata_df_final = pd.concat(
-            [text_metadata_df_final, text_metadata_df], axis=0
+    Args:
+        generative_multimodal_model: The Gemini model used to describe the images.
+        image_description_prompt: A prompt to guide Gemini for generating image descriptions.
+        embedding_size: The dimensionality of the image embedding vectors. (Default: 128)
+        generation_config: The generation config used for the image descriptions.
+        safety_settings: The safety settings used for the image descriptions.
+        character_limit: Maximum characters per text chunk of the character-based chunker. (Default: 1000)
+        overlap: Number of overlapping characters of the character-based chunker. (Default: 100)
+        max_tokens: Maximum (approximate) tokens per text chunk, e.g. 256, or None to chunk by characters. (Default: None)
+        overlap_tokens: Maximum number of overlapping tokens between chunks. (Default: 32)
+        requests_per_minute: Per-model request quotas, keyed by "gemini", "text_embedding" and
+                             "multimodal_embedding". Missing keys use `DEFAULT_REQUESTS_PER_MINUTE`.
+        rate_limit: Whether model calls wait on the rate limiters. Disable it when the caller paces
+                    requests itself, e.g. by sleeping after every page. (Default: True)
+        max_retries: The maximum number of retries per model call. (Default: 5)
+        text_embedding_batch_size: The maximum number of texts per text-embedding request. (Default: 25)
+
+    Raises:
+        ValueError: If `overlap` is greater than `character_limit`.
+    """
+
+    def __init__(
+        self,
+        generative_multimodal_model,
+        image_description_prompt: str,
+        embedding_size: int = 128,
+        generation_config: GenerationConfig | None = GenerationConfig(
+            temperature=0.2, max_output_tokens=2048
+        ),
+        safety_settings: dict | None = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        },
+        character_limit: int = 1000,
+        overlap: int = 100,
+        max_tokens: int | None = None,
+        overlap_tokens: int = 32,
+        requests_per_minute: dict[str, float] | None = None,
+        max_retries: int = 5,
+        text_embedding_batch_size: int = 25,
+        rate_limit: bool = True,
+    ) -> None:
+        if overlap > character_limit:
+            raise ValueError("Overlap cannot be larger than character limit.")
+
+        self.generative_multimodal_model = generative_multimodal_model
+        self.image_description_prompt = image_description_prompt
+        self.embedding_size = embedding_size
+        self.generation_config = generation_config
+        self.safety_settings = safety_settings
+        self.character_limit = character_limit
+        self.overlap = overlap
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.max_retries = max_retries
+        self.text_embedding_batch_size = text_embedding_batch_size
+        self.rate_limiters: dict[str, TokenBucket | None] = {
+            model: TokenBucket(rate) if rate_limit else None
+            for model, rate in {
+                **DEFAULT_REQUESTS_PER_MINUTE,
+                **(requests_per_minute or {}),
+            }.items()
+        }
+
+    def embed_texts(self, texts: list[str]) -> list[list]:
+        """Embeds texts with batched, rate-limited requests for the uncached ones."""
+        return get_text_embeddings_from_text_embedding_model(
+            texts,
+            batch_size=self.text_embedding_batch_size,
+            rate_limiter=self.rate_limiters["text_embedding"],
+            max_retries=self.max_retries,
         )
-        image_metadata_df_final = pd.concat(
-            [
-                image_metadata_df_final,
-                image_metadata_df.drop_duplicates(subset=["img_desc"]),
+
+    def describe_image(self, image_path: str) -> str:
+        """Generates the Gemini description of an image."""
+        return call_with_retry(
+            get_gemini_response,
+            self.generative_multimodal_model,
+            model_input=[
+                self.image_description_prompt,
+                Image.load_from_file(image_path),
             ],
-            axis=0,
+            generation_config=self.generation_config,
+            safety_settings=self.safety_settings,
+            stream=True,
+            rate_limiter=self.rate_limiters["gemini"],
+            max_retries=self.max_retries,
+        )
+
+    def embed_image(self, image_path: str) -> list:
+        """Generates the multimodal embedding of an image."""
+        return get_image_embedding_from_multimodal_embedding_model(
+            image_uri=image_path,
+            embedding_size=self.embedding_size,
+            rate_limiter=self.rate_limiters["multimodal_embedding"],
+            max_retries=self.max_retries,
+        )
+
+    def get_text_metadata(self, text: str) -> dict:
+        """
+        Chunks the text of a page and embeds the whole text and every chunk.
+
+        Args:
+            text: The text of the page.
+
+        Returns:
+            The text metadata of the page, in the format expected by `get_text_metadata_rows`.
+        """
+
+        chunked_text_dict = get_text_chunks(
+            text,
+            self.character_limit,
+            self.overlap,
+            self.max_tokens,
+            self.overlap_tokens,
+        )
+        text_embeddings = (
+            self.embed_texts([text, *chunked_text_dict.values()]) if text else []
+        )
+        return {
+            "text": text,
+            "page_text_embeddings": (
+                {"text_embedding": text_embeddings[0]} if text_embeddings else {}
+            ),
+            "chunked_text_dict": chunked_text_dict,
+            "chunk_embeddings_dict": dict(zip(chunked_text_dict, text_embeddings[1:])),
+        }
+
+    def get_image_metadata(self, image_number: int, image_path: str) -> dict:
+        """
+        Describes an image and embeds both the image and its description.
+
+        Args:
+            image_number: The one-based number of the image on its page.
+            image_path: The path of the saved image.
+
+        Returns:
+            The metadata of the image, in the format expected by `get_image_metadata_rows`.
+        """
+
+        description = self.describe_image(image_path)
+        return {
+            "img_num": image_number,
+            "img_path": image_path,
+            "img_desc": description,
+            "mm_embedding_from_img_only": self.embed_image(image_path),
+            "text_embedding_from_image_description": self.embed_texts([description])[0],
+        }
+
+    def process_page(
+        self, text: str, images: list[tuple[int, str]]
+    ) -> tuple[dict, dict]:
+        """
+        Processes the text and images of one page, one model call after another.
+
+        Args:
+            text: The text of the page.
+            images: A list of (image number, image path) tuples of the images saved from the page.
+
+        Returns:
+            A tuple of the text metadata and the image metadata (keyed by image number) of the page.
+        """
+
+        return self.get_text_metadata(text), {
+            image_number: self.get_image_metadata(image_number, image_path)
+            for image_number, image_path in images
+        }
+
+
+def get_document_metadata_pipelined(
+    generative_multimodal_model,
+    pdf_folder_path: str,
+    image_save_dir: str,
+    image_description_prompt: str,
+    embedding_size: int = 128,
+    generation_config: GenerationConfig | None = GenerationConfig(
+        temperature=0.2, max_output_tokens=2048
+    ),
+    safety_settings: dict | None = {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    },
+    character_limit: int = 1000,
+    overlap: int = 100,
+    max_workers: int = 16,
+    requests_per_minute: dict[str, float] | None = None,
+    max_retries: int = 5,
+    text_embedding_batch_size: int = 25,
+    max_tokens: int | None = None,
+    overlap_tokens: int = 32,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    A concurrent version of `get_document_metadata` that returns the same two DataFrames.
+
+    PDF parsing and image extraction stay on the calling thread, while the model calls of a
+    `PageProcessor` run on a bounded thread pool: the text of every page and every image are
+    processed concurrently. Every model has its own token-bucket rate limiter, and quota or transient
+    errors are retried with exponential backoff instead of sleeping after every page.
+
+    Args:
+        generative_multimodal_model: The Gemini model used to describe the images.
+        pdf_folder_path: The path to the folder containing the PDF documents.
+        image_save_dir: The directory where extracted images should be saved.
+        image_description_prompt: A prompt to guide Gemini for generating image descriptions.
+        embedding_size: The dimensionality of the image embedding vectors.
+        generation_config: The generation config used for the image descriptions.
+        safety_settings: The safety settings used for the image descriptions.
+        character_limit: Maximum characters per text chunk (defaults to 1000).
+        overlap: Number of overlapping characters between chunks (defaults to 100).
+        max_workers: The maximum number of concurrent model calls (defaults to 16).
+        requests_per_minute: Per-model request quotas, see `PageProcessor`.
+        max_retries: The maximum number of retries per model call (defaults to 5).
+        text_embedding_batch_size: The maximum number of texts per text-embedding request (defaults to 25).
+        max_tokens: Maximum (approximate) tokens per text chunk, e.g. 256, to chunk with
+                    `get_text_token_chunk`. If None (the default), the text is chunked by
+                    `character_limit` and `overlap`.
+        overlap_tokens: Maximum number of overlapping tokens between chunks (defaults to 32).
+
+    Returns:
+        A tuple containing the text metadata DataFrame and the image metadata DataFrame, in the same
+        format as `get_document_metadata`.
+
+    Raises:
+        ValueError: If `overlap` is greater than `character_limit`.
+    """
+
+    page_processor = PageProcessor(
+        generative_multimodal_model,
+        image_description_prompt,
+        embedding_size=embedding_size,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+        character_limit=character_limit,
+        overlap=overlap,
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+        requests_per_minute=requests_per_minute,
+        max_retries=max_retries,
+        text_embedding_batch_size=text_embedding_batch_size,
+    )
+
+    text_metadata_dfs: list[pd.DataFrame] = []
+    image_metadata_dfs: list[pd.DataFrame] = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for pdf_path in glob.glob(pdf_folder_path + "/*.pdf"):
+            print(
+                "\n\n",
+                "Processing the file: ---------------------------------",
+                pdf_path,
+                "\n\n",
+            )
+
+            # Open the PDF file
+            doc: fitz.Document = fitz.open(pdf_path)
+
+            file_name = pdf_path.split("/")[-1]
+
+            text_futures: dict[int, Future] = {}
+            image_futures: dict[int, dict[int, Future]] = {}
+
+            for page_num, page in enumerate(doc):
+                print(f"Processing page: {page_num + 1}")
+
+                text: str = (
+                    page.get_text().encode("ascii", "ignore").decode("utf-8", "ignore")
+                )
+
+                # Embed the whole page and all of its chunks with batched requests
+                text_futures[page_num] = executor.submit(
+                    page_processor.get_text_metadata, text
+                )
+
+                # Describe and embed every image concurrently
+                image_futures[page_num] = {}
+                for image_no, image in enumerate(page.get_images()):
+                    image_name = save_pdf_image(
+                        doc, image, image_no, image_save_dir, file_name, page_num
+                    )
+
+                    print(
+                        f"Extracting image from page: {page_num + 1}, saved as: {image_name}"
+                    )
+
+                    image_futures[page_num][image_no + 1] = executor.submit(
+                        page_processor.get_image_metadata, image_no + 1, image_name
+                    )
+
+            text_metadata: dict[int | str, dict] = {
+                page_num: future.result() for page_num, future in text_futures.items()
+            }
+            image_metadata: dict[int | str, dict] = {
+                page_num: {
+                    image_number: future.result()
+                    for image_number, future in page_images.items()
+                }
+                for page_num, page_images in image_futures.items()
+            }
+
+            text_metadata_dfs.append(get_text_metadata_df(file_name, text_metadata))
+            image_metadata_dfs.append(
+                get_image_metadata_df(file_name, image_metadata).drop_duplicates(
+                    subset=["img_desc"]
+                )
+            )
+
+    if not text_metadata_dfs:
+        return pd.DataFrame(), pd.DataFrame()
+
+    return (
+        pd.concat(text_metadata_dfs, axis=0).reset_index(drop=True),
+        pd.concat(image_metadata_dfs, axis=0).reset_index(drop=True),
+    )
+
+
+# Functions for saving and loading metadata DataFrames
+
+METADATA_MANIFEST_FILE_NAME = "manifest.json"
+METADATA_PARQUET_FILE_NAME = "metadata.parquet"
+
+
+def save_metadata_df(metadata_df: pd.DataFrame, path: str) -> None:
+    """
+    Saves a text or image metadata DataFrame to a directory in a columnar format.
+
+    The non-embedding columns are written to a Parquet file, and every embedding column (a column of
+    lists or arrays) is written as a contiguous float32 side-car `.npy` file that `load_metadata_df`
+    can memory-map.
+
+    Args:
+        metadata_df: The DataFrame returned by `get_text_metadata_df`, `get_image_metadata_df` or
+                     `get_document_metadata`.
+        path: The directory to write to. It is created if it does not exist.
+
+    Raises:
+        ValueError: If an embedding column contains missing values or embeddings of different sizes.
+    """
+
+    os.makedirs(path, exist_ok=True)
+
+    embedding_columns: dict[str, dict[str, Any]] = {}
+    for column_name in metadata_df.columns:
+        values = metadata_df[column_name].to_numpy()
+        if len(values) == 0 or not isinstance(values[0], (list, np.ndarray)):
+            continue
+        if any(value is None for value in values):
+            raise ValueError(f"Embedding column '{column_name}' has missing values.")
+
+        try:
+            embeddings = np.ascontiguousarray(np.vstack(values), dtype=np.float32)
+        except ValueError as e:
+            raise ValueError(
+                f"Embeddings in column '{column_name}' do not all have the same size."
+            ) from e
+        np.save(os.path.join(path, f"{column_name}.npy"), embeddings)
+
+        norms = np.linalg.norm(embeddings, axis=1)
+        embedding_columns[column_name] = {
+            "file_name": f"{column_name}.npy",
+            "normalized": bool(np.allclose(norms, 1.0, atol=1e-3)),
+        }
+
+    metadata_df.drop(columns=list(embedding_columns)).to_parquet(
+        os.path.join(path, METADATA_PARQUET_FILE_NAME), index=False
+    )
+
+    with open(os.path.join(path, METADATA_MANIFEST_FILE_NAME), "w") as f:
+        json.dump(
+            {
+                "columns": list(metadata_df.columns),
+                "num_rows": len(metadata_df),
+                "embedding_columns": embedding_columns,
+            },
+            f,
+            indent=2,
         )
 
-        text_metadata_df_final = text_metadata_df_final.reset_index(drop=True)
-        image_metadata_df_final = image_metadata_df_final.reset_index(drop=True)
 
-    return text_metadata_df_final, image_metadata_df_final
+def load_metadata_df(path: str, mmap: bool = True) -> pd.DataFrame:
+    """
+    Loads a metadata DataFrame saved with `save_metadata_df`.
+
+    Each embedding column holds per-row views into its `.npy` file, which is memory-mapped by default
+    so loading does not read the embeddings into RAM. The loaded arrays are registered with
+    `get_embedding_matrix`, so similarity search on the returned DataFrame scores against them
+    directly without copying.
+
+    Args:
+        path: The directory written by `save_metadata_df`.
+        mmap: If True, memory-maps the embedding files read-only. Otherwise reads them into memory. (Default: True)
+
+    Returns:
+        The metadata DataFrame, with the same columns in the same order as when it was saved.
+    """
+
+    with open(os.path.join(path, METADATA_MANIFEST_FILE_NAME)) as f:
+        manifest = json.load(f)
+
+    metadata_df = pd.read_parquet(os.path.join(path, METADATA_PARQUET_FILE_NAME))
+
+    embedding_matrices: dict[str, np.ndarray] = {}
+    for column_name, column_info in manifest["embedding_columns"].items():
+        # View the memmap as a plain ndarray: per-row memmap objects are much slower to create
+        embeddings = np.load(
+            os.path.join(path, column_info["file_name"]),
+            mmap_mode="r" if mmap else None,
+        ).view(np.ndarray)
+        embedding_matrices[column_name] = embeddings
+        column = np.empty(len(embeddings), dtype=object)
+        column[:] = list(embeddings)
+        metadata_df[column_name] = column
+
+    metadata_df = metadata_df[manifest["columns"]]
+
+    for column_name, embeddings in embedding_matrices.items():
+        _embedding_matrix_cache[(id(metadata_df), column_name)] = EmbeddingMatrix(
+            metadata_df,
+            column_name,
+            matrix=embeddings,
+            normalized=manifest["embedding_columns"][column_name]["normalized"],
+        )
+
+    return metadata_df
 
 
 # Helper Functions
@@ -582,6 +1881,208 @@ def get_cosine_score(
     return round(np.dot(dataframe[column_name], input_text_embed), 2)
 
 
+class EmbeddingMatrix:
+    """
+    An in-memory similarity index over one embedding column of a DataFrame.
+
+    The embeddings are stacked once into a contiguous float32 matrix with L2-normalized
+    rows, so scoring a batch of queries is a single matrix product and the top-k
+    selection uses `np.argpartition` instead of a full sort.
+
+    Args:
+        dataframe: The pandas DataFrame containing the embeddings.
+        column_name: The name of the column containing the embeddings.
+        matrix: An optional pre-built (n_rows, dim) array holding the same embeddings as the column,
+                e.g. a memory-mapped array from `load_metadata_df`. A contiguous float32 array is used
+                without copying when `normalized` is True.
+        normalized: Whether the rows of `matrix` already have unit L2 norm. (Default: False)
+    """
+
+    def __init__(
+        self,
+        dataframe: pd.DataFrame,
+        column_name: str,
+        matrix: np.ndarray | None = None,
+        normalized: bool = False,
+    ) -> None:
+        self.column_name = column_name
+        self._dataframe_ref = weakref.ref(dataframe)
+        self._num_rows = len(dataframe)
+        self._column_ref = weakref.ref(_get_column_buffer(dataframe, column_name))
+
+        if matrix is None:
+            embeddings = dataframe[column_name].to_numpy()
+            if len(embeddings) == 0:
+                self.matrix = np.empty((0, 0), dtype=np.float32)
+                return
+            matrix = np.vstack(embeddings)
+            normalized = False
+
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if not normalized:
+            self.matrix = _normalize_rows(self.matrix)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def is_built_from(self, dataframe: pd.DataFrame) -> bool:
+        """
+        Checks whether the matrix was built from the given DataFrame, which still has the same number of rows
+        and the same embedding column.
+
+        This is a constant-time check. Assigning a new embedding column, e.g. `df[column] = new_embeddings`,
+        replaces the array backing the column and is detected. Changing single cells of the column in place
+        is not; call `invalidate_embedding_matrix` after it.
+
+        Args:
+            dataframe: The pandas DataFrame to compare against.
+
+        Returns:
+            True if the matrix was built from this DataFrame and its embedding column has not been replaced.
+        """
+
+        return (
+            self._dataframe_ref() is dataframe
+            and len(dataframe) == self._num_rows
+            and self.column_name in dataframe.columns
+            and self._column_ref() is _get_column_buffer(dataframe, self.column_name)
+        )
+
+    def get_scores(self, query_embeddings: np.ndarray | list) -> np.ndarray:
+        """
+        Calculates the cosine similarity between each query and every row of the matrix.
+
+        Args:
+            query_embeddings: A single query embedding of shape (dim,) or a batch of shape (n_queries, dim).
+
+        Returns:
+            A float32 array of shape (n_queries, n_rows) with the cosine similarity scores.
+        """
+
+        queries = _normalize_rows(
+            np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        )
+        if len(self) == 0:
+            return np.empty((queries.shape[0], 0), dtype=np.float32)
+        return queries @ self.matrix.T
+
+    def get_top_k(
+        self,
+        query_embeddings: np.ndarray | list,
+        top_k: int = 3,
+        max_score: float | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the top k most similar rows for each query.
+
+        Args:
+            query_embeddings: A single query embedding of shape (dim,) or a batch of shape (n_queries, dim).
+            top_k: The number of most similar rows to return per query.
+            max_score: If set, rows whose rounded score is greater than or equal to this value are skipped
+                       (e.g. 1.0 to drop exact matches of the query itself).
+
+        Returns:
+            A tuple of two arrays of shape (n_queries, k) with the positional row indices and the
+            cosine scores (rounded to two decimal places), sorted from most to least similar.
+            k is smaller than `top_k` when fewer rows are available.
+        """
+
+        scores = np.round(self.get_scores(query_embeddings).astype(np.float64), 2)
+        if max_score is not None:
+            scores[scores >= max_score] = -np.inf
+
+        k = min(top_k, scores.shape[1])
+        if max_score is not None:
+            k = min(k, int(np.isfinite(scores).sum(axis=1).min(initial=k)))
+        if k <= 0:
+            empty = np.empty((scores.shape[0], 0))
+            return empty.astype(np.int64), empty
+
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        return (
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1),
+        )
+
+
+_embedding_matrix_cache: dict[tuple[int, str], EmbeddingMatrix] = {}
+
+
+def _get_column_buffer(dataframe: pd.DataFrame, column_name: str) -> Any:
+    """Returns the array owning the memory of a DataFrame column, which is replaced when the column is assigned."""
+
+    values = dataframe[column_name]._values
+    # Column access may return a new view of the same block on every call
+    while isinstance(getattr(values, "base", None), np.ndarray):
+        values = values.base
+    return values
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scales every row of a 2-D array to unit L2 norm, leaving all-zero rows untouched."""
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def invalidate_embedding_matrix(
+    dataframe: pd.DataFrame, column_name: str | None = None
+) -> None:
+    """
+    Drops the cached EmbeddingMatrix of a DataFrame column, so the next search rebuilds it.
+
+    Args:
+        dataframe: The pandas DataFrame whose embeddings were modified.
+        column_name: The modified embedding column, or None to drop the matrices of all columns.
+    """
+
+    for key in list(_embedding_matrix_cache):
+        if key[0] == id(dataframe) and column_name in (None, key[1]):
+            del _embedding_matrix_cache[key]
+
+
+def get_embedding_matrix(
+    dataframe: pd.DataFrame, column_name: str, rebuild: bool = False
+) -> EmbeddingMatrix:
+    """
+    Returns the cached EmbeddingMatrix for a DataFrame column, building it on first use.
+
+    The matrix is rebuilt when a different DataFrame, a DataFrame with a different number of rows, or a
+    DataFrame whose embedding column was reassigned is passed. After modifying single embeddings of a
+    DataFrame in place, call `invalidate_embedding_matrix` or pass `rebuild=True`.
+
+    Args:
+        dataframe: The pandas DataFrame containing the embeddings.
+        column_name: The name of the column containing the embeddings.
+        rebuild: If True, always rebuilds the matrix. (Default: False)
+
+    Returns:
+        The EmbeddingMatrix for the given DataFrame column.
+    """
+
+    # Drop entries whose DataFrame has been garbage collected
+    for key in [
+        key
+        for key, matrix in _embedding_matrix_cache.items()
+        if matrix._dataframe_ref() is None
+    ]:
+        del _embedding_matrix_cache[key]
+
+    key = (id(dataframe), column_name)
+    embedding_matrix = _embedding_matrix_cache.get(key)
+    if (
+        rebuild
+        or embedding_matrix is None
+        or not embedding_matrix.is_built_from(dataframe)
+    ):
+        embedding_matrix = EmbeddingMatrix(dataframe, column_name)
+        _embedding_matrix_cache[key] = embedding_matrix
+    return embedding_matrix
+
+
 def print_text_to_image_citation(
     final_images: dict[int, dict[str, Any]], print_top: bool = True
 ) -> None:
@@ -715,27 +2216,20 @@ def get_similar_image_from_query(
     # Check if image embedding is used
     if image_emb:
         # Calculate cosine similarity between query image and metadata images
-        user_query_image_embedding = get_user_query_image_embeddings(
+        user_query_embedding = get_user_query_image_embeddings(
             image_query_path, embedding_size
         )
-        cosine_scores = image_metadata_df.apply(
-            lambda x: get_cosine_score(x, column_name, user_query_image_embedding),
-            axis=1,
-        )
     else:
         # Calculate cosine similarity between query text and metadata image captions
-        user_query_text_embedding = get_user_query_text_embeddings(query)
-        cosine_scores = image_metadata_df.apply(
-            lambda x: get_cosine_score(x, column_name, user_query_text_embedding),
-            axis=1,
-        )
-
-    # Remove same image comparison score when user image is matched exactly with metadata image
-    cosine_scores = cosine_scores[cosine_scores < 1.0]
+        user_query_embedding = get_user_query_text_embeddings(query)
 
-    # Get top N cosine scores and their indices
-    top_n_cosine_scores = cosine_scores.nlargest(top_n).index.tolist()
-    top_n_cosine_values = cosine_scores.nlargest(top_n).values.tolist()
+    # Get top N cosine scores and their indices, skipping the same image
+    # when the user image is matched exactly with a metadata image
+    top_n_indices, top_n_values = get_embedding_matrix(
+        image_metadata_df, column_name
+    ).get_top_k(user_query_embedding, top_k=top_n, max_score=1.0)
+    top_n_cosine_scores = top_n_indices[0].tolist()
+    top_n_cosine_values = top_n_values[0].tolist()
 
     # Create a dictionary to store matched images and their information
     final_images: dict[int, dict[str, Any]] = {}
@@ -824,19 +2318,12 @@ def get_similar_text_from_query(
 
     query_vector = get_user_query_text_embeddings(query)
 
-    # Calculate cosine similarity between query text and metadata text
-    cosine_scores = text_metadata_df.apply(
-        lambda row: get_cosine_score(
-            row,
-            column_name,
-            query_vector,
-        ),
-        axis=1,
-    )
-
     # Get top N cosine scores and their indices
-    top_n_indices = cosine_scores.nlargest(top_n).index.tolist()
-    top_n_scores = cosine_scores.nlargest(top_n).values.tolist()
+    top_n_indices, top_n_scores = get_embedding_matrix(
+        text_metadata_df, column_name
+    ).get_top_k(query_vector, top_k=top_n)
+    top_n_indices = top_n_indices[0].tolist()
+    top_n_scores = top_n_scores[0].tolist()
 
     # Create a dictionary to store matched text and their information
     final_text: dict[int, dict[str, Any]] = {}
@@ -865,12 +2352,12 @@ def get_similar_text_from_query(
             ]
 
             # Store chunk text
-            final_text[matched_textno]["chunk_text"] = text_metadata_df["chunk_text"][
-                index
+            final_text[matched_textno]["chunk_text"] = text_metadata_df.iloc[index][
+                "chunk_text"
             ]
         else:
             # Store page text
-            final_text[matched_textno]["text"] = text_metadata_df["text"][index]
+            final_text[matched_textno]["text"] = text_metadata_df.iloc[index]["text"]
 
     # Optionally print citations immediately
     if print_citation:
@@ -0,0 +1,112 @@
+"""Local cache of document bodies for the Matching Engine vector store."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+
+class DocumentCache:
+    """In-memory LRU cache of document bodies, optionally backed by a local
+    directory.
+
+    Documents are keyed by their datapoint id. Lookups check the in-memory
+    LRU first, then the on-disk cache, whose hits are promoted back into
+    memory. Datapoint ids map to immutable documents, so entries never need
+    to be invalidated.
+    """
+
+    def __init__(self, max_entries: int = 10_000, cache_dir: str | None = None):
+        """Creates the document cache.
+
+        Attributes:
+            max_entries: The maximum number of documents kept in memory.
+            cache_dir: (Optional) A local directory where every cached
+            document is also written, so the cache survives restarts.
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+        self._documents: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_path(self, datapoint_id: str) -> str:
+        """Returns the on-disk path of a document, sharded by hash prefix."""
+        digest = hashlib.sha256(datapoint_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _remember(self, datapoint_id: str, text: str) -> None:
+        """Adds a document to the in-memory LRU. Must hold the lock."""
+        self._documents[datapoint_id] = text
+        self._documents.move_to_end(datapoint_id)
+        while len(self._documents) > self.max_entries:
+            self._documents.popitem(last=False)
+
+    def get(self, datapoint_id: str) -> str | None:
+        """Returns the cached document for a datapoint id, or None on a miss."""
+        with self._lock:
+            text = self._documents.get(datapoint_id)
+            if text is not None:
+                self._documents.move_to_end(datapoint_id)
+                self.hits += 1
+                return text
+
+        if self.cache_dir:
+            try:
+                with open(self._get_path(datapoint_id), encoding="utf-8") as f:
+                    text = f.read()
+            except FileNotFoundError:
+                text = None
+
+        with self._lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(datapoint_id, text)
+        return text
+
+    def get_many(self, datapoint_ids: list[str]) -> dict[str, str]:
+        """Returns the cached documents among several datapoint ids."""
+        documents = {}
+        for datapoint_id in dict.fromkeys(datapoint_ids):
+            text = self.get(datapoint_id)
+            if text is not None:
+                documents[datapoint_id] = text
+        return documents
+
+    def put(self, datapoint_id: str, text: str) -> None:
+        """Stores a document in memory and, if configured, on disk."""
+        with self._lock:
+            self._remember(datapoint_id, text)
+
+        if self.cache_dir:
+            path = self._get_path(datapoint_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see partial documents
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+    def put_many(self, documents: dict[str, str]) -> None:
+        """Stores several documents."""
+        for datapoint_id, text in documents.items():
+            self.put(datapoint_id, text)
+
+    def stats(self) -> dict[str, int | float]:
+        """Returns the hit and miss counters and the hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "in_memory": len(self._documents),
+        }
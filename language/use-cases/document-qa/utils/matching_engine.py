@@ -3,8 +3,13 @@
 from __future__ import annotations
 
 from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+import itertools
 import json
 import logging
+import queue
+import threading
+import time
 from typing import Any
 import uuid
 
@@ -18,6 +23,9 @@ from langchain.embeddings import TensorflowHubEmbeddings
 from langchain.embeddings.base import Embeddings
 from langchain.vectorstores.base import VectorStore
 import requests
+from requests.adapters import HTTPAdapter
+
+from .document_cache import DocumentCache
 
 logger = logging.getLogger()
 
@@ -49,6 +57,10 @@ class MatchingEngine(VectorStore):
         index_endpoint_client: aiplatform_v1.IndexEndpointServiceClient,
         gcs_bucket_name: str,
         credentials: Credentials | None = None,
+        max_download_workers: int = 16,
+        document_cache: DocumentCache | None = None,
+        packed_layout: bool = False,
+        documents_per_shard: int = 1000,
     ):
         """Vertex AI Matching Engine implementation of the vector store.
 
@@ -76,6 +88,15 @@ class MatchingEngine(VectorStore):
             multilingual TensorFlow Universal Sentence Encoder will be used.
             gcs_client: The Google Cloud Storage client.
             credentials (Optional): Created Google Cloud credentials.
+            max_download_workers: The maximum number of documents downloaded
+            from GCS concurrently.
+            document_cache (Optional): A :class:`DocumentCache` checked before
+            downloading documents from GCS.
+            packed_layout: If True, new documents are written to sharded JSONL
+            blobs with an offset index instead of one GCS object per document,
+            and read back with ranged reads.
+            documents_per_shard: The number of documents per shard in the
+            packed layout.
         """
         super().__init__()
         self._validate_google_libraries_installation()
@@ -91,6 +112,20 @@ class MatchingEngine(VectorStore):
         self.gcs_client = gcs_client
         self.credentials = credentials
         self.gcs_bucket_name = gcs_bucket_name
+        self.max_download_workers = max_download_workers
+        self.document_cache = document_cache
+        self.packed_layout = packed_layout
+        self.documents_per_shard = documents_per_shard
+
+        self._session: requests.Session | None = None
+        self._bucket: storage.Bucket | None = None
+        self._credentials_lock = threading.Lock()
+
+        # Packed layout: datapoint id -> (shard blob name, byte offset, byte length)
+        self._shard_index: dict[str, tuple[str, int, int]] = {}
+        self._loaded_shard_indexes: set[str] = set()
+        self._shard_indexes_listed_at: float | None = None
+        self._shard_index_lock = threading.Lock()
 
     def _validate_google_libraries_installation(self) -> None:
         """Validates that Google libraries that are needed are installed."""
@@ -120,42 +155,259 @@ class MatchingEngine(VectorStore):
         Returns:
             List of ids from adding the texts into the vectorstore.
         """
-        logger.debug("Embedding documents.")
-        embeddings = self.embedding.embed_documents(list(texts))
-        insert_datapoints_payload = []
-        ids = []
-
-        # Streaming index update
-        for idx, (embedding, text, metadata) in enumerate(
-            zip(embeddings, texts, metadatas or [])
-        ):
-            id = uuid.uuid4()
-            ids.append(str(id))
-            self._upload_to_gcs(text, f"documents/{id}")
-
-            insert_datapoints_payload.append(
-                aiplatform_v1.IndexDatapoint(
-                    datapoint_id=str(id),
-                    feature_vector=embedding,
-                    restricts=metadata if metadata else [],
-                )
-            )
-            if idx % 100 == 0:
-                upsert_request = aiplatform_v1.UpsertDatapointsRequest(
-                    index=self.index.name, datapoints=insert_datapoints_payload
-                )
-                self.index_client.upsert_datapoints(request=upsert_request)
-                insert_datapoints_payload = []
-        if len(insert_datapoints_payload) > 0:
+        return self.add_texts_streaming(texts, metadatas, **kwargs)["ids"]
+
+    def add_texts_streaming(
+        self,
+        texts: Iterable[str],
+        metadatas: Iterable[dict] | None = None,
+        embedding_batch_size: int = 250,
+        upsert_batch_size: int = 100,
+        max_upload_workers: int = 16,
+        max_pending_batches: int = 4,
+        return_ids: bool = True,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Streams texts of any size into the vectorstore.
+
+        Texts are read lazily and embedded in bounded batches. The documents of
+        each batch are uploaded to GCS concurrently while the next batch is
+        embedded, and a background worker sends fixed-size upsert batches once
+        the documents of their datapoints are stored. At most
+        `max_pending_batches` embedded batches are held in memory at a time.
+
+        Args:
+            texts: Iterable of strings to add to the vectorstore.
+            metadatas: Optional iterable of metadatas associated with the texts.
+            embedding_batch_size: The number of texts embedded per call.
+            upsert_batch_size: The number of datapoints per upsert request.
+            max_upload_workers: The maximum number of concurrent GCS uploads.
+            max_pending_batches: The maximum number of embedded batches
+            waiting to be upserted.
+            return_ids: Whether to collect and return the ids of all texts.
+            kwargs: vectorstore specific parameters.
+
+        Returns:
+            A dictionary with the ids of the added texts (if `return_ids`),
+            the number of documents and upsert requests, the elapsed seconds
+            and the throughput in documents per second.
+        """
+        items = zip(
+            texts, metadatas if metadatas is not None else itertools.repeat(None)
+        )
+        pending_batches: queue.Queue = queue.Queue(maxsize=max_pending_batches)
+        upsert_errors: list[BaseException] = []
+        stats = {"num_documents": 0, "num_upserts": 0}
+        ids: list[str] = []
+        start_time = time.monotonic()
+
+        def upsert(datapoints: list) -> None:
             upsert_request = aiplatform_v1.UpsertDatapointsRequest(
-                index=self.index.name, datapoints=insert_datapoints_payload
+                index=self.index.name, datapoints=datapoints
             )
-            _ = self.index_client.upsert_datapoints(request=upsert_request)
+            self.index_client.upsert_datapoints(request=upsert_request)
+            stats["num_upserts"] += 1
+
+        def upsert_worker() -> None:
+            buffer: list = []
+            try:
+                while (batch := pending_batches.get()) is not None:
+                    datapoints, store_futures = batch
+                    # Documents must be stored before they become searchable
+                    for future in store_futures:
+                        future.result()
+                    buffer.extend(datapoints)
+                    while len(buffer) >= upsert_batch_size:
+                        upsert(buffer[:upsert_batch_size])
+                        buffer = buffer[upsert_batch_size:]
+                if buffer:
+                    upsert(buffer)
+            except BaseException as e:
+                upsert_errors.append(e)
+                # Keep draining so the producer never blocks on a full queue
+                while pending_batches.get() is not None:
+                    pass
+
+        worker = threading.Thread(target=upsert_worker, daemon=True)
+        worker.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_upload_workers) as executor:
+                while batch := list(itertools.islice(items, embedding_batch_size)):
+                    if upsert_errors:
+                        break
+                    batch_texts = [text for text, _ in batch]
+                    batch_ids = [str(uuid.uuid4()) for _ in batch]
+
+                    logger.debug(f"Embedding {len(batch_texts)} documents.")
+                    embeddings = self.embedding.embed_documents(batch_texts)
+
+                    datapoints = [
+                        aiplatform_v1.IndexDatapoint(
+                            datapoint_id=id,
+                            feature_vector=embedding,
+                            restricts=metadata if metadata else [],
+                        )
+                        for id, embedding, (_, metadata) in zip(
+                            batch_ids, embeddings, batch
+                        )
+                    ]
+                    pending_batches.put(
+                        (
+                            datapoints,
+                            self._submit_store_documents(
+                                executor, batch_ids, batch_texts
+                            ),
+                        )
+                    )
+
+                    stats["num_documents"] += len(batch)
+                    if return_ids:
+                        ids.extend(batch_ids)
+
+                    elapsed = time.monotonic() - start_time
+                    logger.info(
+                        f"Embedded {stats['num_documents']} documents "
+                        f"({stats['num_documents'] / elapsed:.1f} documents/sec)."
+                    )
+        finally:
+            pending_batches.put(None)
+            worker.join()
+
+        if upsert_errors:
+            raise upsert_errors[0]
 
+        elapsed = time.monotonic() - start_time
         logger.debug("Updated index with new configuration.")
-        logger.info(f"Indexed {len(ids)} documents to Matching Engine.")
+        logger.info(
+            f"Indexed {stats['num_documents']} documents to Matching Engine "
+            f"in {stats['num_upserts']} upserts and {elapsed:.1f} sec "
+            f"({stats['num_documents'] / elapsed if elapsed else 0:.1f} documents/sec)."
+        )
+
+        return {
+            "ids": ids,
+            **stats,
+            "elapsed_sec": elapsed,
+            "documents_per_sec": stats["num_documents"] / elapsed if elapsed else 0.0,
+        }
+
+    def _submit_store_documents(
+        self, executor: ThreadPoolExecutor, ids: list[str], texts: list[str]
+    ) -> list[Future]:
+        """Submits the upload of documents to GCS, either one object per
+        document or packed into shards.
+
+        Args:
+            executor: The executor that runs the uploads.
+            ids: The datapoint ids of the documents.
+            texts: The documents.
+
+        Returns:
+            The futures of the uploads.
+        """
+        if not self.packed_layout:
+            return [
+                executor.submit(self._upload_to_gcs, text, f"documents/{id}")
+                for id, text in zip(ids, texts)
+            ]
+
+        return [
+            executor.submit(
+                self._upload_document_shard,
+                ids[start : start + self.documents_per_shard],
+                texts[start : start + self.documents_per_shard],
+            )
+            for start in range(0, len(ids), self.documents_per_shard)
+        ]
+
+    def _upload_document_shard(self, ids: list[str], texts: list[str]) -> None:
+        """Writes documents to one JSONL shard plus its offset index.
+
+        Args:
+            ids: The datapoint ids of the documents.
+            texts: The documents.
+        """
+        shard_name = f"documents/shards/{uuid.uuid4()}"
+        lines = []
+        shard_index = {}
+        offset = 0
+        for id, text in zip(ids, texts):
+            line = (json.dumps({"id": id, "text": text}) + "\n").encode("utf-8")
+            shard_index[id] = [offset, len(line)]
+            lines.append(line)
+            offset += len(line)
+
+        # Upload the shard before its index, so indexed offsets always exist
+        bucket = self._get_bucket()
+        bucket.blob(f"{shard_name}.jsonl").upload_from_string(
+            b"".join(lines), content_type="application/jsonl"
+        )
+        bucket.blob(f"{shard_name}.index.json").upload_from_string(
+            json.dumps(shard_index), content_type="application/json"
+        )
+
+        with self._shard_index_lock:
+            self._add_shard_index(f"{shard_name}.index.json", shard_index)
+
+    def _add_shard_index(self, index_blob_name: str, shard_index: dict) -> None:
+        """Merges a shard offset index into the in-memory index. Must hold the
+        shard index lock."""
+        shard_blob_name = index_blob_name.removesuffix(".index.json") + ".jsonl"
+        for id, (offset, length) in shard_index.items():
+            self._shard_index[id] = (shard_blob_name, offset, length)
+        self._loaded_shard_indexes.add(index_blob_name)
+
+    def _load_shard_indexes(self, min_interval_sec: float = 60.0) -> None:
+        """Loads the offset indexes of shards not seen yet by this instance.
+
+        The bucket is listed and the new indexes downloaded without holding the
+        shard index lock, so concurrent lookups and uploads are not blocked.
+
+        Args:
+            min_interval_sec: The bucket is listed at most once per interval.
+        """
+        with self._shard_index_lock:
+            now = time.monotonic()
+            if (
+                self._shard_indexes_listed_at is not None
+                and now - self._shard_indexes_listed_at < min_interval_sec
+            ):
+                return
+            self._shard_indexes_listed_at = now
+            loaded = set(self._loaded_shard_indexes)
+
+        new_indexes = {
+            blob.name: json.loads(blob.download_as_text())
+            for blob in self.gcs_client.list_blobs(
+                self.gcs_bucket_name, prefix="documents/shards/"
+            )
+            if blob.name.endswith(".index.json") and blob.name not in loaded
+        }
 
-        return ids
+        with self._shard_index_lock:
+            for index_blob_name, shard_index in new_indexes.items():
+                self._add_shard_index(index_blob_name, shard_index)
+
+    def _download_from_shard(self, datapoint_id: str) -> str:
+        """Downloads one document from its shard with a ranged read.
+
+        Args:
+            datapoint_id: The datapoint id of the document.
+
+        Returns:
+            The document, or an empty string if it could not be read.
+        """
+        shard_blob_name, offset, length = self._shard_index[datapoint_id]
+        try:
+            line = (
+                self._get_bucket()
+                .blob(shard_blob_name)
+                .download_as_bytes(start=offset, end=offset + length - 1)
+            )
+            return json.loads(line)["text"]
+        except Exception:
+            return ""
 
     def _upload_to_gcs(self, data: str, gcs_location: str) -> None:
         """Uploads data to gcs_location.
@@ -164,10 +416,35 @@ class MatchingEngine(VectorStore):
             data: The data that will be stored.
             gcs_location: The location where the data will be stored.
         """
-        bucket = self.gcs_client.get_bucket(self.gcs_bucket_name)
-        blob = bucket.blob(gcs_location)
+        blob = self._get_bucket().blob(gcs_location)
         blob.upload_from_string(data)
 
+    def _get_bucket(self) -> storage.Bucket:
+        """Returns the documents bucket, fetching its metadata only once."""
+        if self._bucket is None:
+            self._bucket = self.gcs_client.get_bucket(self.gcs_bucket_name)
+        return self._bucket
+
+    def _get_session(self) -> requests.Session:
+        """Returns a pooled HTTP session that is reused across queries."""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.max_download_workers
+            )
+            session.mount("https://", adapter)
+            self._session = session
+        return self._session
+
+    def _get_auth_header(self) -> dict[str, str]:
+        """Returns the authorization header, refreshing the token only when it
+        is missing or about to expire."""
+        with self._credentials_lock:
+            if not self.credentials.valid:
+                request = google.auth.transport.requests.Request()
+                self.credentials.refresh(request)
+            return {"Authorization": "Bearer " + self.credentials.token}
+
     def get_matches(
         self,
         embeddings: list[str],
@@ -202,11 +479,9 @@ class MatchingEngine(VectorStore):
 
         logger.debug(f"Querying Matching Engine Index Endpoint {rpc_address}")
 
-        request = google.auth.transport.requests.Request()
-        self.credentials.refresh(request)
-        header = {"Authorization": "Bearer " + self.credentials.token}
-
-        return requests.post(rpc_address, data=endpoint_json_data, headers=header)
+        return self._get_session().post(
+            rpc_address, data=endpoint_json_data, headers=self._get_auth_header()
+        )
 
     def similarity_search(
         self,
@@ -227,59 +502,146 @@ class MatchingEngine(VectorStore):
             A list of k matching documents.
         """
 
-        logger.debug(f"Embedding query {query}.")
-        embedding_query = self.embedding.embed_documents([query])
+        return self.batch_similarity_search(
+            [query], k=k, search_distance=search_distance, filters=filters
+        )[0]
+
+    def batch_similarity_search(
+        self,
+        queries: list[str],
+        k: int = 4,
+        search_distance: float = 0.65,
+        filters={},
+        **kwargs: Any,
+    ) -> list[list[Document]]:
+        """Return docs most similar to each of several queries.
+
+        All queries are embedded together and sent in a single findNeighbors
+        request, and the documents of all neighbors are downloaded from GCS
+        concurrently, each distinct document only once.
+
+        Args:
+            queries: The strings that will be used to search for similar documents.
+            k: The amount of neighbors that will be retrieved per query.
+            search_distance: filter search results by search distance by adding a threshold value
+
+        Returns:
+            A list with the matching documents of each query, in the order
+            of the queries.
+        """
+
+        if not queries:
+            return []
+
+        logger.debug(f"Embedding {len(queries)} queries.")
+        embedding_queries = self.embedding.embed_documents(list(queries))
         deployed_index_id = self._get_index_id()
         logger.debug(f"Deployed Index ID = {deployed_index_id}")
 
         # TO-DO: Pending query sdk integration
         # response = self.endpoint.match(
         #     deployed_index_id=self._get_index_id(),
-        #     queries=embedding_query,
+        #     queries=embedding_queries,
         #     num_neighbors=k,
         # )
 
-        response = self.get_matches(embedding_query, k, self.endpoint, filters)
+        response = self.get_matches(embedding_queries, k, self.endpoint, filters)
 
         if response.status_code == 200:
-            response = response.json()["nearestNeighbors"]
+            response = response.json().get("nearestNeighbors", [])
         else:
             raise Exception(f"Failed to query index {str(response)}")
 
-        if len(response) == 0:
-            return []
+        # Queries are returned in request order, with the request position as id
+        neighbors_by_query: list[list[dict]] = [[] for _ in queries]
+        for position, nearest_neighbors in enumerate(response):
+            neighbors_by_query[int(nearest_neighbors.get("id", position))] = (
+                nearest_neighbors.get("neighbors", [])
+            )
 
-        logger.debug(f"Found {len(response)} matches for the query {query}.")
+        logger.debug(
+            f"Found {sum(map(len, neighbors_by_query))} matches "
+            f"for {len(queries)} queries."
+        )
 
-        results = []
+        page_contents = self._download_documents(
+            [
+                doc["datapoint"]["datapointId"]
+                for neighbors in neighbors_by_query
+                for doc in neighbors
+            ]
+        )
 
-        # I'm only getting the first one because queries receives an array
-        # and the similarity_search method only receives one query. This
-        # means that the match method will always return an array with only
-        # one element.
-        for doc in response[0]["neighbors"]:
-            page_content = self._download_from_gcs(
-                f"documents/{doc['datapoint']['datapointId']}"
-            )
-            metadata = {}
-            if "restricts" in doc["datapoint"]:
-                metadata = {
-                    item["namespace"]: item["allowList"][0]
-                    for item in doc["datapoint"]["restricts"]
-                }
-            if "distance" in doc:
-                metadata["score"] = doc["distance"]
-                if doc["distance"] >= search_distance:
-                    results.append(
+        results = []
+        for neighbors in neighbors_by_query:
+            query_results = []
+            for doc in neighbors:
+                page_content = page_contents[doc["datapoint"]["datapointId"]]
+                metadata = {}
+                if "restricts" in doc["datapoint"]:
+                    metadata = {
+                        item["namespace"]: item["allowList"][0]
+                        for item in doc["datapoint"]["restricts"]
+                    }
+                if "distance" in doc:
+                    metadata["score"] = doc["distance"]
+                    if doc["distance"] >= search_distance:
+                        query_results.append(
+                            Document(page_content=page_content, metadata=metadata)
+                        )
+                else:
+                    query_results.append(
                         Document(page_content=page_content, metadata=metadata)
                     )
-            else:
-                results.append(Document(page_content=page_content, metadata=metadata))
+            results.append(query_results)
 
-        logger.debug("Downloaded documents for query.")
+        logger.debug("Downloaded documents for queries.")
 
         return results
 
+    def _download_documents(self, datapoint_ids: list[str]) -> dict[str, str]:
+        """Gets the documents of several datapoints, from the document cache
+        when possible and otherwise from GCS concurrently.
+
+        Args:
+            datapoint_ids: The datapoint ids, possibly with duplicates.
+
+        Returns:
+            A dictionary mapping each datapoint id to its document.
+        """
+        unique_ids = list(dict.fromkeys(datapoint_ids))
+        documents = (
+            self.document_cache.get_many(unique_ids) if self.document_cache else {}
+        )
+        missing_ids = [id for id in unique_ids if id not in documents]
+        if not missing_ids:
+            return documents
+
+        # Documents written by other instances may be in shards not loaded yet
+        if self.packed_layout and any(
+            id not in self._shard_index for id in missing_ids
+        ):
+            self._load_shard_indexes()
+
+        def download(datapoint_id: str) -> str:
+            if datapoint_id in self._shard_index:
+                return self._download_from_shard(datapoint_id)
+            return self._download_from_gcs(f"documents/{datapoint_id}")
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_download_workers, len(missing_ids))
+        ) as executor:
+            downloaded = dict(zip(missing_ids, executor.map(download, missing_ids)))
+
+        if self.document_cache:
+            # Empty strings are failed downloads and are not cached
+            self.document_cache.put_many(
+                {id: text for id, text in downloaded.items() if text}
+            )
+
+        documents.update(downloaded)
+        return documents
+
     def _get_index_id(self) -> str:
         """Gets the correct index id for the endpoint.
 
@@ -306,10 +668,9 @@ class MatchingEngine(VectorStore):
         Returns:
             The string contents of the file.
         """
-        bucket = self.gcs_client.get_bucket(self.gcs_bucket_name)
         try:
-            blob = bucket.blob(gcs_location)
-            return blob.download_as_string()
+            blob = self._get_bucket().blob(gcs_location)
+            return blob.download_as_text()
         except Exception:
             return ""
 
@@ -353,6 +714,8 @@ class MatchingEngine(VectorStore):
         endpoint_id: str,
         credentials_path: str | None = None,
         embedding: Embeddings | None = None,
+        document_cache: DocumentCache | None = None,
+        packed_layout: bool = False,
     ) -> MatchingEngine:
         """Takes the object creation out of the constructor.
 
@@ -368,6 +731,10 @@ class MatchingEngine(VectorStore):
             the local file system.
             embedding: The :class:`Embeddings` that will be used for
             embedding the texts.
+            document_cache: (Optional) A :class:`DocumentCache` checked before
+            downloading documents from GCS.
+            packed_layout: If True, new documents are written to sharded
+            blobs instead of one GCS object per document.
 
         Returns:
             A configured MatchingEngine with the texts added to the index.
@@ -405,6 +772,8 @@ class MatchingEngine(VectorStore):
             index_endpoint_client=index_endpoint_client,
             credentials=credentials,
             gcs_bucket_name=gcs_bucket_name,
+            document_cache=document_cache,
+            packed_layout=packed_layout,
         )
 
     @classmethod